@@ -0,0 +1,302 @@
+import os
+
+import banco
+from utils import eh_link
+
+# Imagens vão para a aba de livros, com miniatura
+IMAGENS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')
+
+# Extensões de cada aba, as mesmas dos filtros de "Adicionar Arquivo"
+EXTENSOES = {
+    'livro': ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.xml', '.txt') + IMAGENS,
+    'video': ('.mp4', '.avi', '.mov', '.mkv'),
+}
+
+# Pastas examinadas ao mesmo tempo; em montagens de rede o stat é lento,
+# mas várias pastas podem esperar em paralelo
+TRABALHADORES = 8
+
+# Com poucos arquivos conhecidos na pasta, stat direto sai mais barato que
+# listar a pasta inteira
+LIMITE_STAT_DIRETO = 4
+
+# Linhas gravadas por transação depois de uma verificação
+TAMANHO_LOTE = 2000
+
+
+def tipo_do_arquivo(nome):
+    """'livro', 'video' ou None, pela extensão do nome."""
+    extensao = os.path.splitext(nome)[1].lower()
+    for tipo, extensoes in EXTENSOES.items():
+        if extensao in extensoes:
+            return tipo
+    return None
+
+
+def percorrer(raiz):
+    """Gera (tipo, nome, caminho, is_divisao) para os arquivos conhecidos sob raiz.
+
+    As pastas são lidas uma de cada vez com os.scandir, em ordem alfabética
+    e em profundidade. Antes dos primeiros arquivos de uma subpasta em cada
+    aba vem uma divisão com o caminho da subpasta relativo a raiz. Arquivos
+    e pastas ocultos (com '.' no início) e links para pastas são ignorados.
+    """
+    pilha = [raiz]
+    while pilha:
+        pasta = pilha.pop()
+        try:
+            with os.scandir(pasta) as iterador:
+                entradas = sorted(
+                    (entrada for entrada in iterador if not entrada.name.startswith('.')),
+                    key=lambda entrada: entrada.name.casefold()
+                )
+        except OSError:
+            continue
+
+        relativo = os.path.relpath(pasta, raiz).replace(os.sep, '/')
+        com_divisao = set()
+        subpastas = []
+        for entrada in entradas:
+            try:
+                if entrada.is_dir(follow_symlinks=False):
+                    subpastas.append(entrada.path)
+                    continue
+            except OSError:
+                continue
+            tipo = tipo_do_arquivo(entrada.name)
+            if tipo is None:
+                continue
+            if pasta != raiz and tipo not in com_divisao:
+                com_divisao.add(tipo)
+                yield (tipo, relativo, '', True)
+            yield (tipo, entrada.name, os.path.abspath(entrada.path), False)
+        pilha.extend(reversed(subpastas))
+
+
+def listar_pasta(pasta):
+    """Lê uma pasta sem descer nas subpastas.
+
+    Retorna (mtime_ns, arquivos, subpastas), com arquivos como
+    [(tipo, nome, caminho, tamanho, modificado_em)] em ordem alfabética,
+    ou None se a pasta não puder ser lida.
+    """
+    try:
+        mtime = os.stat(pasta).st_mtime_ns
+        with os.scandir(pasta) as iterador:
+            entradas = sorted(
+                (entrada for entrada in iterador if not entrada.name.startswith('.')),
+                key=lambda entrada: entrada.name.casefold()
+            )
+    except OSError:
+        return None
+
+    encontrados = []
+    subpastas = []
+    for entrada in entradas:
+        try:
+            if entrada.is_dir(follow_symlinks=False):
+                subpastas.append(os.path.join(pasta, entrada.name))
+                continue
+            tipo = tipo_do_arquivo(entrada.name)
+            if tipo is not None:
+                resultado = entrada.stat()
+                encontrados.append((tipo, entrada.name, os.path.join(pasta, entrada.name),
+                                    resultado.st_size, resultado.st_mtime))
+        except OSError:
+            continue
+    return mtime, encontrados, subpastas
+
+
+def listar_subpastas(raiz):
+    """raiz e todas as pastas abaixo dela, com as mesmas regras de percorrer."""
+    pastas = [raiz]
+    pilha = [raiz]
+    while pilha:
+        try:
+            with os.scandir(pilha.pop()) as iterador:
+                for entrada in iterador:
+                    if not entrada.name.startswith('.') and entrada.is_dir(follow_symlinks=False):
+                        pastas.append(entrada.path)
+                        pilha.append(entrada.path)
+        except OSError:
+            continue
+    return pastas
+
+
+def mtimes(pastas):
+    """{pasta: mtime_ns}, com None para as que não existem mais."""
+    resultado = {}
+    for pasta in pastas:
+        try:
+            resultado[pasta] = os.stat(pasta).st_mtime_ns
+        except OSError:
+            resultado[pasta] = None
+    return resultado
+
+
+_SEPARADORES = [separador for separador in (os.sep, os.altsep) if separador]
+
+# Pastas por consulta ao buscar os arquivos das pastas de uma matéria
+TAMANHO_LOTE_PASTAS = 100
+
+_LOCAIS = "is_divisao=0 AND tipo IN ('livro', 'video') AND caminho != ''"
+
+
+def _prefixos_da_materia(conn, materia_id):
+    """Pastas dos arquivos locais da matéria, com o separador do fim."""
+    prefixos = set()
+    for caminho, in conn.execute(f'SELECT DISTINCT caminho FROM conteudos WHERE materia_id=? AND {_LOCAIS}', (materia_id,)):
+        if not eh_link(caminho):
+            posicao = max(caminho.rfind(separador) for separador in _SEPARADORES)
+            prefixos.add(caminho[:posicao + 1])
+    return prefixos
+
+
+def _na_pasta(prefixo):
+    """(condição SQL, parâmetros) para os caminhos diretamente dentro de prefixo."""
+    # Depois do prefixo, só o nome do arquivo: nada de subpastas
+    condicoes = [f"instr(substr(caminho, {len(prefixo) + 1}), ?) = 0" for _ in _SEPARADORES]
+    parametros = list(_SEPARADORES)
+    if prefixo:
+        # Comparação de texto em vez de LIKE: sem colação nem curingas no caminho
+        condicoes[:0] = ['caminho >= ?', 'caminho < ?']
+        parametros[:0] = [prefixo, prefixo[:-1] + chr(ord(prefixo[-1]) + 1)]
+    return '(' + ' AND '.join(condicoes) + ')', parametros
+
+
+def _agrupar_por_pasta(conn, materia_id):
+    """{pasta: [(id, nome do arquivo, existe)]} dos conteúdos com arquivo local.
+
+    Com materia_id, só entram as pastas que têm algum arquivo dessa matéria,
+    mas com os arquivos de todas as matérias que estão nelas. Os caminhos da
+    matéria são lidos primeiro, pelo índice de materia_id; das outras
+    matérias só chegam ao Python as linhas dessas pastas.
+    """
+    consulta = f'SELECT id, materia_id, caminho, existe FROM conteudos WHERE {_LOCAIS}'
+    if materia_id is None:
+        consultas = [(consulta, [])]
+    else:
+        prefixos = sorted(_prefixos_da_materia(conn, materia_id))
+        consultas = []
+        for inicio in range(0, len(prefixos), TAMANHO_LOTE_PASTAS):
+            condicoes, parametros = zip(*map(_na_pasta, prefixos[inicio:inicio + TAMANHO_LOTE_PASTAS]))
+            consultas.append((f"{consulta} AND ({' OR '.join(condicoes)})", [p for lista in parametros for p in lista]))
+
+    pastas = {}
+    da_materia = set()
+    for sql, parametros in consultas:
+        for id, dono, caminho, existe in conn.execute(sql, parametros):
+            if eh_link(caminho):
+                continue
+            pasta, nome = os.path.split(caminho)
+            pastas.setdefault(pasta, []).append((id, nome, existe))
+            if dono == materia_id:
+                da_materia.add(pasta)
+
+    if materia_id is not None:
+        pastas = {pasta: entradas for pasta, entradas in pastas.items() if pasta in da_materia}
+    return pastas
+
+
+def _metadados(resultado):
+    return (resultado.st_size, resultado.st_mtime, 1)
+
+
+def _examinar(pasta, entradas, mtime_anterior, forcar):
+    """Retorna (mtime da pasta, [(tamanho, modificado_em, existe, id)]).
+
+    A lista é None quando a pasta não mudou desde o último exame.
+    """
+    try:
+        mtime = os.stat(pasta).st_mtime_ns
+    except OSError:
+        if not forcar and all(existe == 0 for _, _, existe in entradas):
+            return None, None
+        return None, [(None, None, 0, id) for id, _, _ in entradas]
+
+    conhecidas = all(existe is not None for _, _, existe in entradas)
+    if not forcar and conhecidas and mtime == mtime_anterior:
+        return mtime, None
+
+    resultados = []
+    if len(entradas) <= LIMITE_STAT_DIRETO:
+        for id, nome, _ in entradas:
+            try:
+                resultados.append((*_metadados(os.stat(os.path.join(pasta, nome))), id))
+            except OSError:
+                resultados.append((None, None, 0, id))
+        return mtime, resultados
+
+    try:
+        with os.scandir(pasta) as iterador:
+            presentes = {entrada.name: entrada for entrada in iterador}
+    except OSError:
+        presentes = {}
+    for id, nome, _ in entradas:
+        entrada = presentes.get(nome)
+        try:
+            resultados.append((*_metadados(entrada.stat()), id) if entrada is not None else (None, None, 0, id))
+        except OSError:
+            resultados.append((None, None, 0, id))
+    return mtime, resultados
+
+
+def _gravar_metadados(alterados):
+    with banco.transacao() as conn:
+        conn.executemany('UPDATE conteudos SET tamanho=?, modificado_em=?, existe=? WHERE id=?', alterados)
+
+
+def _gravar_mtimes(mtimes):
+    with banco.transacao() as conn:
+        conn.executemany(
+            '''INSERT INTO diretorios (caminho, mtime_ns) VALUES (?, ?)
+               ON CONFLICT (caminho) DO UPDATE SET mtime_ns=excluded.mtime_ns''',
+            mtimes
+        )
+
+
+def verificar(materia_id=None, forcar=False, cancelado=None, trabalhadores=TRABALHADORES, escrever=None):
+    """Atualiza tamanho, modificado_em e existe dos arquivos locais.
+
+    Só reexamina pastas cujo mtime mudou desde a última verificação (ou que
+    têm arquivos nunca verificados); forcar=True examina todas. Uma alteração
+    no conteúdo de um arquivo que não mexe na pasta só é vista com forcar.
+    Retorna {id: (tamanho, modificado_em, existe)} das linhas examinadas, ou
+    None se cancelado() retornar True.
+
+    As linhas são gravadas em lotes de TAMANHO_LOTE, cada um chamado como
+    escrever(funcao, lote) (na interface, a fila de escrita); sem escrever,
+    são gravadas nesta thread.
+    """
+    # Importado aqui: concurrent.futures pesa na abertura e só é usado na verificação
+    from concurrent.futures import ThreadPoolExecutor
+
+    conn = banco.conectar()
+    pastas = _agrupar_por_pasta(conn, materia_id)
+    anteriores = dict(conn.execute('SELECT caminho, mtime_ns FROM diretorios'))
+
+    alterados = []
+    mtimes = []
+    with ThreadPoolExecutor(trabalhadores) as executor:
+        futuros = [
+            (pasta, executor.submit(_examinar, pasta, entradas, anteriores.get(pasta), forcar))
+            for pasta, entradas in pastas.items()
+        ]
+        for pasta, futuro in futuros:
+            if cancelado is not None and cancelado():
+                for _, pendente in futuros:
+                    pendente.cancel()
+                return None
+            mtime, resultados = futuro.result()
+            if resultados is not None:
+                alterados.extend(resultados)
+                mtimes.append((pasta, mtime))
+
+    if alterados:
+        if escrever is None:
+            escrever = banco.executar
+        for inicio in range(0, len(alterados), TAMANHO_LOTE):
+            escrever(_gravar_metadados, alterados[inicio:inicio + TAMANHO_LOTE])
+        # Por último: uma pasta só conta como vista depois que as linhas dela foram gravadas
+        escrever(_gravar_mtimes, mtimes)
+    return {id: (tamanho, modificado_em, existe) for tamanho, modificado_em, existe, id in alterados}
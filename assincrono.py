@@ -0,0 +1,211 @@
+import queue
+import threading
+
+import banco
+# pylint: disable=no-name-in-module
+from PyQt5.QtCore import QObject, QRunnable, QThread, QThreadPool, pyqtSignal
+
+# Leitores simultâneos; com WAL eles não bloqueiam o escritor
+LEITORES = 3
+
+
+class Pedido(QObject):
+    """Resultado de uma operação enviada ao banco em segundo plano.
+
+    concluido e falhou são emitidos na thread da interface. Se ninguém
+    estiver ligado a falhou, o erro é impresso.
+    """
+    concluido = pyqtSignal(object)
+    falhou = pyqtSignal(str)
+    _pronto = pyqtSignal(object, object)
+
+    def __init__(self):
+        super().__init__()
+        # Chega pela fila de eventos da thread onde o pedido foi criado
+        self._pronto.connect(self._entregar)
+
+    def _entregar(self, resultado, erro):
+        _pendentes.discard(self)
+        if erro is None:
+            self.concluido.emit(resultado)
+        elif self.receivers(self.falhou):
+            self.falhou.emit(str(erro))
+        else:
+            print(f"Erro no banco de dados: {erro}")
+
+    def _executar(self, funcao, args):
+        try:
+            resultado = funcao(*args)
+        except Exception as e:
+            self._pronto.emit(None, e)
+        else:
+            self._pronto.emit(resultado, None)
+
+
+class _Espera:
+    """Pedido de uma thread de trabalho, que espera a escrita terminar."""
+
+    def __init__(self):
+        self._pronta = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+    def _executar(self, funcao, args):
+        try:
+            self.resultado = funcao(*args)
+        except Exception as e:
+            self.erro = e
+        finally:
+            self._pronta.set()
+
+
+class Escritor(QThread):
+    """Thread única que grava no banco, na ordem em que os pedidos chegam."""
+
+    def __init__(self):
+        super().__init__()
+        self._fila = queue.Queue()
+        self._condicao = threading.Condition()
+        self._enviados = 0
+        self._concluidos = 0
+
+    def enviar(self, pedido, funcao, args):
+        with self._condicao:
+            self._enviados += 1
+            self._fila.put((pedido, funcao, args))
+            return self._enviados
+
+    def aguardar(self, numero):
+        """Bloqueia até a escrita de número informado ter terminado."""
+        with self._condicao:
+            self._condicao.wait_for(lambda: self._concluidos >= numero)
+
+    def encerrar(self):
+        self._fila.put(None)
+        self.wait()
+
+    def run(self):
+        try:
+            while True:
+                item = self._fila.get()
+                if item is None:
+                    # Uma thread de trabalho pode ter enfileirado junto com o encerramento
+                    if self._fila.empty():
+                        break
+                    self._fila.put(None)
+                    continue
+                pedido, funcao, args = item
+                pedido._executar(funcao, args)
+                with self._condicao:
+                    self._concluidos += 1
+                    self._condicao.notify_all()
+        finally:
+            banco.fechar()
+
+
+class _Leitura(QRunnable):
+    def __init__(self, pedido, funcao, args, escritas):
+        super().__init__()
+        self.pedido = pedido
+        self.funcao = funcao
+        self.args = args
+        self.escritas = escritas
+
+    def run(self):
+        # Enxerga tudo o que foi pedido ao escritor antes desta leitura
+        _escritor.aguardar(self.escritas)
+        self.pedido._executar(self.funcao, self.args)
+
+
+_escritor = None
+_leitores = None
+_pendentes = set()
+# Threads de trabalho em andamento, interrompidas por encerrar()
+_trabalhos = set()
+
+
+def _iniciar():
+    global _escritor, _leitores
+    if _escritor is None:
+        _escritor = Escritor()
+        _escritor.start()
+        _leitores = QThreadPool()
+        _leitores.setMaxThreadCount(LEITORES)
+        # Threads (e suas conexões) ficam vivas entre uma leitura e outra
+        _leitores.setExpiryTimeout(-1)
+
+
+def escrever(funcao, *args):
+    """Enfileira funcao(*args) na thread de escrita e retorna o Pedido.
+
+    As escritas rodam uma de cada vez, na ordem de chegada, venham de qual
+    janela vierem. funcao não deve mexer em objetos usados pela interface.
+    """
+    _iniciar()
+    pedido = Pedido()
+    _pendentes.add(pedido)
+    _escritor.enviar(pedido, funcao, args)
+    return pedido
+
+
+def gravar(funcao, *args):
+    """Roda funcao(*args) na thread de escrita e espera o resultado.
+
+    Para threads de trabalho (não a da interface): as gravações delas entram
+    na mesma fila que as da interface, em vez de disputar o banco em uma
+    conexão própria e falhar com "database is locked". Sem a thread de
+    escrita (fora da interface), roda aqui mesmo. Exceções são repassadas.
+    """
+    escritor = _escritor
+    if escritor is None:
+        return funcao(*args)
+    espera = _Espera()
+    escritor.enviar(espera, funcao, args)
+    espera._pronta.wait()
+    if espera.erro is not None:
+        raise espera.erro
+    return espera.resultado
+
+
+def ler(funcao, *args):
+    """Roda funcao(*args) em uma thread de leitura e retorna o Pedido.
+
+    A leitura espera as escritas enfileiradas antes dela, então sempre vê
+    o que a própria interface já mandou gravar.
+    """
+    _iniciar()
+    pedido = Pedido()
+    _pendentes.add(pedido)
+    with _escritor._condicao:
+        escritas = _escritor._enviados
+    _leitores.start(_Leitura(pedido, funcao, args, escritas))
+    return pedido
+
+
+def acompanhar(thread):
+    """Registra uma thread de trabalho (QThread) para encerrar() esperar.
+
+    A thread deve consultar isInterruptionRequested() e parar quando pedido.
+    """
+    _trabalhos.add(thread)
+    thread.finished.connect(lambda: _trabalhos.discard(thread))
+
+
+def encerrar():
+    """Termina as escritas pendentes e para as threads; chamar ao sair."""
+    global _escritor, _leitores
+    # Antes do escritor, que elas ainda podem estar usando; uma thread
+    # destruída rodando derruba o processo
+    trabalhos = list(_trabalhos)
+    for thread in trabalhos:
+        thread.requestInterruption()
+    for thread in trabalhos:
+        thread.wait()
+    _trabalhos.clear()
+    if _escritor is not None:
+        _leitores.waitForDone()
+        escritor = _escritor
+        # Daqui em diante, gravar() de threads de trabalho roda na própria thread
+        _escritor = None
+        _leitores = None
+        escritor.encerrar()
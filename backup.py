@@ -0,0 +1,522 @@
+import gzip
+import io
+import json
+import os
+import re
+from contextlib import ExitStack, contextmanager
+
+import banco
+import busca
+import diagnostico
+from utils import ESPACO_ORDEM
+
+# Início de um backup completo com ids: a lista de matérias vem dentro de um
+# objeto com a marca do banco no momento da exportação
+_CABECALHO_BASE = re.compile(r'\{\s*"tipo"\s*:\s*"base"\s*,\s*"marca"\s*:\s*(\d+)\s*,\s*"materias"\s*:\s*')
+
+# Chaves de cada matéria no backup, na ordem em que são gravadas
+LISTAS_BACKUP = (
+    ('conteudos_livros', 'livro'),
+    ('conteudos_videos', 'video'),
+    ('aulas_ao_vivo', 'aula'),
+)
+
+
+def _abrir(caminho, compactar):
+    if compactar:
+        return gzip.open(caminho, 'wt', encoding='utf-8')
+    return open(caminho, 'w', encoding='utf-8')
+
+
+def _indentar(texto, espacos):
+    prefixo = ' ' * espacos
+    return '\n'.join(prefixo + linha for linha in texto.split('\n'))
+
+
+def _item(tipo, nome, caminho, is_divisao, *identificacao):
+    if tipo == 'aula':
+        item = {"nome": nome, "caminho": caminho}
+    else:
+        item = {"nome": nome, "caminho": caminho, "is_divisao": is_divisao}
+    if identificacao:
+        item["id"], item["ordem"] = identificacao
+    return item
+
+
+def _escrever_materia(arquivo, conn, com_ids, materia_id, nome, modulo, status):
+    arquivo.write('    {\n')
+    arquivo.write(f'        "nome": {json.dumps(nome)},\n')
+    arquivo.write(f'        "modulo": {json.dumps(modulo)},\n')
+    arquivo.write(f'        "status": {json.dumps(status)},\n')
+
+    colunas = 'nome, caminho, is_divisao, id, ordem' if com_ids else 'nome, caminho, is_divisao'
+    quantidade = 0
+    for posicao, (chave, tipo) in enumerate(LISTAS_BACKUP):
+        arquivo.write(f'        {json.dumps(chave)}: ')
+        cursor = conn.execute(
+            f'SELECT {colunas} FROM conteudos WHERE materia_id=? AND tipo=? ORDER BY ordem, id',
+            (materia_id, tipo)
+        )
+        vazio = True
+        for linha in cursor:
+            arquivo.write('[\n' if vazio else ',\n')
+            arquivo.write(_indentar(json.dumps(_item(tipo, *linha), indent=4), 12))
+            vazio = False
+            quantidade += 1
+        arquivo.write('[]' if vazio else '\n        ]')
+        arquivo.write(',\n' if posicao < len(LISTAS_BACKUP) - 1 or com_ids else '\n')
+
+    if com_ids:
+        arquivo.write(f'        "id": {materia_id}\n')
+    arquivo.write('    }')
+    return quantidade
+
+
+def _marca_atual(conn):
+    """Maior instante de alteração registrado (materias, conteudos ou removidos)."""
+    return conn.execute(
+        '''SELECT MAX(marca) FROM (
+               SELECT MAX(updated_at) AS marca FROM materias
+               UNION ALL SELECT MAX(updated_at) FROM conteudos
+               UNION ALL SELECT MAX(removido_em) FROM removidos
+           )'''
+    ).fetchone()[0] or 0
+
+
+def ultima_marca():
+    """Marca do último backup registrado, ou None se nunca houve um."""
+    linha = banco.conectar().execute("SELECT valor FROM estado WHERE chave='marca_backup'").fetchone()
+    return linha[0] if linha else None
+
+
+def _registrar_marca(marca, completo):
+    with banco.transacao() as conn:
+        conn.execute(
+            "INSERT INTO estado (chave, valor) VALUES ('marca_backup', ?) "
+            "ON CONFLICT(chave) DO UPDATE SET valor=excluded.valor",
+            (marca,)
+        )
+        if completo:
+            # Exclusões anteriores à base nova não são mais necessárias
+            conn.execute('DELETE FROM removidos WHERE removido_em < ?', (marca,))
+
+
+@diagnostico.medido
+def exportar(caminho, progresso=None, cancelado=None, compactar=False, com_ids=False, escrever=None):
+    """Grava o backup em JSON lendo o banco aos poucos.
+
+    Produz o mesmo formato de json.dump(..., indent=4) sem montar a lista
+    inteira na memória. progresso(feitos, total) é chamado a cada matéria,
+    contando matérias e conteúdos; se cancelado() retornar True a exportação
+    para, o arquivo parcial é apagado e a função retorna False.
+
+    Com com_ids=True cada registro leva também "id" (e os conteúdos "ordem"),
+    a lista vai dentro de {"tipo": "base", "marca", "materias"} e a
+    exportação é registrada como base para exportar_incremental; a marca
+    permite conferir, na restauração, que o primeiro delta parte dela.
+    O registro é gravado com escrever(funcao, *args) (na interface, a fila de
+    escrita); sem escrever, nesta thread.
+    """
+    conn = banco.conectar()
+    feitos = 0
+
+    temporario = caminho + '.parcial'
+    try:
+        # Transação só de leitura: todas as consultas veem o mesmo instante
+        with _abrir(temporario, compactar) as arquivo, banco.transacao():
+            total = conn.execute('SELECT (SELECT COUNT(*) FROM materias) + (SELECT COUNT(*) FROM conteudos)').fetchone()[0]
+            marca = _marca_atual(conn)
+            if com_ids:
+                arquivo.write(f'{{"tipo": "base", "marca": {marca},\n"materias": ')
+            cursor = conn.execute('SELECT id, nome, modulo, status FROM materias ORDER BY nome')
+            vazio = True
+            for materia in cursor:
+                if cancelado is not None and cancelado():
+                    raise InterruptedError
+                arquivo.write('[\n' if vazio else ',\n')
+                vazio = False
+                feitos += 1 + _escrever_materia(arquivo, conn, com_ids, *materia)
+                if progresso is not None:
+                    progresso(feitos, total)
+            arquivo.write('[]' if vazio else '\n]')
+            if com_ids:
+                arquivo.write('}\n')
+    except InterruptedError:
+        os.remove(temporario)
+        return False
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+    os.replace(temporario, caminho)
+    if com_ids:
+        if escrever is None:
+            escrever = banco.executar
+        escrever(_registrar_marca, marca, True)
+    return True
+
+
+@diagnostico.medido
+def exportar_incremental(caminho, compactar=False, escrever=None):
+    """Grava só o que mudou desde o último backup registrado.
+
+    O arquivo é um objeto JSON {"tipo": "delta", "desde", "ate", "materias",
+    "conteudos", "removidos"} com as linhas alteradas (com id) e os ids
+    apagados. A comparação com a marca é inclusiva: uma linha alterada no
+    mesmo milissegundo da marca volta no próximo delta, o que é inofensivo
+    porque aplicar um delta é idempotente. Retorna a quantidade de registros.
+    A nova marca é registrada com escrever, como em exportar.
+    """
+    desde = ultima_marca()
+    if desde is None:
+        raise ValueError("Nenhum backup completo registrado; exporte um backup completo primeiro")
+
+    conn = banco.conectar()
+    quantidade = 0
+    temporario = caminho + '.parcial'
+    try:
+        with _abrir(temporario, compactar) as arquivo, banco.transacao():
+            ate = _marca_atual(conn)
+            arquivo.write(f'{{"tipo": "delta", "desde": {desde}, "ate": {ate},\n')
+            consultas = (
+                ('materias', 'SELECT id, nome, modulo, status FROM materias WHERE updated_at >= ?',
+                 ('id', 'nome', 'modulo', 'status')),
+                ('conteudos', 'SELECT id, materia_id, tipo, nome, caminho, is_divisao, ordem FROM conteudos WHERE updated_at >= ?',
+                 ('id', 'materia_id', 'tipo', 'nome', 'caminho', 'is_divisao', 'ordem')),
+            )
+            for chave, sql, colunas in consultas:
+                arquivo.write(f' "{chave}": [')
+                for posicao, linha in enumerate(conn.execute(sql, (desde,))):
+                    arquivo.write(',\n  ' if posicao else '\n  ')
+                    arquivo.write(json.dumps(dict(zip(colunas, linha))))
+                    quantidade += 1
+                arquivo.write('],\n')
+
+            removidos = {'materias': [], 'conteudos': []}
+            for tabela, id in conn.execute('SELECT tabela, id FROM removidos WHERE removido_em >= ?', (desde,)):
+                removidos[tabela].append(id)
+                quantidade += 1
+            arquivo.write(f' "removidos": {json.dumps(removidos)}}}\n')
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+    os.replace(temporario, caminho)
+    if escrever is None:
+        escrever = banco.executar
+    escrever(_registrar_marca, ate, False)
+    return quantidade
+
+
+def ler_materias(arquivo, tamanho_bloco=1 << 16, inicio=''):
+    """Lê a lista de matérias de um backup uma matéria por vez.
+
+    Só a matéria sendo lida fica na memória: o arquivo é consumido em blocos
+    e cada objeto da lista é decodificado com raw_decode assim que fica
+    completo no buffer. inicio é o que já foi lido do arquivo antes da lista.
+    """
+    decodificador = json.JSONDecoder()
+    buffer = inicio
+    pos = 0
+    estado = 'inicio'
+    leitura = tamanho_bloco
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+            pos += 1
+        if pos >= len(buffer):
+            buffer = arquivo.read(leitura)
+            pos = 0
+            if not buffer:
+                raise ValueError("Backup incompleto")
+            continue
+
+        caractere = buffer[pos]
+        if estado == 'inicio':
+            if caractere != '[':
+                raise ValueError("Backup inválido: esperada uma lista de matérias")
+            pos += 1
+            estado = 'primeiro'
+        elif estado in ('primeiro', 'separador') and caractere == ']':
+            return
+        elif estado == 'separador':
+            if caractere != ',':
+                raise ValueError("Backup inválido: esperado ',' entre matérias")
+            pos += 1
+            estado = 'item'
+        else:
+            try:
+                materia, fim = decodificador.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Objeto ainda incompleto: lê mais (em blocos cada vez maiores
+                # para não redecodificar objetos grandes muitas vezes)
+                bloco = arquivo.read(leitura)
+                if not bloco:
+                    raise
+                buffer = buffer[pos:] + bloco
+                pos = 0
+                leitura = max(leitura, len(buffer))
+                continue
+            yield materia
+            pos = fim
+            leitura = tamanho_bloco
+            estado = 'separador'
+
+
+@contextmanager
+def _abrir_leitura(caminho):
+    """Abre o backup (JSON puro ou gzip) como (texto, arquivo_bruto) e fecha os dois."""
+    # GzipFile não fecha o arquivo que recebe em fileobj
+    with open(caminho, 'rb') as bruto:
+        compactado = bruto.read(2) == b'\x1f\x8b'
+        bruto.seek(0)
+        binario = gzip.GzipFile(fileobj=bruto) if compactado else bruto
+        with io.TextIOWrapper(binario, encoding='utf-8') as texto:
+            yield texto, bruto
+
+
+def _ler_inicio(texto):
+    """Lê o começo de um backup aberto e retorna (tipo, marca, texto lido).
+
+    tipo é 'lista' (completo sem ids, ou com ids de versões anteriores),
+    'base' (completo com ids, com a marca da exportação) ou 'delta'. Para
+    'base', o texto lido já vem sem o cabeçalho, a partir da lista.
+    """
+    inicio = texto.read(256)
+    encontrado = _CABECALHO_BASE.match(inicio.lstrip())
+    if encontrado:
+        return 'base', int(encontrado.group(1)), inicio.lstrip()[encontrado.end():]
+    if inicio.lstrip().startswith('{'):
+        return 'delta', None, inicio
+    return 'lista', None, inicio
+
+
+def _conteudos_existentes(conn, materia_id):
+    cursor = conn.execute('SELECT tipo, nome, caminho FROM conteudos WHERE materia_id=?', (materia_id,))
+    return set(cursor)
+
+
+def _proximas_ordens(conn, materia_id):
+    cursor = conn.execute('SELECT tipo, MAX(ordem) FROM conteudos WHERE materia_id=? GROUP BY tipo', (materia_id,))
+    return {tipo: (maximo or 0) + ESPACO_ORDEM for tipo, maximo in cursor}
+
+
+@diagnostico.medido
+def importar(caminho, substituir=False, progresso=None, cancelado=None, tamanho_lote=5000):
+    """Restaura um backup gerado por exportar (JSON ou .json.gz).
+
+    Tudo acontece em uma única transação, com os conteúdos inseridos em
+    lotes por executemany. Com substituir=True a biblioteca atual é apagada
+    antes (e ids e ordens gravados com com_ids são mantidos); senão o backup
+    é mesclado: matérias com o mesmo nome e módulo recebem só os conteúdos
+    (tipo, nome, caminho) que ainda não têm, e as demais são criadas.
+    Divisões e a ordem de cada aba são preservadas. Depois de substituir, o
+    registro de exclusões é zerado; se o backup tinha ids, ele vira a base
+    dos próximos incrementais (com a marca gravada nele, quando houver),
+    senão é preciso exportar uma base nova.
+
+    progresso(bytes_lidos, bytes_total) é chamado a cada matéria. Retorna
+    (materias, conteudos, exato), com exato=True se tudo foi restaurado com
+    os ids do backup, ou None se cancelado() retornar True.
+    """
+    total_bytes = os.path.getsize(caminho)
+    conn = banco.conectar()
+    materias = conteudos = 0
+    lote = []
+    # Se todas as matérias e conteúdos trazem id (backup feito com com_ids)
+    exato = True
+
+    def gravar_lote():
+        conn.executemany(
+            'INSERT INTO conteudos (id, materia_id, tipo, nome, caminho, is_divisao, ordem) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            lote
+        )
+        lote.clear()
+
+    try:
+        with _abrir_leitura(caminho) as (texto, bruto), banco.transacao(), ExitStack() as pilha:
+            tipo_backup, marca_base, inicio = _ler_inicio(texto)
+            if tipo_backup == 'delta':
+                raise ValueError("O arquivo é um backup incremental, não um backup completo")
+            existentes = {}
+            if substituir:
+                # A biblioteca inteira muda: mais barato reconstruir a busca no fim
+                pilha.enter_context(busca.indice_suspenso(conn))
+                conn.execute('DELETE FROM materias')
+            else:
+                cursor = conn.execute('SELECT id, nome, modulo FROM materias')
+                existentes = {(nome, modulo): id for id, nome, modulo in cursor}
+
+            for dados in ler_materias(texto, inicio=inicio):
+                if cancelado is not None and cancelado():
+                    raise InterruptedError
+
+                exato = exato and "id" in dados
+                chave = (dados.get("nome", ""), dados.get("modulo", ""))
+                materia_id = existentes.get(chave)
+                if materia_id is None:
+                    cursor = conn.execute(
+                        'INSERT INTO materias (id, nome, modulo, status) VALUES (?, ?, ?, ?)',
+                        (dados.get("id") if substituir else None, chave[0], chave[1], dados.get("status", "Em andamento"))
+                    )
+                    materia_id = cursor.lastrowid
+                    ja_existem = set()
+                    ordens = {}
+                    materias += 1
+                else:
+                    ja_existem = _conteudos_existentes(conn, materia_id)
+                    ordens = _proximas_ordens(conn, materia_id)
+
+                for chave_lista, tipo in LISTAS_BACKUP:
+                    ordem = ordens.get(tipo, ESPACO_ORDEM)
+                    for item in dados.get(chave_lista, ()):
+                        nome, caminho_item = item.get("nome"), item.get("caminho")
+                        if (tipo, nome, caminho_item) in ja_existem:
+                            continue
+                        is_divisao = 1 if tipo != 'aula' and item.get("is_divisao") else 0
+                        if substituir and "ordem" in item:
+                            # Backup completo com ids: restaura exatamente, para os deltas casarem
+                            lote.append((item.get("id"), materia_id, tipo, nome, caminho_item, is_divisao, item["ordem"]))
+                        else:
+                            exato = False
+                            lote.append((None, materia_id, tipo, nome, caminho_item, is_divisao, ordem))
+                        ordem += ESPACO_ORDEM
+                        conteudos += 1
+                        if len(lote) >= tamanho_lote:
+                            gravar_lote()
+
+                if progresso is not None:
+                    progresso(bruto.tell(), total_bytes)
+
+            if lote:
+                gravar_lote()
+
+            if substituir:
+                # O DELETE acima registrou como removida cada linha restaurada;
+                # nada disso é exclusão de verdade
+                conn.execute('DELETE FROM removidos')
+                if exato and marca_base is not None:
+                    # A biblioteca é a própria base: com a marca dela, os deltas
+                    # exportados depois da base continuam valendo sobre a restauração
+                    conn.execute('UPDATE materias SET updated_at=?', (marca_base,))
+                    conn.execute('UPDATE conteudos SET updated_at=?', (marca_base,))
+                    _registrar_marca(marca_base, completo=True)
+                elif exato:
+                    # Restaurado com os ids do backup: a biblioteca é a própria base
+                    _registrar_marca(_marca_atual(conn), completo=True)
+                else:
+                    # Ids novos: deltas daqui em diante precisam de uma base nova
+                    conn.execute("DELETE FROM estado WHERE chave='marca_backup'")
+    except InterruptedError:
+        return None
+
+    return materias, conteudos, exato and substituir
+
+
+def _ler_incremental(caminho):
+    with _abrir_leitura(caminho) as (texto, _):
+        delta = json.load(texto)
+    if not isinstance(delta, dict) or delta.get("tipo") != "delta":
+        raise ValueError("O arquivo não é um backup incremental")
+    return delta
+
+
+def aplicar_incremental(caminho, desde=None):
+    """Aplica um delta de exportar_incremental em uma transação.
+
+    Se desde for informado, confere que o delta começa nessa marca. Retorna
+    a marca "ate" do delta, para encadear o próximo.
+    """
+    delta = _ler_incremental(caminho)
+    if desde is not None and delta["desde"] != desde:
+        raise ValueError("Backup incremental fora de sequência: falta um delta anterior")
+
+    removidos = delta.get("removidos", {})
+    # Uma linha removida e gravada de novo no mesmo intervalo fica só com a versão gravada
+    materias_gravadas = {materia["id"] for materia in delta.get("materias", ())}
+    conteudos_gravados = {conteudo["id"] for conteudo in delta.get("conteudos", ())}
+    with banco.transacao() as conn:
+        # Exclusões primeiro: o ON DELETE CASCADE das matérias não pode levar
+        # conteúdos que o próprio delta acabou de gravar
+        conn.executemany(
+            'DELETE FROM conteudos WHERE id=?',
+            ((id,) for id in removidos.get("conteudos", ()) if id not in conteudos_gravados)
+        )
+        conn.executemany(
+            'DELETE FROM materias WHERE id=?',
+            ((id,) for id in removidos.get("materias", ()) if id not in materias_gravadas)
+        )
+        conn.executemany(
+            '''INSERT INTO materias (id, nome, modulo, status) VALUES (:id, :nome, :modulo, :status)
+               ON CONFLICT(id) DO UPDATE SET nome=excluded.nome, modulo=excluded.modulo, status=excluded.status''',
+            delta.get("materias", ())
+        )
+        conn.executemany(
+            '''INSERT INTO conteudos (id, materia_id, tipo, nome, caminho, is_divisao, ordem)
+               VALUES (:id, :materia_id, :tipo, :nome, :caminho, :is_divisao, :ordem)
+               ON CONFLICT(id) DO UPDATE SET materia_id=excluded.materia_id, tipo=excluded.tipo,
+                   nome=excluded.nome, caminho=excluded.caminho, is_divisao=excluded.is_divisao,
+                   ordem=excluded.ordem''',
+            delta.get("conteudos", ())
+        )
+    return delta["ate"]
+
+
+def _inicio_do_arquivo(caminho):
+    with _abrir_leitura(caminho) as (texto, _):
+        return _ler_inicio(texto)
+
+
+def eh_incremental(caminho):
+    return _inicio_do_arquivo(caminho)[0] == 'delta'
+
+
+@diagnostico.medido
+def restaurar(caminhos, substituir=False, progresso=None, cancelado=None):
+    """Restaura no máximo uma base e uma cadeia de deltas, em uma transação.
+
+    A base (backup completo) é importada primeiro, com importar; os deltas
+    são aplicados depois, do mais antigo para o mais novo, e precisam formar
+    uma sequência que começa na marca da base. Como os deltas se referem aos
+    ids da base, uma base com deltas só pode ser restaurada com
+    substituir=True e precisa ter sido exportada com ids; senão nada é
+    alterado e ValueError é levantado. Bases com ids de versões anteriores
+    não guardam a marca, e aí só a sequência entre os deltas é conferida.
+    Retorna (materias, conteudos) importados da base, (0, 0) se só houver
+    deltas, ou None se cancelado.
+    """
+    inicios = {caminho: _inicio_do_arquivo(caminho) for caminho in caminhos}
+    bases = [caminho for caminho in caminhos if inicios[caminho][0] != 'delta']
+    deltas = [caminho for caminho in caminhos if caminho not in bases]
+    if len(bases) > 1:
+        raise ValueError("Selecione no máximo um backup completo")
+    if bases and deltas and not substituir:
+        raise ValueError("Para aplicar deltas sobre um backup completo, use o modo substituir")
+    deltas.sort(key=lambda caminho: _ler_incremental(caminho)["desde"])
+
+    resultado = (0, 0)
+    marca = None
+    try:
+        # Uma base sem ids ou um delta fora de sequência desfaz também a base
+        with banco.transacao():
+            if bases:
+                importado = importar(bases[0], substituir, progresso, cancelado)
+                if importado is None:
+                    raise InterruptedError
+                materias, conteudos, exato = importado
+                if deltas and not exato:
+                    raise ValueError(
+                        "O backup completo não tem ids (exportado sem registrar a base); "
+                        "os deltas só podem ser aplicados sobre a base exportada com ids"
+                    )
+                resultado = (materias, conteudos)
+                marca = inicios[bases[0]][1]
+
+            for caminho in deltas:
+                if cancelado is not None and cancelado():
+                    raise InterruptedError
+                marca = aplicar_incremental(caminho, marca)
+    except InterruptedError:
+        return None
+    return resultado
@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import diagnostico
+
+CAMINHO_BANCO = 'material.db'
+
+# Ajustes aplicados a cada conexão nova
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),      # ~16 MB (valor negativo = KiB)
+    ('mmap_size', 268435456),    # 256 MB
+    ('temp_store', 'MEMORY'),
+    ('foreign_keys', 'ON'),
+)
+
+_local = threading.local()
+
+
+def _configurar(conn):
+    for nome, valor in PRAGMAS:
+        conn.execute(f'PRAGMA {nome}={valor}')
+
+
+def conectar():
+    """Retorna a conexão da thread atual, abrindo-a na primeira chamada."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(CAMINHO_BANCO, factory=diagnostico.ConexaoMedida)
+        _configurar(conn)
+        _local.conn = conn
+        _local.profundidade = 0
+    diagnostico.configurar(conn)
+    return conn
+
+
+def executar(funcao, *args):
+    """Roda funcao(*args) nesta thread.
+
+    É o escrever padrão das funções que aceitam um (verificar,
+    atualizar_hashes, as exportações de backup): a interface passa no lugar
+    assincrono.gravar.
+    """
+    return funcao(*args)
+
+
+def fechar():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+        _local.profundidade = 0
+
+
+@contextmanager
+def transacao():
+    """Agrupa várias escritas em um único commit.
+
+    Pode ser aninhada: só o bloco mais externo faz commit (ou rollback).
+    """
+    conn = conectar()
+    if _local.profundidade == 0 and not conn.in_transaction:
+        # BEGIN explícito para que DDL também fique dentro da transação
+        conn.execute('BEGIN')
+    _local.profundidade += 1
+    try:
+        yield conn
+    except Exception:
+        _local.profundidade -= 1
+        if _local.profundidade == 0:
+            conn.rollback()
+        raise
+    else:
+        _local.profundidade -= 1
+        if _local.profundidade == 0:
+            conn.commit()
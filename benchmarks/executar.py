@@ -0,0 +1,340 @@
+"""Benchmarks de desempenho sem janela (plataforma offscreen do Qt).
+
+    python benchmarks/executar.py --escala media --saida resultado.json
+    python benchmarks/executar.py --banco meu.db --comparar base.json
+
+Sem --banco, uma biblioteca sintética é gerada por gerar_biblioteca. O banco
+é copiado para uma pasta temporária antes de medir, então o original nunca
+é alterado. O resultado é um JSON com o tempo de cada operação (mediana,
+mínimo e máximo em ms) e a memória ocupada pela biblioteca carregada; com
+--comparar, medianas e memória são comparadas às de um resultado anterior e
+o código de saída é 1 se alguma piorou além da tolerância.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import banco
+import gerar_biblioteca
+
+TEXTOS_BUSCA = ('calc', 'álgebra linear', 'redes 12', 'mp4', 'zzz')
+TOLERANCIA = 0.25
+
+
+def medir(funcao, repeticoes, preparar=None):
+    """Tempos de funcao() em ms; preparar() roda antes de cada uma, fora da medição."""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def resumir(tempos):
+    return {
+        'mediana_ms': round(statistics.median(tempos), 3),
+        'min_ms': round(min(tempos), 3),
+        'max_ms': round(max(tempos), 3),
+        'repeticoes': len(tempos),
+    }
+
+
+def _inicializacao_filho(caminho):
+    """Roda no processo filho: importa o app, abre a janela e espera a primeira
+    pintura e depois a lista vinda do banco, que também grava o instantâneo
+    usado na próxima abertura."""
+    inicio = time.perf_counter()
+    banco.CAMINHO_BANCO = caminho
+    import main
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+    importado = time.perf_counter()
+
+    app = QApplication([])
+    janela = main.MainWindow()
+    janela.show()
+    QTimer.singleShot(0, app.quit)
+    app.exec_()
+    pintado = time.perf_counter()
+    while not janela.botao_add_materia.isEnabled():
+        app.processEvents()
+        time.sleep(0.001)
+    conferido = time.perf_counter()
+    print(json.dumps({
+        'importacao': (importado - inicio) * 1000,
+        'primeira_pintura': (pintado - inicio) * 1000,
+        'lista_do_banco': (conferido - inicio) * 1000,
+    }))
+    sys.stdout.flush()
+    # Sem esperar o encerramento das threads do app: só a abertura interessa
+    os._exit(0)
+
+
+def medir_inicializacao(caminho, repeticoes):
+    """Abertura em processos novos, como o usuário vê.
+
+    Uma abertura extra, fora da medição, deixa o instantâneo da sessão
+    anterior gravado e o banco no cache do sistema.
+    """
+    resultados = {}
+    for repeticao in range(repeticoes + 1):
+        inicio = time.perf_counter()
+        saida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--inicializacao', caminho],
+            check=True, capture_output=True, text=True, cwd=os.path.dirname(caminho)
+        ).stdout
+        total = (time.perf_counter() - inicio) * 1000
+        if repeticao == 0:
+            continue
+        resultados.setdefault('inicializacao_processo', []).append(total)
+        for nome, ms in json.loads(saida.strip().splitlines()[-1]).items():
+            resultados.setdefault(f'inicializacao_{nome}', []).append(ms)
+    return resultados
+
+
+def medir_no_processo(caminho, pasta, repeticoes):
+    """Operações medidas com o app já carregado neste processo."""
+    banco.CAMINHO_BANCO = caminho
+    import main
+    import backup
+    import busca
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+    main.criar_banco_dados()
+    janela = main.MainWindow()
+    # Espera a janela abrir o banco e trocar o instantâneo pela lista real
+    while not janela.botao_add_materia.isEnabled():
+        app.processEvents()
+        time.sleep(0.001)
+    resultados = {}
+
+    resultados['carregar_cabecalhos'] = medir(main.Materia.carregar_cabecalhos, repeticoes)
+    resultados['carregar_todas'] = medir(main.Materia.carregar_todas, max(1, repeticoes // 2))
+
+    def atualizar_lista():
+        janela.materias_recarregadas(main.Materia.carregar_cabecalhos())
+        app.processEvents()
+    resultados['atualizar_lista'] = medir(atualizar_lista, repeticoes)
+
+    # A maior matéria, com a aba de livros mais longa
+    maior_id = banco.conectar().execute(
+        "SELECT materia_id FROM conteudos WHERE tipo='livro' GROUP BY materia_id ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()
+    if maior_id is None:
+        raise SystemExit("O banco não tem conteúdos para medir")
+    cabecalho = next(materia for materia in janela.materias if materia.id == maior_id[0])
+    resultados['abrir_materia'] = medir(lambda: main.CacheMaterias.carregar(cabecalho), repeticoes)
+
+    def mostrar_materia():
+        janela_materia = main.JanelaMateria(main.CacheMaterias.carregar(cabecalho), janela)
+        janela_materia.show()
+        app.processEvents()
+        janela_materia.close()
+        janela_materia.deleteLater()
+    resultados['mostrar_materia'] = medir(mostrar_materia, repeticoes)
+
+    # As reordenações medem a aba inteira, não só a primeira página
+    materia = main.CacheMaterias.carregar(cabecalho)
+    materia.carregar_conteudos()
+
+    aleatorio = random.Random(0)
+
+    def mover_um():
+        livros = list(materia.conteudos_livros)
+        livros.insert(aleatorio.randrange(len(livros)), livros.pop(aleatorio.randrange(len(livros))))
+        materia.atualizar_ordem_conteudos('livro', livros)
+    resultados['reordenar_um'] = medir(mover_um, repeticoes)
+    resultados['reordenar_inverter'] = medir(
+        lambda: materia.atualizar_ordem_conteudos('livro', materia.conteudos_livros[::-1]),
+        max(1, repeticoes // 2)
+    )
+
+    conteudo = main.Conteudo('benchmark.pdf', '/biblioteca/benchmark.pdf', 'livro')
+    resultados['adicionar_conteudo'] = medir(
+        lambda: materia.adicionar_conteudo(conteudo),
+        repeticoes,
+        preparar=lambda: setattr(conteudo, 'id', None)
+    )
+
+    for texto in TEXTOS_BUSCA:
+        resultados[f'buscar[{texto}]'] = medir(lambda: busca.buscar(texto), repeticoes)
+        resultados[f'materias_correspondentes[{texto}]'] = medir(
+            lambda: busca.materias_correspondentes(texto), repeticoes
+        )
+    indice = busca.IndiceMaterias(janela.materias)
+    resultados['indice_nomes_digitando'] = medir(
+        lambda: [indice.filtrar('calculo'[:fim]) for fim in range(1, 8)], repeticoes
+    )
+
+    arquivo_backup = os.path.join(pasta, 'backup.json')
+    resultados['exportar_backup'] = medir(lambda: backup.exportar(arquivo_backup), max(1, repeticoes // 2))
+    resultados['exportar_backup_gz'] = medir(
+        lambda: backup.exportar(arquivo_backup + '.gz', compactar=True), max(1, repeticoes // 2)
+    )
+
+    # Importação em um banco vazio, recriado antes de cada repetição
+    destino = os.path.join(pasta, 'importado.db')
+
+    def banco_vazio():
+        banco.fechar()
+        for sufixo in ('', '-wal', '-shm'):
+            if os.path.exists(destino + sufixo):
+                os.remove(destino + sufixo)
+        banco.CAMINHO_BANCO = destino
+        main.migracoes.migrar()
+    resultados['importar_backup'] = medir(
+        lambda: backup.importar(arquivo_backup), max(1, repeticoes // 2), preparar=banco_vazio
+    )
+    resultados['importar_backup_substituir'] = medir(
+        lambda: backup.importar(arquivo_backup, substituir=True), max(1, repeticoes // 2)
+    )
+
+    janela.close()
+    main.assincrono.encerrar()
+    banco.fechar()
+    return resultados
+
+
+def medir_memoria(caminho, conteudos):
+    """Bytes alocados pela biblioteca inteira carregada com Materia.carregar_todas."""
+    banco.CAMINHO_BANCO = caminho
+    import main
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        materias = main.Materia.carregar_todas()
+        alocados = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del materias
+    banco.fechar()
+    return {
+        'carregar_todas_bytes': alocados,
+        'bytes_por_conteudo': round(alocados / conteudos, 1) if conteudos else 0.0,
+    }
+
+
+def descrever_banco(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        materias, conteudos = conn.execute(
+            'SELECT (SELECT COUNT(*) FROM materias), (SELECT COUNT(*) FROM conteudos)'
+        ).fetchone()
+    finally:
+        conn.close()
+    return {'materias': materias, 'conteudos': conteudos, 'bytes': os.path.getsize(caminho)}
+
+
+def comparar(atual, anterior, tolerancia):
+    """Imprime a diferença de cada mediana e retorna os nomes que pioraram além da tolerância."""
+    piores = []
+    for nome, bytes_atuais in atual.get('memoria', {}).items():
+        bytes_anteriores = anterior.get('memoria', {}).get(nome)
+        if not bytes_anteriores:
+            print(f"{nome:45} {bytes_atuais:>13}   (novo)")
+            continue
+        razao = bytes_atuais / bytes_anteriores
+        marca = ''
+        if razao > 1 + tolerancia:
+            marca = '  PIOROU'
+            piores.append(nome)
+        print(f"{nome:45} {bytes_atuais:>13}  {bytes_anteriores:>13}  {razao - 1:+7.1%}{marca}")
+    for nome, medida in atual['resultados'].items():
+        base = anterior['resultados'].get(nome)
+        if base is None:
+            print(f"{nome:45} {medida['mediana_ms']:>10.2f} ms   (novo)")
+            continue
+        razao = medida['mediana_ms'] / base['mediana_ms'] if base['mediana_ms'] else 1.0
+        marca = ''
+        if razao > 1 + tolerancia:
+            marca = '  PIOROU'
+            piores.append(nome)
+        print(f"{nome:45} {medida['mediana_ms']:>10.2f} ms  {base['mediana_ms']:>10.2f} ms  {razao - 1:+7.1%}{marca}")
+    return piores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--banco', help='banco a medir (padrão: gerar um sintético)')
+    parser.add_argument('--escala', choices=gerar_biblioteca.ESCALAS, default='pequena')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--saida', help='arquivo JSON com os resultados')
+    parser.add_argument('--comparar', help='resultado anterior para comparar as medianas')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA, help='piora aceita (0.25 = 25%%)')
+    parser.add_argument('--inicializacao', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.inicializacao:
+        _inicializacao_filho(args.inicializacao)
+        return
+
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as pasta:
+        # Instantâneo das matérias e miniaturas longe do cache do usuário
+        os.environ['XDG_CACHE_HOME'] = os.path.join(pasta, 'cache')
+        caminho = os.path.join(pasta, 'material.db')
+        if args.banco:
+            shutil.copyfile(args.banco, caminho)
+        else:
+            gerar_biblioteca.gerar(caminho, *gerar_biblioteca.ESCALAS[args.escala])
+        descricao = descrever_banco(caminho)
+
+        tempos = medir_inicializacao(caminho, args.repeticoes)
+        memoria = medir_memoria(caminho, descricao['conteudos'])
+        tempos.update(medir_no_processo(caminho, pasta, args.repeticoes))
+
+    resultado = {
+        'ambiente': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'plataforma': platform.platform(),
+            'processador': platform.processor() or platform.machine(),
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'banco': dict(descricao, origem=args.banco or f'sintetico:{args.escala}'),
+        'memoria': memoria,
+        'resultados': {nome: resumir(valores) for nome, valores in tempos.items()},
+    }
+
+    texto = json.dumps(resultado, indent=4, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        piores = comparar(resultado, anterior, args.tolerancia)
+        if piores:
+            print(f"{len(piores)} medida(s) piorou(aram) mais de {args.tolerancia:.0%}")
+            sys.exit(1)
+    elif not args.saida:
+        print(texto)
+    else:
+        for nome, valor in resultado['memoria'].items():
+            print(f"{nome:45} {valor:>13}")
+        for nome, medida in resultado['resultados'].items():
+            print(f"{nome:45} {medida['mediana_ms']:>10.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
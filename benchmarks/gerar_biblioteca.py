@@ -0,0 +1,144 @@
+"""Gera um material.db sintético para os benchmarks.
+
+    python benchmarks/gerar_biblioteca.py saida.db --escala grande
+    python benchmarks/gerar_biblioteca.py saida.db --materias 500 --conteudos 20000
+
+O banco sai já na versão atual das migrações. A mesma semente gera sempre a
+mesma biblioteca, para que execuções diferentes meçam os mesmos dados.
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco
+import busca
+import migracoes
+from utils import ESPACO_ORDEM
+
+# (matérias, conteúdos)
+ESCALAS = {
+    'pequena': (100, 1_000),
+    'media': (1_000, 100_000),
+    'grande': (10_000, 1_000_000),
+}
+
+# Proporção de cada aba e chance de uma divisão antes do próximo item
+TIPOS = (('livro', 0.6), ('video', 0.3), ('aula', 0.1))
+CHANCE_DIVISAO = 0.05
+
+# A maior matéria recebe essa fração dos conteúdos, para medir abas enormes
+FRACAO_MAIOR = 0.05
+
+TAMANHO_LOTE = 10_000
+
+PALAVRAS = (
+    'Cálculo', 'Álgebra', 'Linear', 'Física', 'Química', 'Orgânica', 'História',
+    'Estruturas', 'Dados', 'Redes', 'Sistemas', 'Operacionais', 'Compiladores',
+    'Estatística', 'Probabilidade', 'Geometria', 'Analítica', 'Programação',
+    'Banco', 'Engenharia', 'Software', 'Economia', 'Direito', 'Filosofia',
+)
+EXTENSOES = {'livro': ('.pdf', '.docx', '.pptx', '.txt'), 'video': ('.mp4', '.mkv')}
+STATUS = ('Em andamento', 'Concluída', 'Pendente')
+
+
+def _nome(aleatorio, palavras):
+    return ' '.join(aleatorio.sample(PALAVRAS, palavras))
+
+
+def _distribuir(aleatorio, conteudos, materias):
+    """Quantos conteúdos vai cada matéria: uma bem maior e o resto sorteado."""
+    if materias == 0:
+        return []
+    maior = int(conteudos * FRACAO_MAIOR) if materias > 1 else conteudos
+    quantidades = [0] * materias
+    quantidades[0] = maior
+    for _ in range(conteudos - maior):
+        quantidades[aleatorio.randrange(1, materias) if materias > 1 else 0] += 1
+    return quantidades
+
+
+def _linhas_materia(aleatorio, materia_id, quantidade):
+    ordens = {}
+    pasta = f'/biblioteca/materia{materia_id}'
+    for posicao in range(quantidade):
+        tipo = aleatorio.choices([tipo for tipo, _ in TIPOS], [peso for _, peso in TIPOS])[0]
+        ordem = ordens.get(tipo, 0) + ESPACO_ORDEM
+        ordens[tipo] = ordem
+        if tipo != 'aula' and aleatorio.random() < CHANCE_DIVISAO:
+            yield (materia_id, tipo, f'Unidade {posicao}', '', 1, ordem)
+            continue
+        nome = f'{_nome(aleatorio, 2)} {posicao}'
+        if tipo == 'aula':
+            caminho = f'https://aulas.exemplo.com/{materia_id}/{posicao}'
+        else:
+            nome += aleatorio.choice(EXTENSOES[tipo])
+            caminho = f'{pasta}/{nome}'
+        yield (materia_id, tipo, nome, caminho, 0, ordem)
+
+
+def gerar(caminho, materias, conteudos, semente=0):
+    """Cria o banco em caminho (que não pode existir) e retorna (matérias, conteúdos)."""
+    if os.path.exists(caminho):
+        raise FileExistsError(caminho)
+    aleatorio = random.Random(semente)
+
+    anterior = banco.CAMINHO_BANCO
+    banco.fechar()
+    banco.CAMINHO_BANCO = caminho
+    try:
+        migracoes.migrar()
+        conn = banco.conectar()
+        # Busca reconstruída uma vez no fim, como na importação de backup
+        with banco.transacao(), busca.indice_suspenso(conn):
+            conn.executemany(
+                'INSERT INTO materias (id, nome, modulo, status) VALUES (?, ?, ?, ?)',
+                (
+                    (id, f'{_nome(aleatorio, 3)} {id}', str(aleatorio.randint(1, 10)), aleatorio.choice(STATUS))
+                    for id in range(1, materias + 1)
+                )
+            )
+            lote = []
+            for materia_id, quantidade in enumerate(_distribuir(aleatorio, conteudos, materias), 1):
+                for linha in _linhas_materia(aleatorio, materia_id, quantidade):
+                    lote.append(linha)
+                    if len(lote) >= TAMANHO_LOTE:
+                        conn.executemany(
+                            'INSERT INTO conteudos (materia_id, tipo, nome, caminho, is_divisao, ordem) VALUES (?, ?, ?, ?, ?, ?)',
+                            lote
+                        )
+                        lote = []
+            if lote:
+                conn.executemany(
+                    'INSERT INTO conteudos (materia_id, tipo, nome, caminho, is_divisao, ordem) VALUES (?, ?, ?, ?, ?, ?)',
+                    lote
+                )
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        banco.fechar()
+        banco.CAMINHO_BANCO = anterior
+    return materias, conteudos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('saida', help='caminho do banco a criar')
+    parser.add_argument('--escala', choices=ESCALAS, default='pequena')
+    parser.add_argument('--materias', type=int, help='substitui a quantidade da escala')
+    parser.add_argument('--conteudos', type=int, help='substitui a quantidade da escala')
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    materias, conteudos = ESCALAS[args.escala]
+    if args.materias is not None:
+        materias = args.materias
+    if args.conteudos is not None:
+        conteudos = args.conteudos
+    gerar(args.saida, materias, conteudos, args.semente)
+    print(f"{args.saida}: {materias} matérias, {conteudos} conteúdos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import re
+from contextlib import contextmanager
+
+import banco
+import diagnostico
+from utils import normalizar
+
+
+def montar_consulta(texto):
+    """Converte o texto digitado em uma consulta FTS5 por prefixo.
+
+    Cada palavra vira um termo entre aspas com '*', o que também evita que
+    caracteres como '-' ou ':' sejam lidos como operadores.
+    """
+    termos = re.findall(r'\w+', texto)
+    return ' '.join(f'"{termo}"*' for termo in termos)
+
+
+@diagnostico.medido
+def buscar(texto, limite=500):
+    """Busca em matérias e conteúdos, do mais ao menos relevante.
+
+    Retorna (materia_ids, conteudos). materia_ids traz primeiro as matérias
+    encontradas pelo nome, módulo ou status e depois as que só aparecem por
+    algum conteúdo. conteudos é uma lista de tuplas
+    (id, materia_id, tipo, nome, caminho, is_divisao).
+    """
+    consulta = montar_consulta(texto)
+    if not consulta:
+        return [], []
+
+    conn = banco.conectar()
+    materia_ids = [
+        id for (id,) in conn.execute(
+            'SELECT rowid FROM materias_fts WHERE materias_fts MATCH ? ORDER BY rank LIMIT ?',
+            (consulta, limite)
+        )
+    ]
+    conteudos = conn.execute(
+        '''SELECT c.id, c.materia_id, c.tipo, c.nome, c.caminho, c.is_divisao
+           FROM conteudos_fts f JOIN conteudos c ON c.id = f.rowid
+           WHERE conteudos_fts MATCH ? ORDER BY f.rank LIMIT ?''',
+        (consulta, limite)
+    ).fetchall()
+
+    vistos = set(materia_ids)
+    for conteudo in conteudos:
+        if conteudo[1] not in vistos:
+            vistos.add(conteudo[1])
+            materia_ids.append(conteudo[1])
+    return materia_ids, conteudos
+
+
+@diagnostico.medido
+def materias_correspondentes(texto):
+    """Conjunto de ids das matérias que casam com o texto por si ou por algum conteúdo."""
+    consulta = montar_consulta(texto)
+    if not consulta:
+        return set()
+
+    cursor = banco.conectar().execute(
+        '''SELECT rowid FROM materias_fts WHERE materias_fts MATCH ?
+           UNION
+           SELECT c.materia_id FROM conteudos_fts f JOIN conteudos c ON c.id = f.rowid
+           WHERE conteudos_fts MATCH ?''',
+        (consulta, consulta)
+    )
+    return {id for (id,) in cursor}
+
+
+@contextmanager
+def indice_suspenso(conn):
+    """Desliga os triggers da busca durante uma carga em massa.
+
+    Ao sair, o índice é reconstruído de uma vez e os triggers voltam. Deve
+    ser usado dentro de uma transação, para que a troca seja atômica: com
+    uma exceção, o rollback desfaz a carga junto com o índice.
+    """
+    if not conn.in_transaction:
+        raise RuntimeError("indice_suspenso precisa de uma transação aberta")
+    triggers = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name LIKE '%\\_fts\\_%' ESCAPE '\\'"
+    ).fetchall()
+    for nome, _ in triggers:
+        conn.execute(f'DROP TRIGGER {nome}')
+    try:
+        yield
+        conn.execute("INSERT INTO materias_fts (materias_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO conteudos_fts (conteudos_fts) VALUES ('rebuild')")
+    finally:
+        # Mesmo com erro: quem tratar a exceção e seguir na transação não fica sem triggers
+        for _, sql in triggers:
+            conn.execute(sql)
+
+
+class IndiceMaterias:
+    """Índice em memória dos nomes das matérias para o filtro da tela principal.
+
+    Os nomes ficam guardados já normalizados (minúsculas, sem acentos), mas só
+    são normalizados na primeira busca, para não pesar na abertura. Quando a
+    nova consulta contém a anterior, só o resultado anterior é filtrado.
+    """
+    def __init__(self, materias=()):
+        self.definir(materias)
+
+    def definir(self, materias):
+        self.por_id = {materia.id: materia for materia in materias}
+        self._nomes = None
+        self._descartar_resultado()
+
+    def preparar(self):
+        """Normaliza os nomes agora, para a primeira busca não pagar por isso."""
+        self._normalizados()
+
+    def _normalizados(self):
+        if self._nomes is None:
+            self._nomes = {id: normalizar(materia.nome) for id, materia in self.por_id.items()}
+        return self._nomes
+
+    def atualizar(self, materia):
+        self.por_id[materia.id] = materia
+        if self._nomes is not None:
+            self._nomes[materia.id] = normalizar(materia.nome)
+        self._descartar_resultado()
+
+    def remover(self, materia_id):
+        self.por_id.pop(materia_id, None)
+        if self._nomes is not None:
+            self._nomes.pop(materia_id, None)
+        self._descartar_resultado()
+
+    def _descartar_resultado(self):
+        self._ultima_consulta = None
+        self._ultimo_resultado = None
+
+    def filtrar(self, texto):
+        """Ids das matérias cujo nome contém o texto."""
+        consulta = normalizar(texto).strip()
+        if not consulta:
+            self._descartar_resultado()
+            return set(self.por_id)
+
+        nomes = self._normalizados()
+        if self._ultima_consulta is not None and self._ultima_consulta in consulta:
+            candidatos = self._ultimo_resultado
+        else:
+            candidatos = nomes.keys()
+
+        resultado = {id for id in candidatos if consulta in nomes[id]}
+        self._ultima_consulta = consulta
+        self._ultimo_resultado = resultado
+        return resultado
@@ -0,0 +1,241 @@
+"""Biblioteca de matérias pela linha de comando, sem abrir a interface.
+
+    python -m cli listar
+    python -m cli listar "Cálculo" --tipo livro
+    python -m cli buscar "integral"
+    python -m cli adicionar "Cálculo" ~/apostilas aula1.pdf https://youtu.be/x
+    python -m cli exportar backup.json.gz
+    python -m cli importar backup.json.gz delta1.json
+    python -m cli mover 123 1
+
+Não importa o PyQt5: serve para scripts e backups agendados. O banco é
+atualizado para a versão atual das migrações antes de cada comando.
+"""
+import argparse
+import os
+import sys
+
+import arquivos
+import backup
+import banco
+import busca
+import migracoes
+from dominio import TAMANHO_PAGINA, Materia
+from utils import eh_link, normalizar
+
+ROTULOS = {'livro': 'Livros', 'video': 'Vídeos', 'aula': 'Aulas ao Vivo'}
+
+# Linhas gravadas por transação ao adicionar pastas grandes
+TAMANHO_LOTE = 5000
+
+
+def _materia(argumento, obrigatoria=True):
+    """Matéria pelo id ou pelo nome (sem diferenciar maiúsculas e acentos).
+
+    Se não houver nenhuma, sai com erro, ou retorna None com obrigatoria=False.
+    """
+    if argumento.isdigit():
+        linha = banco.conectar().execute(
+            'SELECT id, nome, modulo, status, pasta FROM materias WHERE id=?', (int(argumento),)
+        ).fetchone()
+        if linha is None:
+            raise SystemExit(f"Matéria {argumento} não encontrada")
+        return Materia(*linha)
+
+    nome = normalizar(argumento).strip()
+    encontradas = [materia for materia in Materia.carregar_cabecalhos() if normalizar(materia.nome) == nome]
+    if not encontradas:
+        if not obrigatoria:
+            return None
+        raise SystemExit(f"Matéria '{argumento}' não encontrada")
+    if len(encontradas) > 1:
+        ids = ', '.join(str(materia.id) for materia in encontradas)
+        raise SystemExit(f"Há mais de uma matéria '{argumento}' (ids {ids}); use o id")
+    return encontradas[0]
+
+
+def listar(args):
+    if args.materia is None:
+        quantidades = {}
+        for materia_id, tipo, quantidade in banco.conectar().execute(
+            'SELECT materia_id, tipo, COUNT(*) FROM conteudos WHERE is_divisao=0 GROUP BY materia_id, tipo'
+        ):
+            quantidades[materia_id, tipo] = quantidade
+        for materia in Materia.carregar_cabecalhos():
+            contagem = '\t'.join(str(quantidades.get((materia.id, tipo), 0)) for tipo in ROTULOS)
+            print(f"{materia.id}\t{materia.nome}\t{materia.modulo}\t{materia.status}\t{contagem}")
+        return
+
+    materia = _materia(args.materia)
+    print(materia)
+    for tipo in [args.tipo] if args.tipo else ROTULOS:
+        print(f"\n{ROTULOS[tipo]}:")
+        # Página por página, para abas grandes não ficarem inteiras na memória
+        posicao = 0
+        depois = None
+        while True:
+            linhas = Materia.ler_pagina(materia.id, tipo, depois)
+            for id, nome, caminho, _, is_divisao, *_ in linhas[:TAMANHO_PAGINA]:
+                posicao += 1
+                if is_divisao:
+                    print(f"{posicao}\t{id}\t== {nome} ==")
+                else:
+                    print(f"{posicao}\t{id}\t{nome}\t{caminho}")
+            if len(linhas) <= TAMANHO_PAGINA:
+                break
+            ultima = linhas[TAMANHO_PAGINA - 1]
+            depois = (ultima[5], ultima[0])
+
+
+def buscar(args):
+    materia_ids, conteudos = busca.buscar(args.texto, args.limite)
+    if not materia_ids:
+        print("Nada encontrado.")
+        return
+    nomes = dict(banco.conectar().execute(
+        f"SELECT id, nome FROM materias WHERE id IN ({','.join('?' * len(materia_ids))})", materia_ids
+    ).fetchall())
+    print("Matérias:")
+    for materia_id in materia_ids:
+        print(f"{materia_id}\t{nomes.get(materia_id, '')}")
+    if conteudos:
+        print("\nConteúdos:")
+        for id, materia_id, tipo, nome, caminho, is_divisao in conteudos:
+            print(f"{id}\t{nomes.get(materia_id, '')}\t{tipo}\t{nome}\t{caminho}")
+
+
+def _linhas_para_adicionar(caminhos, tipo_forcado, aulas):
+    """Gera (tipo, nome, caminho, is_divisao) para links, arquivos e pastas."""
+    for caminho in caminhos:
+        if eh_link(caminho):
+            aulas += 1
+            yield (tipo_forcado or 'aula', f"Aula {aulas}", caminho, False)
+        elif os.path.isdir(caminho):
+            for linha in arquivos.percorrer(caminho):
+                if tipo_forcado is None or linha[0] == tipo_forcado:
+                    yield linha
+        elif os.path.isfile(caminho):
+            nome = os.path.basename(caminho)
+            tipo = tipo_forcado or arquivos.tipo_do_arquivo(nome)
+            if tipo is None:
+                print(f"Ignorado (tipo desconhecido, use --tipo): {caminho}", file=sys.stderr)
+                continue
+            yield (tipo, nome, os.path.abspath(caminho), False)
+        else:
+            print(f"Ignorado (não encontrado): {caminho}", file=sys.stderr)
+
+
+def adicionar(args):
+    materia = _materia(args.materia, obrigatoria=not args.criar)
+    if materia is None:
+        materia = Materia(nome=args.materia, modulo=args.modulo)
+        materia.salvar()
+        print(f"Matéria criada: {materia.id}\t{materia.nome}")
+
+    conn = banco.conectar()
+    aulas = conn.execute(
+        "SELECT COUNT(*) FROM conteudos WHERE materia_id=? AND tipo='aula'", (materia.id,)
+    ).fetchone()[0]
+    total = 0
+    lote = []
+    with banco.transacao():
+        for linha in _linhas_para_adicionar(args.caminhos, args.tipo, aulas):
+            lote.append(linha)
+            if len(lote) >= TAMANHO_LOTE:
+                total += len(Materia.inserir_conteudos(materia.id, lote))
+                lote = []
+        if lote:
+            total += len(Materia.inserir_conteudos(materia.id, lote))
+    print(f"{total} itens adicionados a {materia.nome}")
+
+
+def exportar(args):
+    compactar = args.gz or args.saida.endswith('.gz')
+    if args.incremental:
+        try:
+            quantidade = backup.exportar_incremental(args.saida, compactar)
+        except ValueError as e:
+            raise SystemExit(f"Erro ao exportar: {e}")
+        print(f"{quantidade} alterações salvas em {args.saida}")
+    else:
+        backup.exportar(args.saida, compactar=compactar, com_ids=args.com_ids)
+        print(f"Backup salvo em {args.saida}")
+
+
+def importar(args):
+    try:
+        materias, conteudos = backup.restaurar(args.arquivos, args.substituir)
+    except ValueError as e:
+        raise SystemExit(f"Erro ao importar: {e}")
+    print(f"{materias} matérias e {conteudos} conteúdos importados")
+
+
+def mover(args):
+    linha = banco.conectar().execute(
+        'SELECT materia_id, tipo FROM conteudos WHERE id=?', (args.conteudo,)
+    ).fetchone()
+    if linha is None:
+        raise SystemExit(f"Conteúdo {args.conteudo} não encontrado")
+    materia_id, tipo = linha
+
+    materia = Materia(materia_id)
+    materia.carregar_conteudos()
+    conteudos = list(materia.conteudos_do_tipo(tipo))
+    origem = next(posicao for posicao, conteudo in enumerate(conteudos) if conteudo.id == args.conteudo)
+    conteudo = conteudos.pop(origem)
+    destino = min(max(args.posicao, 1), len(conteudos) + 1) - 1
+    conteudos.insert(destino, conteudo)
+    materia.atualizar_ordem_conteudos(tipo, conteudos)
+    print(f"{conteudo.nome}: posição {origem + 1} -> {destino + 1} em {ROTULOS[tipo]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m cli', description=__doc__.splitlines()[0])
+    parser.add_argument('--banco', default=banco.CAMINHO_BANCO, help='arquivo do banco (padrão: %(default)s)')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    comando = comandos.add_parser('listar', help='matérias, ou os conteúdos de uma matéria')
+    comando.add_argument('materia', nargs='?', help='id ou nome da matéria')
+    comando.add_argument('--tipo', choices=ROTULOS)
+    comando.set_defaults(funcao=listar)
+
+    comando = comandos.add_parser('buscar', help='busca em matérias e conteúdos')
+    comando.add_argument('texto')
+    comando.add_argument('--limite', type=int, default=50)
+    comando.set_defaults(funcao=buscar)
+
+    comando = comandos.add_parser('adicionar', help='adiciona arquivos, pastas e links no fim das abas')
+    comando.add_argument('materia', help='id ou nome da matéria')
+    comando.add_argument('caminhos', nargs='+')
+    comando.add_argument('--tipo', choices=ROTULOS, help='aba de todos os itens (padrão: pela extensão)')
+    comando.add_argument('--criar', action='store_true', help='cria a matéria se ela não existir')
+    comando.add_argument('--modulo', default='', help='módulo da matéria criada com --criar')
+    comando.set_defaults(funcao=adicionar)
+
+    comando = comandos.add_parser('exportar', help='grava um backup em JSON')
+    comando.add_argument('saida')
+    comando.add_argument('--gz', action='store_true', help='compacta (padrão se a saída termina em .gz)')
+    comando.add_argument('--com-ids', action='store_true', help='registra o backup como base para os incrementais')
+    comando.add_argument('--incremental', action='store_true', help='só o que mudou desde o último backup com ids')
+    comando.set_defaults(funcao=exportar)
+
+    comando = comandos.add_parser('importar', help='restaura um backup completo e/ou incrementais')
+    comando.add_argument('arquivos', nargs='+')
+    comando.add_argument('--substituir', action='store_true', help='apaga a biblioteca atual antes')
+    comando.set_defaults(funcao=importar)
+
+    comando = comandos.add_parser('mover', help='muda a posição de um conteúdo na aba')
+    comando.add_argument('conteudo', type=int, help='id do conteúdo')
+    comando.add_argument('posicao', type=int, help='nova posição, a partir de 1')
+    comando.set_defaults(funcao=mover)
+
+    args = parser.parse_args(argv)
+    banco.CAMINHO_BANCO = args.banco
+    aplicadas = migracoes.migrar()
+    if aplicadas:
+        print(f"Banco de dados atualizado para a versão {aplicadas[-1]}!", file=sys.stderr)
+    args.funcao(args)
+
+
+if __name__ == '__main__':
+    main()
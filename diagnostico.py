@@ -0,0 +1,206 @@
+import bisect
+import functools
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Limite superior (ms) de cada faixa dos histogramas; a última é "acima de 5 s"
+FAIXAS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Consultas e operações acima disso entram no registro de lentas
+LIMITE_LENTO_MS = 100
+MAXIMO_LENTAS = 200
+
+_trava = threading.Lock()
+_operacoes = {}         # nome -> Histograma
+_consultas = {}         # SQL normalizado -> Histograma
+_comandos = {}          # SQL executado pelo SQLite -> quantidade (com o rastreamento ligado)
+_lentas = deque(maxlen=MAXIMO_LENTAS)
+_normalizados = {}
+_local = threading.local()
+
+# Com o rastreamento ligado, cada comando executado pelo SQLite (inclusive os
+# de triggers e cada linha de um executemany) passa por um callback em Python,
+# o que deixa cargas grandes bem mais lentas; por isso começa desligado.
+_rastreando = False
+
+
+class Histograma:
+    """Contagem de durações por faixa, com total e máximo."""
+
+    def __init__(self):
+        self.faixas = [0] * (len(FAIXAS_MS) + 1)
+        self.chamadas = 0
+        self.total_ms = 0.0
+        self.maximo_ms = 0.0
+        self.comandos = 0
+
+    def registrar(self, ms, comandos=0):
+        self.faixas[bisect.bisect_left(FAIXAS_MS, ms)] += 1
+        self.chamadas += 1
+        self.total_ms += ms
+        self.comandos += comandos
+        if ms > self.maximo_ms:
+            self.maximo_ms = ms
+
+    def percentil(self, p):
+        """Estimativa pelo limite superior da faixa onde o percentil cai, sem passar do máximo."""
+        if not self.chamadas:
+            return 0.0
+        alvo = p / 100 * self.chamadas
+        acumulado = 0
+        for posicao, quantidade in enumerate(self.faixas):
+            acumulado += quantidade
+            if acumulado >= alvo:
+                if posicao < len(FAIXAS_MS):
+                    return min(FAIXAS_MS[posicao], round(self.maximo_ms, 3))
+                return round(self.maximo_ms, 3)
+        return round(self.maximo_ms, 3)
+
+    def como_dict(self):
+        return {
+            'chamadas': self.chamadas,
+            'total_ms': round(self.total_ms, 3),
+            'media_ms': round(self.total_ms / self.chamadas, 3) if self.chamadas else 0.0,
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'p99_ms': self.percentil(99),
+            'maximo_ms': round(self.maximo_ms, 3),
+            'comandos': self.comandos,
+            'faixas': {
+                (f'<={limite}' if posicao < len(FAIXAS_MS) else f'>{FAIXAS_MS[-1]}'): quantidade
+                for posicao, (limite, quantidade) in enumerate(zip(FAIXAS_MS + (None,), self.faixas))
+                if quantidade
+            },
+        }
+
+
+def _normalizar(sql):
+    # Os textos são quase sempre literais do código: vale guardar a versão de uma linha
+    normalizado = _normalizados.get(sql)
+    if normalizado is None:
+        normalizado = ' '.join(sql.split())
+        if len(_normalizados) < 1000:
+            _normalizados[sql] = normalizado
+    return normalizado
+
+
+def registrar(tabela, nome, ms, comandos=0, avisar=False):
+    with _trava:
+        histograma = tabela.get(nome)
+        if histograma is None:
+            histograma = tabela[nome] = Histograma()
+        histograma.registrar(ms, comandos)
+        if ms >= LIMITE_LENTO_MS:
+            tipo = 'consulta' if tabela is _consultas else 'operacao'
+            _lentas.append((time.time(), tipo, nome, round(ms, 3)))
+            if avisar:
+                print(f"Consulta lenta ({ms:.0f} ms): {nome}")
+
+
+def _contador():
+    return getattr(_local, 'comandos', 0)
+
+
+def medido(funcao):
+    """Decorador que registra a duração de cada chamada no histograma da operação."""
+    nome = funcao.__qualname__
+
+    @functools.wraps(funcao)
+    def envolvida(*args, **kwargs):
+        comandos = _contador()
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            registrar(_operacoes, nome, (time.perf_counter() - inicio) * 1000, _contador() - comandos)
+    return envolvida
+
+
+def anotar(nome, ms):
+    """Registra uma duração medida por fora, como a da abertura do app."""
+    registrar(_operacoes, nome, ms)
+
+
+class ConexaoMedida(sqlite3.Connection):
+    """Conexão que mede execute e executemany por texto de SQL.
+
+    A medida cobre a preparação e a execução até a primeira linha; em
+    consultas que devolvem muitas linhas, a leitura do resto fica de fora.
+    Só execute avisa no console: um executemany lento é quase sempre uma
+    carga em lote, que já se espera demorada.
+    """
+
+    def execute(self, sql, *args):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            registrar(_consultas, _normalizar(sql), (time.perf_counter() - inicio) * 1000, avisar=True)
+
+    def executemany(self, sql, *args):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            registrar(_consultas, _normalizar(sql), (time.perf_counter() - inicio) * 1000)
+
+
+def _comando(sql):
+    _local.comandos = getattr(_local, 'comandos', 0) + 1
+    # O texto de comandos de triggers vem como "-- TRIGGER nome"
+    chave = sql if len(sql) <= 200 else sql[:200] + '...'
+    with _trava:
+        _comandos[chave] = _comandos.get(chave, 0) + 1
+
+
+def rastreando():
+    return _rastreando
+
+
+def rastrear(ligado):
+    """Liga ou desliga o registro de cada comando SQL.
+
+    Cada thread passa a seguir o novo estado no próximo banco.conectar().
+    """
+    global _rastreando
+    _rastreando = ligado
+
+
+def configurar(conn):
+    """Aplica o estado do rastreamento à conexão, se ele mudou desde a última vez."""
+    if getattr(conn, '_rastreada', False) != _rastreando:
+        conn.set_trace_callback(_comando if _rastreando else None)
+        conn._rastreada = _rastreando
+
+
+def estatisticas():
+    """Cópia dos contadores, pronta para json.dump."""
+    with _trava:
+        return {
+            'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'limite_lento_ms': LIMITE_LENTO_MS,
+            'operacoes': {nome: h.como_dict() for nome, h in _operacoes.items()},
+            'consultas': {sql: h.como_dict() for sql, h in _consultas.items()},
+            'comandos': dict(_comandos),
+            'lentas': [
+                {'quando': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(quando)),
+                 'tipo': tipo, 'nome': nome, 'ms': ms}
+                for quando, tipo, nome, ms in _lentas
+            ],
+        }
+
+
+def exportar(caminho):
+    import json
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(estatisticas(), arquivo, indent=4, ensure_ascii=False)
+
+
+def zerar():
+    with _trava:
+        _operacoes.clear()
+        _consultas.clear()
+        _comandos.clear()
+        _lentas.clear()
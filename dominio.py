@@ -0,0 +1,451 @@
+import os
+import sys
+
+import banco
+import diagnostico
+from utils import ESPACO_ORDEM, calcular_ordens, eh_link
+
+# Linhas lidas por vez nas abas de uma matéria aberta
+TAMANHO_PAGINA = 500
+
+
+def _internar(texto):
+    # tipo e status se repetem em todas as linhas: uma cópia só de cada
+    return sys.intern(texto) if isinstance(texto, str) else texto
+
+
+def _dividir(caminho, nome):
+    """(pasta, arquivo) de um caminho local, com a pasta compartilhada entre conteúdos.
+
+    arquivo é None quando é igual ao nome do conteúdo, o caso de quase todo
+    arquivo adicionado pelo app. Links e caminhos sem pasta ficam inteiros
+    em arquivo, com pasta None.
+    """
+    if not caminho or eh_link(caminho):
+        return None, caminho
+    posicao = caminho.rfind(os.sep) if os.altsep is None else max(caminho.rfind(os.sep), caminho.rfind(os.altsep))
+    if posicao < 0:
+        return None, caminho
+    arquivo = caminho[posicao + 1:]
+    return sys.intern(caminho[:posicao + 1]), (None if arquivo == nome else arquivo)
+
+
+class Conteudo:
+    """Um item de uma aba: arquivo, link ou divisão.
+
+    Com __slots__ e o caminho guardado como pasta compartilhada + nome do
+    arquivo, uma biblioteca de um milhão de conteúdos cabe em bem menos
+    memória. O nome não deve mudar depois de criado, porque o caminho pode
+    depender dele.
+    """
+    __slots__ = ('id', 'nome', 'tipo', 'is_divisao', 'ordem', 'tamanho', 'modificado_em', 'existe',
+                 '_pasta', '_arquivo')
+
+    def __init__(self, nome="", caminho="", tipo="", is_divisao=False, ordem=0, id=None,
+                 tamanho=None, modificado_em=None, existe=None):
+        self.id = id
+        self.nome = nome
+        self._pasta, self._arquivo = _dividir(caminho, nome)
+        self.tipo = _internar(tipo)
+        self.is_divisao = is_divisao
+        self.ordem = ordem
+        # Preenchidos pelo verificador de arquivos; existe=None é "não verificado"
+        self.tamanho = tamanho
+        self.modificado_em = modificado_em
+        self.existe = existe
+
+    @property
+    def caminho(self):
+        if self._pasta is None:
+            return self._arquivo
+        return self._pasta + (self.nome if self._arquivo is None else self._arquivo)
+
+    @caminho.setter
+    def caminho(self, caminho):
+        self._pasta, self._arquivo = _dividir(caminho, self.nome)
+
+    def __str__(self):
+        if self.is_divisao:
+            return f"------------------- {self.nome} -------------------"
+        return f"{self.nome} | {self.caminho}"
+
+
+class Materia:
+    __slots__ = ('id', 'nome', 'modulo', 'status', 'pasta', 'conteudos_livros', 'conteudos_videos', 'aulas_ao_vivo',
+                 'pendentes')
+
+    ATRIBUTOS_TIPO = {
+        'livro': 'conteudos_livros',
+        'video': 'conteudos_videos',
+        'aula': 'aulas_ao_vivo',
+    }
+
+    def __init__(self, id=None, nome="", modulo="", status="Em andamento", pasta=None):
+        self.id = id
+        self.nome = nome
+        self.modulo = modulo
+        self.status = _internar(status)
+        # Pasta vigiada pela VigiaPastas, se houver
+        self.pasta = pasta
+        self.conteudos_livros = []
+        self.conteudos_videos = []
+        self.aulas_ao_vivo = []
+        # tipo -> ordem da próxima linha no banco, para as abas carregadas só em parte
+        self.pendentes = {}
+
+    def salvar(self):
+        with banco.transacao() as conn:
+            if self.id is None:
+                cursor = conn.execute(
+                    'INSERT INTO materias (nome, modulo, status) VALUES (?, ?, ?)',
+                    (self.nome, self.modulo, self.status)
+                )
+                self.id = cursor.lastrowid
+            else:
+                self.gravar_cabecalho(self.id, self.nome, self.modulo, self.status)
+
+    @staticmethod
+    def gravar_cabecalho(id, nome, modulo, status):
+        with banco.transacao() as conn:
+            conn.execute(
+                'UPDATE materias SET nome=?, modulo=?, status=? WHERE id=?',
+                (nome, modulo, status, id)
+            )
+
+    def conteudos_do_tipo(self, tipo):
+        return getattr(self, self.ATRIBUTOS_TIPO[tipo])
+
+    def _anexar(self, id, nome, caminho, tipo, is_divisao, ordem, *metadados):
+        if tipo == 'aula':
+            self.aulas_ao_vivo.append(Conteudo(nome, caminho, 'aula', False, ordem, id, *metadados))
+        elif tipo in self.ATRIBUTOS_TIPO:
+            self.conteudos_do_tipo(tipo).append(Conteudo(nome, caminho, tipo, is_divisao, ordem, id, *metadados))
+
+    @diagnostico.medido
+    def carregar_conteudos(self):
+        self.conteudos_livros = []
+        self.conteudos_videos = []
+        self.aulas_ao_vivo = []
+        self.pendentes = {}
+
+        cursor = banco.conectar().execute(
+            '''SELECT id, nome, caminho, tipo, is_divisao, ordem, tamanho, modificado_em, existe
+               FROM conteudos WHERE materia_id=? ORDER BY tipo, ordem, id''',
+            (self.id,)
+        )
+        for linha in cursor:
+            self._anexar(*linha)
+
+    @diagnostico.medido
+    def carregar_inicio(self, limite=TAMANHO_PAGINA):
+        """Carrega só a primeira página de cada aba; o resto vem com ler_pagina."""
+        self.conteudos_livros = []
+        self.conteudos_videos = []
+        self.aulas_ao_vivo = []
+        self.pendentes = {}
+        for tipo in self.ATRIBUTOS_TIPO:
+            self.anexar_pagina(tipo, self.ler_pagina(self.id, tipo, None, limite), limite)
+
+    @staticmethod
+    def ler_pagina(materia_id, tipo, depois=None, limite=TAMANHO_PAGINA):
+        """Até limite + 1 linhas da aba, no formato de _anexar, depois de (ordem, id).
+
+        A linha a mais só diz se a aba continua. Pode rodar em uma thread de leitura.
+        """
+        if depois is None:
+            cursor = banco.conectar().execute(
+                '''SELECT id, nome, caminho, tipo, is_divisao, ordem, tamanho, modificado_em, existe
+                   FROM conteudos WHERE materia_id=? AND tipo=? ORDER BY ordem, id LIMIT ?''',
+                (materia_id, tipo, limite + 1)
+            )
+        else:
+            cursor = banco.conectar().execute(
+                '''SELECT id, nome, caminho, tipo, is_divisao, ordem, tamanho, modificado_em, existe
+                   FROM conteudos WHERE materia_id=? AND tipo=? AND (ordem, id) > (?, ?)
+                   ORDER BY ordem, id LIMIT ?''',
+                (materia_id, tipo, *depois, limite + 1)
+            )
+        return cursor.fetchall()
+
+    def ultima_chave(self, tipo):
+        """(ordem, id) do último conteúdo carregado da aba, ou None."""
+        conteudos = self.conteudos_do_tipo(tipo)
+        return (conteudos[-1].ordem, conteudos[-1].id) if conteudos else None
+
+    def anexar_pagina(self, tipo, linhas, limite=TAMANHO_PAGINA):
+        """Anexa uma página de ler_pagina; sem a linha a mais, a aba está completa."""
+        for linha in linhas[:limite]:
+            self._anexar(*linha)
+        if len(linhas) > limite:
+            self.pendentes[tipo] = linhas[limite][5]
+        else:
+            self.pendentes.pop(tipo, None)
+
+    def adicionar_conteudo(self, conteudo):
+        try:
+            self.adicionar_conteudos([conteudo])
+        except Exception as e:
+            print(f"Erro ao adicionar conteúdo: {e}")
+
+    def adicionar_conteudos(self, conteudos):
+        """Insere vários conteúdos em uma única transação, no fim de cada aba.
+
+        Os conteúdos recebem id e ordem e são anexados às listas em memória.
+        """
+        conteudos = list(conteudos)
+        gravados = self.inserir_conteudos(self.id, self.linhas_conteudos(conteudos))
+        self.anexar_gravados(conteudos, gravados)
+        return len(gravados)
+
+    @staticmethod
+    def linhas_conteudos(conteudos):
+        return [(c.tipo, c.nome, c.caminho, c.is_divisao) for c in conteudos]
+
+    @staticmethod
+    @diagnostico.medido
+    def inserir_conteudos(materia_id, linhas):
+        """Grava linhas (tipo, nome, caminho, is_divisao) no fim de cada aba.
+
+        Retorna [(id, ordem)] na mesma sequência. Não toca nos objetos em
+        memória, então pode rodar fora da thread da interface.
+        """
+        proxima_ordem = {}
+        valores = []
+        with banco.transacao() as conn:
+            for tipo, nome, caminho, is_divisao in linhas:
+                if tipo not in proxima_ordem:
+                    cursor = conn.execute('SELECT MAX(ordem) FROM conteudos WHERE materia_id=? AND tipo=?', (materia_id, tipo))
+                    proxima_ordem[tipo] = (cursor.fetchone()[0] or 0) + ESPACO_ORDEM
+                valores.append((materia_id, tipo, nome, caminho, is_divisao, proxima_ordem[tipo]))
+                proxima_ordem[tipo] += ESPACO_ORDEM
+
+            conn.executemany(
+                'INSERT INTO conteudos (materia_id, tipo, nome, caminho, is_divisao, ordem) VALUES (?, ?, ?, ?, ?, ?)',
+                valores
+            )
+            # Com AUTOINCREMENT, os ids de um mesmo lote são consecutivos
+            ultimo_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+
+        primeiro_id = ultimo_id - len(valores) + 1
+        return [(primeiro_id + posicao, linha[5]) for posicao, linha in enumerate(valores)]
+
+    @staticmethod
+    def inserir_aula(materia_id, link):
+        """Grava uma aula ao vivo no fim da aba, numerada pelas que a matéria já tem.
+
+        A contagem vem do banco, na mesma transação da inserção: a aba em
+        memória pode estar carregada em parte. Retorna [linha no formato de
+        _anexar].
+        """
+        with banco.transacao() as conn:
+            aulas = conn.execute(
+                "SELECT COUNT(*) FROM conteudos WHERE materia_id=? AND tipo='aula'", (materia_id,)
+            ).fetchone()[0]
+            nome = f"Aula {aulas + 1}"
+            (id, ordem), = Materia.inserir_conteudos(materia_id, [('aula', nome, link, False)])
+        return [(id, nome, link, 'aula', False, ordem)]
+
+    def anexar_gravados(self, conteudos, gravados):
+        for conteudo, (id, ordem) in zip(conteudos, gravados):
+            conteudo.id = id
+            conteudo.ordem = ordem
+            self._anexar_no_fim(conteudo)
+
+    def anexar_novos(self, linhas):
+        """Anexa linhas no formato de _anexar gravadas no fim das abas."""
+        for id, nome, caminho, tipo, is_divisao, ordem, *metadados in linhas:
+            if tipo in self.ATRIBUTOS_TIPO:
+                self._anexar_no_fim(Conteudo(nome, caminho, tipo, is_divisao and tipo != 'aula', ordem, id, *metadados))
+
+    def _anexar_no_fim(self, conteudo):
+        # Numa aba carregada em parte, o conteúdo novo chega com as próximas páginas;
+        # numa completa, pode ter chegado pela última página lida
+        if conteudo.tipo in self.pendentes:
+            return
+        chave = self.ultima_chave(conteudo.tipo)
+        if chave is None or (conteudo.ordem, conteudo.id) > chave:
+            self.conteudos_do_tipo(conteudo.tipo).append(conteudo)
+
+    def atualizar_ordem_conteudos(self, tipo, conteudos_ordenados):
+        """Grava a nova sequência de uma aba, atualizando só as linhas que mudaram."""
+        alterados = self.reordenar(tipo, conteudos_ordenados)
+        if alterados:
+            self.gravar_ordens(alterados)
+        return len(alterados)
+
+    @diagnostico.medido
+    def reordenar(self, tipo, conteudos_ordenados):
+        """Aplica a nova sequência em memória e retorna os (ordem, id) a gravar."""
+        # Numa aba carregada em parte, tudo fica antes da primeira linha não carregada
+        novas = calcular_ordens([conteudo.ordem for conteudo in conteudos_ordenados], self.pendentes.get(tipo))
+        alterados = [
+            (nova, conteudo.id)
+            for conteudo, nova in zip(conteudos_ordenados, novas)
+            if conteudo.ordem != nova
+        ]
+        for conteudo, nova in zip(conteudos_ordenados, novas):
+            conteudo.ordem = nova
+        # Alteração no próprio objeto lista, que os modelos das janelas compartilham
+        self.conteudos_do_tipo(tipo)[:] = list(conteudos_ordenados)
+        return alterados
+
+    @staticmethod
+    def gravar_ordens(alterados):
+        with banco.transacao() as conn:
+            conn.executemany('UPDATE conteudos SET ordem=? WHERE id=?', alterados)
+
+    @staticmethod
+    def gravar_pasta(id, pasta):
+        with banco.transacao() as conn:
+            conn.execute('UPDATE materias SET pasta=? WHERE id=?', (pasta, id))
+            # Outra pasta (ou nenhuma): o que foi visto na anterior não vale mais
+            conn.execute('DELETE FROM arquivos_pasta WHERE materia_id=?', (id,))
+
+    @staticmethod
+    def sincronizar_pasta(materia_id, raiz, pasta, encontrados):
+        """Aplica no banco a diferença entre uma pasta e os conteúdos dela na matéria.
+
+        encontrados vem de arquivos.listar_pasta, ou é None se a pasta sumiu.
+        Só os arquivos que a pasta não tinha na releitura anterior são novos:
+        vão para o fim das abas, depois de uma divisão com o nome da subpasta
+        se a aba ainda não tiver uma. Um arquivo que o usuário tirou da
+        matéria não volta. Os que sumiram ficam com existe=0. Retorna (novos,
+        metadados): as linhas inseridas, no formato de _anexar, e
+        {id: (tamanho, modificado_em, existe)} do que mudou.
+        """
+        prefixo = os.path.join(pasta, '')
+        padrao = prefixo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        metadados = {}
+        novos = []
+        with banco.transacao() as conn:
+            cursor = conn.execute(
+                """SELECT id, caminho, tamanho, modificado_em, existe FROM conteudos
+                   WHERE materia_id=? AND is_divisao=0 AND caminho LIKE ? ESCAPE '\\'""",
+                (materia_id, padrao)
+            )
+            conhecidos = {
+                caminho: (id, (tamanho, modificado_em, existe))
+                for id, caminho, tamanho, modificado_em, existe in cursor
+                if os.path.dirname(caminho) == pasta
+            }
+            vistos = {
+                caminho for (caminho,) in conn.execute(
+                    "SELECT caminho FROM arquivos_pasta WHERE materia_id=? AND caminho LIKE ? ESCAPE '\\'",
+                    (materia_id, padrao)
+                )
+                if os.path.dirname(caminho) == pasta
+            }
+
+            chegaram = []
+            for tipo, nome, caminho, tamanho, modificado_em in encontrados or ():
+                conhecido = conhecidos.pop(caminho, None)
+                if conhecido is None:
+                    if caminho not in vistos:
+                        chegaram.append((tipo, nome, caminho, tamanho, modificado_em))
+                elif conhecido[1] != (tamanho, modificado_em, 1):
+                    metadados[conhecido[0]] = (tamanho, modificado_em, 1)
+            for id, (_, _, existe) in conhecidos.values():
+                if existe != 0:
+                    metadados[id] = (None, None, 0)
+
+            if chegaram:
+                divisao = os.path.relpath(pasta, raiz).replace(os.sep, '/')
+                com_divisao = {
+                    tipo for (tipo,) in conn.execute(
+                        'SELECT DISTINCT tipo FROM conteudos WHERE materia_id=? AND is_divisao=1 AND nome=?',
+                        (materia_id, divisao)
+                    )
+                }
+                linhas = []
+                for tipo, nome, caminho, tamanho, modificado_em in chegaram:
+                    if pasta != raiz and tipo not in com_divisao:
+                        com_divisao.add(tipo)
+                        linhas.append((tipo, divisao, '', True, None, None, None))
+                    linhas.append((tipo, nome, caminho, False, tamanho, modificado_em, 1))
+
+                gravados = Materia.inserir_conteudos(materia_id, [linha[:4] for linha in linhas])
+                for (tipo, nome, caminho, is_divisao, *metadado), (id, ordem) in zip(linhas, gravados):
+                    novos.append((id, nome, caminho, tipo, is_divisao, ordem, *metadado))
+                    if not is_divisao:
+                        metadados[id] = tuple(metadado)
+
+            conn.executemany(
+                'UPDATE conteudos SET tamanho=?, modificado_em=?, existe=? WHERE id=?',
+                ((*metadado, id) for id, metadado in metadados.items())
+            )
+
+            if encontrados is not None:
+                # Com a pasta fora do ar, a listagem anterior continua valendo
+                atuais = {linha[2] for linha in encontrados}
+                conn.executemany(
+                    'DELETE FROM arquivos_pasta WHERE materia_id=? AND caminho=?',
+                    ((materia_id, caminho) for caminho in vistos - atuais)
+                )
+                conn.executemany(
+                    'INSERT OR IGNORE INTO arquivos_pasta (materia_id, caminho) VALUES (?, ?)',
+                    ((materia_id, caminho) for caminho in atuais - vistos)
+                )
+        return novos, metadados
+
+    def aplicar_metadados(self, metadados):
+        """Copia o resultado do verificador de arquivos para os conteúdos em memória."""
+        alterada = False
+        for conteudo in self.conteudos_livros + self.conteudos_videos:
+            if conteudo.id in metadados:
+                conteudo.tamanho, conteudo.modificado_em, conteudo.existe = metadados[conteudo.id]
+                alterada = True
+        return alterada
+
+    @staticmethod
+    def apagar_conteudo(id):
+        with banco.transacao() as conn:
+            conn.execute('DELETE FROM conteudos WHERE id=?', (id,))
+
+    def descartar_conteudo(self, conteudo):
+        lista = self.conteudos_do_tipo(conteudo.tipo)
+        lista[:] = [c for c in lista if c.id != conteudo.id]
+
+    def adicionar_divisao(self, tipo, nome="Div"):
+        divisao = Conteudo(nome=nome, tipo=tipo, is_divisao=True)
+        self.adicionar_conteudo(divisao)
+
+    @classmethod
+    @diagnostico.medido
+    def carregar_cabecalhos(cls):
+        """Carrega só nome, módulo e status, sem os conteúdos."""
+        cursor = banco.conectar().execute('SELECT id, nome, modulo, status, pasta FROM materias ORDER BY nome')
+        return [cls(*linha) for linha in cursor]
+
+    @classmethod
+    @diagnostico.medido
+    def carregar_todas(cls):
+        conn = banco.conectar()
+
+        cursor = conn.execute('SELECT id, nome, modulo, status, pasta FROM materias ORDER BY nome')
+        materias = []
+        por_id = {}
+        for linha in cursor.fetchall():
+            materia = cls(*linha)
+            materias.append(materia)
+            por_id[materia.id] = materia
+
+        # Todos os conteúdos em uma única consulta, agrupados em memória
+        cursor = conn.execute(
+            '''SELECT materia_id, id, nome, caminho, tipo, is_divisao, ordem, tamanho, modificado_em, existe
+               FROM conteudos ORDER BY materia_id, tipo, ordem, id'''
+        )
+        for materia_id, *linha in cursor:
+            materia = por_id.get(materia_id)
+            if materia is not None:
+                materia._anexar(*linha)
+
+        return materias
+
+    @classmethod
+    def remover_por_id(cls, id):
+        # Os conteúdos saem junto via ON DELETE CASCADE
+        with banco.transacao() as conn:
+            conn.execute('DELETE FROM materias WHERE id=?', (id,))
+
+    def __str__(self):
+        return f"{self.nome} ({self.modulo}) - {self.status}"
@@ -0,0 +1,182 @@
+import hashlib
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import banco
+from utils import eh_link
+
+BLOCO_LEITURA = 1024 * 1024
+
+# Acima disso o arquivo é lido por mmap, sem copiar blocos para o Python
+LIMITE_MMAP = 64 * 1024 * 1024
+
+# Resultados gravados por transação
+TAMANHO_LOTE = 200
+
+
+def calcular_hash(caminho):
+    """BLAKE2b (32 bytes, hexadecimal) do conteúdo do arquivo.
+
+    Fica no nível do módulo para poder rodar em um ProcessPoolExecutor.
+    """
+    resumo = hashlib.blake2b(digest_size=32)
+    with open(caminho, 'rb') as arquivo:
+        tamanho = os.fstat(arquivo.fileno()).st_size
+        if tamanho >= LIMITE_MMAP:
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                resumo.update(mapa)
+        else:
+            bloco = bytearray(BLOCO_LEITURA)
+            visao = memoryview(bloco)
+            while True:
+                lidos = arquivo.readinto(bloco)
+                if not lidos:
+                    break
+                resumo.update(visao[:lidos])
+    return resumo.hexdigest()
+
+
+def _pendentes(conn):
+    """{caminho: (ids, tamanho, modificado_em)} dos arquivos sem hash para a versão atual.
+
+    A versão é dada por tamanho e mtime; um arquivo que não mudou desde o
+    último hash não entra.
+    """
+    por_caminho = {}
+    cursor = conn.execute(
+        '''SELECT id, caminho, hash, hash_tamanho, hash_modificado_em FROM conteudos
+           WHERE is_divisao=0 AND tipo IN ('livro', 'video') AND caminho != '' AND existe IS NOT 0'''
+    )
+    for id, caminho, hash, hash_tamanho, hash_modificado_em in cursor:
+        if not eh_link(caminho):
+            por_caminho.setdefault(caminho, []).append((id, hash, hash_tamanho, hash_modificado_em))
+
+    pendentes = {}
+    for caminho, linhas in por_caminho.items():
+        try:
+            resultado = os.stat(caminho)
+        except OSError:
+            continue
+        versao = (resultado.st_size, resultado.st_mtime)
+        if any(hash is None or (hash_tamanho, hash_modificado_em) != versao for _, hash, hash_tamanho, hash_modificado_em in linhas):
+            pendentes[caminho] = ([id for id, *_ in linhas], *versao)
+    return pendentes
+
+
+def _gravar(resultados):
+    with banco.transacao() as conn:
+        conn.executemany(
+            'UPDATE conteudos SET hash=?, hash_tamanho=?, hash_modificado_em=? WHERE id=?',
+            resultados
+        )
+
+
+def atualizar_hashes(progresso=None, cancelado=None, processos=None, escrever=None):
+    """Calcula o hash dos arquivos novos ou alterados, um processo por núcleo.
+
+    Cada caminho é lido uma vez, mesmo que apareça em várias matérias.
+    progresso(bytes_lidos, total_bytes) é chamado a cada arquivo. Os
+    resultados são gravados em lotes por escrever(funcao, lote) (padrão:
+    nesta thread). Retorna a quantidade de arquivos calculados, ou None se
+    cancelado() retornar True.
+    """
+    if escrever is None:
+        escrever = banco.executar
+    pendentes = _pendentes(banco.conectar())
+    total = sum(tamanho for _, tamanho, _ in pendentes.values())
+    lidos = 0
+    calculados = 0
+    lote = []
+    # spawn: fork de um processo com as threads do Qt pode travar o filho
+    with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context('spawn')) as executor:
+        # Os maiores primeiro, para nenhum núcleo ficar com um vídeo grande no fim
+        futuros = {
+            executor.submit(calcular_hash, caminho): caminho
+            for caminho in sorted(pendentes, key=lambda caminho: -pendentes[caminho][1])
+        }
+        for futuro in as_completed(futuros):
+            if cancelado is not None and cancelado():
+                executor.shutdown(cancel_futures=True)
+                if lote:
+                    escrever(_gravar, lote)
+                return None
+
+            ids, tamanho, modificado_em = pendentes[futuros[futuro]]
+            lidos += tamanho
+            try:
+                hash = futuro.result()
+            except OSError:
+                continue
+            calculados += 1
+            lote.extend((hash, tamanho, modificado_em, id) for id in ids)
+            if len(lote) >= TAMANHO_LOTE:
+                escrever(_gravar, lote)
+                lote = []
+            if progresso is not None:
+                progresso(lidos, total)
+    if lote:
+        escrever(_gravar, lote)
+    return calculados
+
+
+def duplicados():
+    """Grupos de conteúdos com o mesmo hash, em todas as matérias.
+
+    Retorna uma lista de (hash, tamanho, linhas), com linhas como
+    [(id, materia_id, materia, tipo, nome, caminho)]. Arquivos vazios ficam
+    de fora, assim como o mesmo caminho em várias matérias: só entram grupos
+    com mais de um arquivo.
+    """
+    cursor = banco.conectar().execute(
+        '''SELECT c.hash, c.hash_tamanho, c.id, c.materia_id, m.nome, c.tipo, c.nome, c.caminho
+           FROM conteudos c JOIN materias m ON m.id = c.materia_id
+           WHERE c.hash IN (
+               SELECT hash FROM conteudos
+               WHERE hash IS NOT NULL AND hash_tamanho > 0
+               GROUP BY hash HAVING COUNT(DISTINCT caminho) > 1
+           )
+           ORDER BY c.hash_tamanho DESC, c.hash, m.nome, c.tipo, c.ordem'''
+    )
+    grupos = []
+    for hash, tamanho, *linha in cursor:
+        if not grupos or grupos[-1][0] != hash:
+            grupos.append((hash, tamanho, []))
+        grupos[-1][2].append(tuple(linha))
+    return grupos
+
+
+def colapsar(hashes):
+    """Unifica cada grupo de duplicados em um só arquivo.
+
+    Dentro de uma mesma matéria fica só a primeira ocorrência (na ordem da
+    aba); nas demais matérias os conteúdos passam a apontar para o caminho
+    da primeira ocorrência do grupo. Os arquivos em disco não são tocados.
+    Retorna (removidos, redirecionados).
+    """
+    removidos = redirecionados = 0
+    with banco.transacao() as conn:
+        for hash in hashes:
+            linhas = conn.execute(
+                '''SELECT id, materia_id, caminho, tamanho, modificado_em, existe FROM conteudos
+                   WHERE hash=? ORDER BY materia_id, tipo, ordem, id''',
+                (hash,)
+            ).fetchall()
+            if len(linhas) < 2:
+                continue
+            _, _, caminho, tamanho, modificado_em, existe = linhas[0]
+            vistas = set()
+            for id, materia_id, caminho_linha, *_ in linhas:
+                if materia_id in vistas:
+                    conn.execute('DELETE FROM conteudos WHERE id=?', (id,))
+                    removidos += 1
+                    continue
+                vistas.add(materia_id)
+                if caminho_linha != caminho:
+                    conn.execute(
+                        'UPDATE conteudos SET caminho=?, tamanho=?, modificado_em=?, existe=? WHERE id=?',
+                        (caminho, tamanho, modificado_em, existe, id)
+                    )
+                    redirecionados += 1
+    return removidos, redirecionados
@@ -0,0 +1,44 @@
+import hashlib
+import marshal
+import os
+
+# pylint: disable=no-name-in-module
+from PyQt5.QtCore import QStandardPaths
+
+# Muda quando o formato das linhas muda; arquivos de outra versão são ignorados
+VERSAO = 1
+
+
+def _caminho(caminho_banco):
+    # Um arquivo por banco, para não mostrar as matérias de outra biblioteca
+    chave = hashlib.sha1(os.path.abspath(caminho_banco).encode()).hexdigest()[:16]
+    pasta = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+    return os.path.join(pasta, f'cabecalhos-{chave}.bin')
+
+
+def carregar(caminho_banco):
+    """Cabeçalhos (id, nome, modulo, status, pasta) gravados na última sessão.
+
+    Serve só para a primeira pintura: a lista de verdade vem do banco logo
+    depois. Retorna [] se não houver instantâneo ou ele não puder ser lido.
+    """
+    try:
+        with open(_caminho(caminho_banco), 'rb') as arquivo:
+            versao, linhas = marshal.load(arquivo)
+    except (OSError, EOFError, ValueError, TypeError):
+        return []
+    return linhas if versao == VERSAO else []
+
+
+def salvar(caminho_banco, materias):
+    """Grava os cabeçalhos das matérias, na ordem da lista."""
+    linhas = [(m.id, m.nome, m.modulo, m.status, m.pasta) for m in materias]
+    caminho = _caminho(caminho_banco)
+    temporario = caminho + '.parcial'
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(temporario, 'wb') as arquivo:
+            marshal.dump((VERSAO, linhas), arquivo)
+        os.replace(temporario, caminho)
+    except OSError as e:
+        print(f"Erro ao salvar as matérias para a próxima abertura: {e}")
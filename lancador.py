@@ -0,0 +1,88 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# pylint: disable=no-name-in-module
+from PyQt5.QtCore import QUrl
+from PyQt5.QtGui import QDesktopServices
+
+from utils import eh_link
+
+# Quanto do começo do arquivo é lido antes de o usuário pedir para abrir
+TAMANHO_PREAQUECIMENTO = 8 * 1024 * 1024
+BLOCO_LEITURA = 1024 * 1024
+
+_processos = []
+_preaquecidos = OrderedDict()
+_trava = threading.Lock()
+
+
+def _comando_sistema(caminho):
+    if sys.platform == 'darwin':
+        return ['open', caminho]
+    return ['xdg-open', caminho]
+
+
+def abrir(caminho):
+    """Abre o link ou arquivo no programa padrão, sem esperar por ele.
+
+    Retorna False se não foi possível iniciar o visualizador.
+    """
+    if eh_link(caminho):
+        return QDesktopServices.openUrl(QUrl(caminho))
+
+    if QDesktopServices.openUrl(QUrl.fromLocalFile(caminho)):
+        return True
+
+    if sys.platform == 'win32':
+        try:
+            os.startfile(caminho)
+            return True
+        except OSError:
+            return False
+
+    # Sem shell: o caminho vai como um argumento só, com aspas ou não
+    import subprocess
+    _processos[:] = [processo for processo in _processos if processo.poll() is None]
+    try:
+        _processos.append(subprocess.Popen(
+            _comando_sistema(caminho),
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True
+        ))
+    except OSError:
+        return False
+    return True
+
+
+def _ler_comeco(caminho, tamanho):
+    try:
+        with open(caminho, 'rb', buffering=0) as arquivo:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(arquivo.fileno(), 0, tamanho, os.POSIX_FADV_WILLNEED)
+            lidos = 0
+            while lidos < tamanho:
+                bloco = arquivo.read(min(BLOCO_LEITURA, tamanho - lidos))
+                if not bloco:
+                    break
+                lidos += len(bloco)
+    except OSError:
+        pass
+
+
+def preaquecer(caminho, tamanho=TAMANHO_PREAQUECIMENTO, limite=16):
+    """Lê o começo do arquivo em segundo plano para o visualizador abrir do cache.
+
+    Arquivos preaquecidos recentemente são ignorados.
+    """
+    if not caminho or eh_link(caminho):
+        return
+    with _trava:
+        if caminho in _preaquecidos:
+            _preaquecidos.move_to_end(caminho)
+            return
+        _preaquecidos[caminho] = True
+        if len(_preaquecidos) > limite:
+            _preaquecidos.popitem(last=False)
+    threading.Thread(target=_ler_comeco, args=(caminho, tamanho), daemon=True).start()
@@ -1,21 +1,41 @@
 import sys
 import os
-import webbrowser
-import json
-import sqlite3
+import time
+import bisect
+from collections import OrderedDict
+import banco
+import migracoes
+import busca
+import assincrono
+import lancador
+import arquivos
+import miniaturas
+import diagnostico
+import instantaneo
+from dominio import Conteudo, Materia
+# backup e duplicados são importados só onde são usados: json, gzip e
+# multiprocessing atrasam a abertura e raramente são necessários
+from utils import formatar_tamanho
 # pylint: disable=no-name-in-module
 # pylint: disable=no-member
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QVBoxLayout, QWidget, QListWidget,
+    QApplication, QMainWindow, QVBoxLayout, QWidget, QListView,
     QPushButton, QLineEdit, QTabWidget, QFileDialog, QMessageBox,
-    QInputDialog, QLabel, QListWidgetItem, QHBoxLayout,
-    QComboBox, QDialog, QFormLayout, QDialogButtonBox, QTextBrowser
+    QInputDialog, QLabel, QHBoxLayout,
+    QComboBox, QDialog, QFormLayout, QDialogButtonBox, QTextBrowser,
+    QProgressDialog, QTreeWidget, QTreeWidgetItem, QStyle, QCheckBox
 )
-from PyQt5.QtCore import Qt, QSize, pyqtSignal
-from PyQt5.QtGui import QIcon, QPixmap, QFont
+from PyQt5.QtCore import (
+    Qt, QSize, QTimer, QThread, QObject, pyqtSignal, pyqtSlot, QAbstractListModel, QModelIndex,
+    QPersistentModelIndex, QFileSystemWatcher
+)
+from PyQt5.QtGui import QIcon, QPixmap, QFont, QColor
 
 #-------------------------------------imports---------------------------------------
 
+# Referência para medir o tempo até a primeira pintura da janela
+INICIO = time.perf_counter()
+
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
     try:
@@ -27,192 +47,72 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 # Database setup
+# Chamada pela MainWindow depois da primeira pintura, na thread de escrita.
+# Não roda na importação: os processos filhos dos hashes também importam main.
 def criar_banco_dados():
     try:
-        conn = sqlite3.connect('material.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS materias (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT,
-            modulo TEXT,
-            status TEXT
-        )''')
-        
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS conteudos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            materia_id INTEGER,
-            tipo TEXT,
-            nome TEXT,
-            caminho TEXT,
-            is_divisao BOOLEAN DEFAULT 0,
-            ordem INTEGER DEFAULT 0,
-            FOREIGN KEY (materia_id) REFERENCES materias(id)
-        )''')
-        
-        conn.commit()
-        print("Banco de dados criado/verificado com sucesso!")
+        aplicadas = migracoes.migrar()
+        if aplicadas:
+            print(f"Banco de dados atualizado para a versão {aplicadas[-1]}!")
     except Exception as e:
         print(f"Erro ao criar banco de dados: {e}")
-    finally:
-        conn.close()
-
-criar_banco_dados()
-
-class Conteudo:
-    def __init__(self, nome="", caminho="", tipo="", is_divisao=False, ordem=0):
-        self.nome = nome
-        self.caminho = caminho
-        self.tipo = tipo
-        self.is_divisao = is_divisao
-        self.ordem = ordem
 
-    def __str__(self):
-        if self.is_divisao:
-            return f"------------------- {self.nome} -------------------"
-        return f"{self.nome} | {self.caminho}"
+class CacheMaterias:
+    """Cache LRU de matérias com os conteúdos já carregados.
 
-class Materia:
-    def __init__(self, id=None, nome="", modulo="", status="Em andamento"):
-        self.id = id
-        self.nome = nome
-        self.modulo = modulo
-        self.status = status
-        self.conteudos_livros = []
-        self.conteudos_videos = []
-        self.aulas_ao_vivo = []
-
-    def salvar(self):
-        conn = sqlite3.connect('material.db')
-        cursor = conn.cursor()
-        
-        if self.id is None:
-            cursor.execute(
-                'INSERT INTO materias (nome, modulo, status) VALUES (?, ?, ?)',
-                (self.nome, self.modulo, self.status)
-            )
-            self.id = cursor.lastrowid
-        else:
-            cursor.execute(
-                'UPDATE materias SET nome=?, modulo=?, status=? WHERE id=?',
-                (self.nome, self.modulo, self.status, self.id)
-            )
-        
-        conn.commit()
-        conn.close()
+    Matérias fixadas (com janela aberta) não são descartadas pelo limite:
+    a janela e as atualizações feitas pelo cache precisam ser a mesma cópia.
+    """
+    def __init__(self, limite=32):
+        self.limite = limite
+        self._materias = OrderedDict()
+        self._fixadas = set()
     
-    def carregar_conteudos(self):
-        conn = sqlite3.connect('material.db')
-        cursor = conn.cursor()
-        
-        self.conteudos_livros = []
-        self.conteudos_videos = []
-        self.aulas_ao_vivo = []
-        
-        cursor.execute('SELECT nome, caminho, tipo, is_divisao, ordem FROM conteudos WHERE materia_id=? AND tipo="livro" ORDER BY ordem', (self.id,))
-        for nome, caminho, tipo, is_divisao, ordem in cursor.fetchall():
-            self.conteudos_livros.append(Conteudo(nome, caminho, tipo, is_divisao, ordem))
-        
-        cursor.execute('SELECT nome, caminho, tipo, is_divisao, ordem FROM conteudos WHERE materia_id=? AND tipo="video" ORDER BY ordem', (self.id,))
-        for nome, caminho, tipo, is_divisao, ordem in cursor.fetchall():
-            self.conteudos_videos.append(Conteudo(nome, caminho, tipo, is_divisao, ordem))
-        
-        cursor.execute('SELECT nome, caminho, ordem FROM conteudos WHERE materia_id=? AND tipo="aula" ORDER BY ordem', (self.id,))
-        for nome, caminho, ordem in cursor.fetchall():
-            self.aulas_ao_vivo.append(Conteudo(nome, caminho, 'aula', False, ordem))
-        
-        conn.close()
+    def buscar(self, materia_id):
+        materia = self._materias.get(materia_id)
+        if materia is not None:
+            self._materias.move_to_end(materia_id)
+        return materia
     
-    def adicionar_conteudo(self, conteudo):
-        conn = sqlite3.connect('material.db')
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('SELECT MAX(ordem) FROM conteudos WHERE materia_id=? AND tipo=?', (self.id, conteudo.tipo))
-            max_ordem = cursor.fetchone()[0] or 0
-            
-            cursor.execute(
-                'INSERT INTO conteudos (materia_id, tipo, nome, caminho, is_divisao, ordem) VALUES (?, ?, ?, ?, ?, ?)',
-                (self.id, conteudo.tipo, conteudo.nome, conteudo.caminho, conteudo.is_divisao, max_ordem + 1)
-            )
-            
-            conn.commit()
-        except Exception as e:
-            print(f"Erro ao adicionar conteúdo: {e}")
-        finally:
-            conn.close()
-        
-        self.carregar_conteudos()
+    def guardar(self, materia):
+        # Se outra leitura já trouxe a mesma matéria, fica a que está em uso
+        if materia.id in self._materias:
+            return self.buscar(materia.id)
+        self._materias[materia.id] = materia
+        self._descartar_excesso()
+        return materia
     
-    def atualizar_ordem_conteudos(self, tipo, conteudos_ordenados):
-        conn = sqlite3.connect('material.db')
-        cursor = conn.cursor()
-        
-        for ordem, conteudo in enumerate(conteudos_ordenados):
-            if conteudo.tipo == 'aula':
-                cursor.execute(
-                    'UPDATE conteudos SET ordem=? WHERE materia_id=? AND tipo=? AND nome=? AND caminho=?',
-                    (ordem, self.id, tipo, conteudo.nome, conteudo.caminho)
-                )
-            else:
-                cursor.execute(
-                    'UPDATE conteudos SET ordem=? WHERE materia_id=? AND tipo=? AND nome=? AND is_divisao=?',
-                    (ordem, self.id, tipo, conteudo.nome, conteudo.is_divisao)
-                )
-        
-        conn.commit()
-        conn.close()
-        self.carregar_conteudos()
+    def fixar(self, materia_id):
+        self._fixadas.add(materia_id)
     
-    def remover_conteudo(self, conteudo):
-        conn = sqlite3.connect('material.db')
-        cursor = conn.cursor()
-        
-        if conteudo.tipo == 'aula':
-            cursor.execute('DELETE FROM conteudos WHERE materia_id=? AND tipo="aula" AND nome=? AND caminho=?',
-                          (self.id, conteudo.nome, conteudo.caminho))
-        else:
-            cursor.execute('DELETE FROM conteudos WHERE materia_id=? AND tipo=? AND nome=? AND is_divisao=?',
-                        (self.id, conteudo.tipo, conteudo.nome, 1 if conteudo.is_divisao else 0))
-        
-        conn.commit()
-        conn.close()
-        self.carregar_conteudos()
+    def soltar(self, materia_id):
+        self._fixadas.discard(materia_id)
+        self._descartar_excesso()
     
-    def adicionar_divisao(self, tipo, nome="Div"):
-        divisao = Conteudo(nome=nome, tipo=tipo, is_divisao=True)
-        self.adicionar_conteudo(divisao)
+    def _descartar_excesso(self):
+        excesso = len(self._materias) - self.limite
+        for materia_id in list(self._materias):
+            if excesso <= 0:
+                break
+            if materia_id not in self._fixadas:
+                del self._materias[materia_id]
+                excesso -= 1
     
-    @classmethod
-    def carregar_todas(cls):
-        conn = sqlite3.connect('material.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id, nome, modulo, status FROM materias ORDER BY nome')
-        materias = []
-        for id, nome, modulo, status in cursor.fetchall():
-            materia = cls(id, nome, modulo, status)
-            materia.carregar_conteudos()
-            materias.append(materia)
-        
-        conn.close()
-        return materias
+    @staticmethod
+    def carregar(cabecalho):
+        """Cópia da matéria com a primeira página de cada aba; pode rodar em uma thread de leitura."""
+        materia = Materia(cabecalho.id, cabecalho.nome, cabecalho.modulo, cabecalho.status, cabecalho.pasta)
+        materia.carregar_inicio()
+        return materia
     
-    @classmethod
-    def remover_por_id(cls, id):
-        conn = sqlite3.connect('material.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM conteudos WHERE materia_id=?', (id,))
-        cursor.execute('DELETE FROM materias WHERE id=?', (id,))
-        
-        conn.commit()
-        conn.close()
+    def __iter__(self):
+        return iter(list(self._materias.values()))
     
-    def __str__(self):
-        return f"{self.nome} ({self.modulo}) - {self.status}"
+    def invalidar(self, materia_id=None):
+        if materia_id is None:
+            self._materias.clear()
+        else:
+            self._materias.pop(materia_id, None)
 
 class EditarMateriaDialog(QDialog):
     def __init__(self, materia, parent=None):
@@ -245,34 +145,369 @@ class EditarMateriaDialog(QDialog):
             "status": self.status_combo.currentText()
         }
 
-class DraggableListWidget(QListWidget):
-    itemMoved = pyqtSignal(str, list)
+class DialogoDuplicados(QDialog):
+    """Mostra os grupos de duplicados e unifica os marcados."""
+    def __init__(self, grupos, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Conteúdos Duplicados")
+        self.resize(700, 450)
+        
+        self.arvore = QTreeWidget()
+        self.arvore.setHeaderLabels(["Conteúdo", "Matéria", "Caminho"])
+        for hash, tamanho, linhas in grupos:
+            grupo = QTreeWidgetItem([f"{linhas[0][4]} ({len(linhas)} cópias, {formatar_tamanho(tamanho)})"])
+            grupo.setData(0, Qt.UserRole, hash)
+            grupo.setFlags(grupo.flags() | Qt.ItemIsUserCheckable)
+            grupo.setCheckState(0, Qt.Unchecked)
+            for _, _, materia, _, nome, caminho in linhas:
+                grupo.addChild(QTreeWidgetItem([nome, materia, caminho]))
+            self.arvore.addTopLevelItem(grupo)
+        
+        explicacao = QLabel(
+            "Unificar deixa uma única ocorrência por matéria e faz as outras matérias\n"
+            "apontarem para o mesmo arquivo. Nenhum arquivo é apagado do disco."
+        )
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        self.botao_unificar = buttons.addButton("Unificar Marcados", QDialogButtonBox.AcceptRole)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f"{len(grupos)} grupo(s) de arquivos iguais:"))
+        layout.addWidget(self.arvore)
+        layout.addWidget(explicacao)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+    
+    def marcados(self):
+        return [
+            self.arvore.topLevelItem(i).data(0, Qt.UserRole)
+            for i in range(self.arvore.topLevelItemCount())
+            if self.arvore.topLevelItem(i).checkState(0) == Qt.Checked
+        ]
+
+class ModeloMaterias(QAbstractListModel):
+    """Lista de matérias (só cabeçalhos), ordenada por nome.
 
+    Com um filtro, as linhas são só as matérias filtradas (self.materias);
+    self.todas continua com a lista inteira.
+    """
+    def __init__(self, materias=None, parent=None):
+        super().__init__(parent)
+        self.todas = self.materias = materias if materias is not None else []
+        self.filtro = None
+        book_icon_path = resource_path('icons/book.png')
+        self.icone = QIcon(book_icon_path) if os.path.exists(book_icon_path) else QIcon()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.materias)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        materia = self.materias[index.row()]
+        if role == Qt.DisplayRole:
+            return str(materia)
+        if role == Qt.DecorationRole:
+            return self.icone
+        if role == Qt.UserRole:
+            return materia.id
+        return None
+    
+    def definir(self, materias):
+        self.todas = materias
+        self.filtrar(self.filtro)
+    
+    def filtrar(self, ids):
+        """Mostra só as matérias com id em ids (None mostra todas).
+
+        Troca a lista inteira de uma vez: esconder linha por linha na view
+        custa caro com milhares de matérias.
+        """
+        self.beginResetModel()
+        self.filtro = ids
+        if ids is None:
+            self.materias = self.todas
+        else:
+            self.materias = [materia for materia in self.todas if materia.id in ids]
+        self.endResetModel()
+    
+    @staticmethod
+    def _posicao(lista, nome):
+        return bisect.bisect_right(lista, nome, key=lambda m: m.nome)
+    
+    def linha_de(self, materia_id):
+        for linha, materia in enumerate(self.materias):
+            if materia.id == materia_id:
+                return linha
+        return -1
+    
+    def _separada(self):
+        """self.todas quando ela não é a própria lista das linhas."""
+        return None if self.todas is self.materias else self.todas
+    
+    def inserir(self, materia):
+        todas = self._separada()
+        if todas is not None:
+            # Fora do filtro até ele ser aplicado de novo
+            todas.insert(self._posicao(todas, materia.nome), materia)
+            return -1
+        linha = self._posicao(self.materias, materia.nome)
+        self.beginInsertRows(QModelIndex(), linha, linha)
+        self.materias.insert(linha, materia)
+        self.endInsertRows()
+        return linha
+    
+    def remover(self, linha):
+        todas = self._separada()
+        self.beginRemoveRows(QModelIndex(), linha, linha)
+        materia = self.materias.pop(linha)
+        self.endRemoveRows()
+        if todas is not None:
+            todas.pop(next(i for i, outra in enumerate(todas) if outra is materia))
+    
+    def atualizar(self, linha):
+        """Avisa que a matéria da linha mudou, movendo-a se o nome mudou de posição."""
+        materia = self.materias.pop(linha)
+        posicao = self._posicao(self.materias, materia.nome)
+        self.materias.insert(linha, materia)
+        if posicao != linha:
+            destino = posicao if posicao < linha else posicao + 1
+            self.beginMoveRows(QModelIndex(), linha, linha, QModelIndex(), destino)
+            self.materias.insert(posicao, self.materias.pop(linha))
+            self.endMoveRows()
+            linha = posicao
+        todas = self._separada()
+        if todas is not None:
+            todas.pop(next(i for i, outra in enumerate(todas) if outra is materia))
+            todas.insert(self._posicao(todas, materia.nome), materia)
+        indice = self.index(linha)
+        self.dataChanged.emit(indice, indice)
+        return linha
+
+class ModeloConteudos(QAbstractListModel):
+    """Conteúdos de um tipo de uma matéria, na ordem da aba.
+
+    Abas grandes são lidas em páginas (Materia.ler_pagina) conforme a lista
+    rola até o fim, via canFetchMore/fetchMore.
+    """
+    ordemAlterada = pyqtSignal(str)
+    
+    _fonte_divisao = None
+    _icone_arquivo = None
+    _icone_divisao = None
+    
+    def __init__(self, materia, tipo, parent=None, cache_miniaturas=None):
+        super().__init__(parent)
+        self.materia = materia
+        self.tipo = tipo
+        self.cache_miniaturas = cache_miniaturas
+        self._linhas = len(self.conteudos)
+        self._pedido = None
+        # Muda quando algo é gravado no fim da aba, invalidando a página em leitura
+        self._geracao = 0
+        self._geracao_pedido = 0
+        # caminho -> linhas (índices persistentes) que esperam a miniatura
+        self._aguardando = {}
+        if ModeloConteudos._fonte_divisao is None:
+            ModeloConteudos._fonte_divisao = QFont()
+            ModeloConteudos._fonte_divisao.setBold(True)
+        if cache_miniaturas is not None:
+            if ModeloConteudos._icone_arquivo is None:
+                estilo = QApplication.style()
+                ModeloConteudos._icone_arquivo = estilo.standardIcon(QStyle.SP_FileIcon)
+                ModeloConteudos._icone_divisao = estilo.standardIcon(QStyle.SP_DirIcon)
+            cache_miniaturas.disponivel.connect(self.miniatura_disponivel)
+    
+    @property
+    def conteudos(self):
+        return self.materia.conteudos_do_tipo(self.tipo)
+    
+    def conteudo(self, linha):
+        return self.conteudos[linha]
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._linhas
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.conteudos):
+            return None
+        conteudo = self.conteudos[index.row()]
+        # Só dados já em memória: nada de acesso ao disco durante a pintura
+        if role == Qt.DisplayRole:
+            if conteudo.existe == 0:
+                return f"{conteudo} (arquivo não encontrado)"
+            if conteudo.tamanho is not None:
+                return f"{conteudo} ({formatar_tamanho(conteudo.tamanho)})"
+            return str(conteudo)
+        if role == Qt.UserRole:
+            return conteudo.id
+        if role == Qt.ForegroundRole and conteudo.existe == 0:
+            return QColor(Qt.red)
+        if role == Qt.DecorationRole and self.cache_miniaturas is not None:
+            # Só é pedido para as linhas visíveis; a miniatura chega depois
+            if conteudo.is_divisao:
+                return self._icone_divisao
+            if conteudo.existe != 0 and miniaturas.eh_imagem(conteudo.caminho):
+                icone = self.cache_miniaturas.icone(conteudo.caminho, conteudo.modificado_em)
+                if icone is None:
+                    self._esperar_miniatura(conteudo.caminho, index)
+                elif not icone.isNull():
+                    return icone
+            return self._icone_arquivo
+        if conteudo.is_divisao:
+            if role == Qt.BackgroundRole:
+                return QColor(Qt.lightGray)
+            if role == Qt.FontRole:
+                return self._fonte_divisao
+        return None
+    
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+    
+    def supportedDropActions(self):
+        return Qt.MoveAction
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._linhas < len(self.conteudos) or self.tipo in self.materia.pendentes
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        if self._linhas < len(self.conteudos):
+            self._publicar()
+        elif self.tipo in self.materia.pendentes and self._pedido is None:
+            # Lida depois das escritas já enviadas, a partir do que está em memória
+            # Métodos do modelo (e não lambdas): se a janela for fechada antes, não são chamados
+            self._geracao_pedido = self._geracao
+            self._pedido = assincrono.ler(Materia.ler_pagina, self.materia.id, self.tipo, self.materia.ultima_chave(self.tipo))
+            self._pedido.concluido.connect(self.pagina_lida)
+            self._pedido.falhou.connect(self.pagina_falhou)
+    
+    def pagina_lida(self, linhas):
+        self._pedido = None
+        if self._geracao_pedido != self._geracao:
+            # A página pode não ter visto o que foi gravado no fim da aba; lê de novo
+            self.fetchMore()
+            return
+        self.materia.anexar_pagina(self.tipo, linhas)
+        self._publicar()
+    
+    def pagina_falhou(self, erro):
+        self._pedido = None
+        print(f"Erro ao carregar conteúdos: {erro}")
+    
+    def recarregar(self):
+        self.beginResetModel()
+        self._geracao += 1
+        self._linhas = len(self.conteudos)
+        self.endResetModel()
+    
+    def _esperar_miniatura(self, caminho, index):
+        # Só linhas pintadas pedem miniatura; os índices persistentes
+        # acompanham as linhas movidas, inseridas e removidas
+        indices = self._aguardando.pop(caminho, [])
+        if all(indice.row() != index.row() for indice in indices):
+            indices.append(QPersistentModelIndex(index))
+        self._aguardando[caminho] = indices
+        # Pedidos descartados da fila nunca chegam: esquece os mais antigos
+        if len(self._aguardando) > 2 * miniaturas.LIMITE_FILA:
+            del self._aguardando[next(iter(self._aguardando))]
+    
+    # Slot do Qt (e não só um método): a conexão some quando o modelo é destruído
+    @pyqtSlot(str)
+    def miniatura_disponivel(self, caminho):
+        for indice in self._aguardando.pop(caminho, ()):
+            if indice.isValid():
+                indice = self.index(indice.row())
+                self.dataChanged.emit(indice, indice, [Qt.DecorationRole])
+    
+    def metadados_alterados(self):
+        if self._linhas:
+            self.dataChanged.emit(self.index(0), self.index(self._linhas - 1), [Qt.DisplayRole, Qt.ForegroundRole])
+    
+    def anexados(self):
+        """Publica as linhas que a matéria anexou no fim da lista."""
+        self._geracao += 1
+        self._publicar()
+    
+    def _publicar(self):
+        total = len(self.conteudos)
+        if total > self._linhas:
+            self.beginInsertRows(QModelIndex(), self._linhas, total - 1)
+            self._linhas = total
+            self.endInsertRows()
+    
+    def remover(self, linha):
+        """Tira a linha da matéria em memória e retorna o conteúdo removido."""
+        conteudo = self.conteudos[linha]
+        self.beginRemoveRows(QModelIndex(), linha, linha)
+        self.materia.descartar_conteudo(conteudo)
+        self._linhas = len(self.conteudos)
+        self.endRemoveRows()
+        return conteudo
+    
+    def moveRows(self, parent, origem, quantidade, parent_destino, destino):
+        if quantidade != 1 or parent.isValid() or parent_destino.isValid():
+            return False
+        if destino == origem or destino == origem + 1:
+            return False
+        if not self.beginMoveRows(QModelIndex(), origem, origem, QModelIndex(), destino):
+            return False
+        conteudos = self.conteudos
+        conteudo = conteudos.pop(origem)
+        conteudos.insert(destino - 1 if destino > origem else destino, conteudo)
+        self.endMoveRows()
+        self.ordemAlterada.emit(self.tipo)
+        return True
+
+class DraggableListView(QListView):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setDragDropMode(QListWidget.InternalMove)
+        self.setDragDropMode(QListView.InternalMove)
         self.setDefaultDropAction(Qt.MoveAction)
-        self.setSelectionMode(QListWidget.SingleSelection)
-        self.tipo = ""
+        self.setSelectionMode(QListView.SingleSelection)
+        self.setDragDropOverwriteMode(False)
         self.setAcceptDrops(True)
         self.setDragEnabled(True)
         self.setDropIndicatorShown(True)
+        # Todas as linhas têm a mesma altura; evita medir cada uma ao inserir lotes grandes
+        self.setUniformItemSizes(True)
     
     def dropEvent(self, event):
-        super().dropEvent(event)
-        self.emitir_movimento()
-    
-    def emitir_movimento(self):
-        items = []
-        for i in range(self.count()):
-            item = self.item(i)
-            items.append(item.text())
-        self.itemMoved.emit(self.tipo, items)
+        origem = self.currentIndex()
+        if event.source() is not self or not origem.isValid():
+            event.ignore()
+            return
+        
+        alvo = self.indexAt(event.pos())
+        posicao = self.dropIndicatorPosition()
+        if not alvo.isValid() or posicao == QListView.OnViewport:
+            destino = self.model().rowCount()
+        elif posicao == QListView.BelowItem:
+            destino = alvo.row() + 1
+        else:
+            destino = alvo.row()
+        
+        self.model().moveRow(QModelIndex(), origem.row(), QModelIndex(), destino)
+        # CopyAction impede que a view remova a linha de origem depois do drop
+        event.setDropAction(Qt.CopyAction)
+        event.accept()
 
 class JanelaMateria(QMainWindow):
-    def __init__(self, materia, parent=None):
+    conteudosAdicionados = pyqtSignal(int)
+    pastaAlterada = pyqtSignal(int, object)
+    
+    def __init__(self, materia, parent=None, cache_miniaturas=None):
         super().__init__(parent)
         self.materia = materia
+        # Fechada, a janela é destruída e deixa de receber miniaturas e sincronizações
+        self.setAttribute(Qt.WA_DeleteOnClose)
         self.setWindowTitle(f"Matéria: {materia.nome}")
         self.setGeometry(200, 200, 800, 600)
         
@@ -285,10 +520,14 @@ class JanelaMateria(QMainWindow):
         
         # Books/Documents Tab
         self.tab_livros = QWidget()
-        self.lista_livros = DraggableListWidget()
-        self.lista_livros.tipo = "livro"
+        self.modelo_livros = ModeloConteudos(materia, 'livro', self, cache_miniaturas)
+        self.lista_livros = DraggableListView()
+        self.lista_livros.setModel(self.modelo_livros)
+        if cache_miniaturas is not None:
+            self.lista_livros.setIconSize(QSize(miniaturas.TAMANHO, miniaturas.TAMANHO))
         self.botao_add_div_livro = QPushButton("Adicionar Divisão")
         self.botao_add_livro = QPushButton("Adicionar Arquivo")
+        self.botao_importar_pasta_livro = QPushButton("Importar Pasta")
         self.botao_remover_item_livro = QPushButton("Remover")
         
         layout_livros = QVBoxLayout()
@@ -297,6 +536,7 @@ class JanelaMateria(QMainWindow):
         botoes_livros = QHBoxLayout()
         botoes_livros.addWidget(self.botao_add_div_livro)
         botoes_livros.addWidget(self.botao_add_livro)
+        botoes_livros.addWidget(self.botao_importar_pasta_livro)
         botoes_livros.addWidget(self.botao_remover_item_livro)
         layout_livros.addLayout(botoes_livros)
         
@@ -304,10 +544,12 @@ class JanelaMateria(QMainWindow):
         
         # Videos Tab
         self.tab_videos = QWidget()
-        self.lista_videos = DraggableListWidget()
-        self.lista_videos.tipo = "video"
+        self.modelo_videos = ModeloConteudos(materia, 'video', self)
+        self.lista_videos = DraggableListView()
+        self.lista_videos.setModel(self.modelo_videos)
         self.botao_add_div_video = QPushButton("Adicionar Divisão")
         self.botao_add_video = QPushButton("Adicionar Vídeo")
+        self.botao_importar_pasta_video = QPushButton("Importar Pasta")
         self.botao_remover_item_video = QPushButton("Remover")
         
         layout_videos = QVBoxLayout()
@@ -316,6 +558,7 @@ class JanelaMateria(QMainWindow):
         botoes_videos = QHBoxLayout()
         botoes_videos.addWidget(self.botao_add_div_video)
         botoes_videos.addWidget(self.botao_add_video)
+        botoes_videos.addWidget(self.botao_importar_pasta_video)
         botoes_videos.addWidget(self.botao_remover_item_video)
         layout_videos.addLayout(botoes_videos)
         
@@ -323,8 +566,9 @@ class JanelaMateria(QMainWindow):
         
         # Live Classes Tab
         self.tab_aulas = QWidget()
-        self.lista_aulas = DraggableListWidget()
-        self.lista_aulas.tipo = "aula"
+        self.modelo_aulas = ModeloConteudos(materia, 'aula', self)
+        self.lista_aulas = DraggableListView()
+        self.lista_aulas.setModel(self.modelo_aulas)
         self.botao_add_aula = QPushButton("Adicionar Aula")
         self.botao_remover_aula = QPushButton("Remover Aula")
         
@@ -342,185 +586,478 @@ class JanelaMateria(QMainWindow):
         self.tabs.addTab(self.tab_videos, "Vídeos")
         self.tabs.addTab(self.tab_aulas, "Aulas ao Vivo")
         
+        self.botao_pasta = QPushButton()
+        self.atualizar_botao_pasta()
+        
         layout = QVBoxLayout()
+        layout.addWidget(self.botao_pasta)
         layout.addWidget(self.tabs)
         
         container = QWidget()
         container.setLayout(layout)
         self.setCentralWidget(container)
         
+        self.modelos = {
+            'livro': self.modelo_livros,
+            'video': self.modelo_videos,
+            'aula': self.modelo_aulas,
+        }
+        self.listas = {
+            'livro': self.lista_livros,
+            'video': self.lista_videos,
+            'aula': self.lista_aulas,
+        }
+        
         # Connections
         self.botao_add_div_livro.clicked.connect(lambda: self.adicionar_divisao('livro'))
         self.botao_add_livro.clicked.connect(lambda: self.adicionar_arquivo('livro'))
+        self.botao_importar_pasta_livro.clicked.connect(self.importar_pasta)
         self.botao_remover_item_livro.clicked.connect(lambda: self.remover_item('livro'))
-        self.lista_livros.itemMoved.connect(self.atualizar_ordem_itens)
-        self.lista_livros.itemDoubleClicked.connect(lambda: self.abrir_item('livro'))
+        self.modelo_livros.ordemAlterada.connect(self.atualizar_ordem_itens)
+        self.lista_livros.doubleClicked.connect(lambda: self.abrir_item('livro'))
+        self.lista_livros.selectionModel().currentChanged.connect(lambda indice: self.item_selecionado('livro', indice))
         
         self.botao_add_div_video.clicked.connect(lambda: self.adicionar_divisao('video'))
         self.botao_add_video.clicked.connect(lambda: self.adicionar_arquivo('video'))
+        self.botao_importar_pasta_video.clicked.connect(self.importar_pasta)
         self.botao_remover_item_video.clicked.connect(lambda: self.remover_item('video'))
-        self.lista_videos.itemMoved.connect(self.atualizar_ordem_itens)
-        self.lista_videos.itemDoubleClicked.connect(lambda: self.abrir_item('video'))
+        self.modelo_videos.ordemAlterada.connect(self.atualizar_ordem_itens)
+        self.lista_videos.doubleClicked.connect(lambda: self.abrir_item('video'))
+        self.lista_videos.selectionModel().currentChanged.connect(lambda indice: self.item_selecionado('video', indice))
         
+        self.botao_pasta.clicked.connect(self.vincular_pasta)
         self.botao_add_aula.clicked.connect(self.adicionar_aula)
         self.botao_remover_aula.clicked.connect(self.remover_aula)
-        self.lista_aulas.itemMoved.connect(self.atualizar_ordem_itens)
-        self.lista_aulas.itemDoubleClicked.connect(lambda: self.abrir_item('aula'))
+        self.modelo_aulas.ordemAlterada.connect(self.atualizar_ordem_itens)
+        self.lista_aulas.doubleClicked.connect(lambda: self.abrir_item('aula'))
         
         self.atualizar_listas()
     
     def abrir_item(self, tipo):
-        lista = None
-        if tipo == 'livro':
-            lista = self.lista_livros
-        elif tipo == 'video':
-            lista = self.lista_videos
-        else:
-            lista = self.lista_aulas
-        
-        item = lista.currentItem()
-        if item:
-            texto = item.text()
-            if "-------------------" not in texto:
-                caminho = texto.split(" | ")[1]
-                
-                if caminho.startswith(('http://', 'https://')):
-                    webbrowser.open(caminho)
-                else:
-                    if sys.platform == 'win32':
-                        os.startfile(caminho)
-                    elif sys.platform == 'darwin':
-                        os.system(f'open "{caminho}"')
-                    else:
-                        os.system(f'xdg-open "{caminho}"')
-    
-    def atualizar_ordem_itens(self, tipo, itens_texto):
-        conteudos = []
-        if tipo == 'livro':
-            lista_original = self.materia.conteudos_livros
-        elif tipo == 'video':
-            lista_original = self.materia.conteudos_videos
-        else:
-            lista_original = self.materia.aulas_ao_vivo
-        
-        nova_ordem = []
-        for texto in itens_texto:
-            if "-------------------" in texto:
-                nome = texto.split("---")[1].strip()
-                conteudo = next((c for c in lista_original if c.nome == nome and getattr(c, 'is_divisao', False)), None)
-            else:
-                nome = texto.split(" | ")[0]
-                conteudo = next((c for c in lista_original if c.nome == nome and not getattr(c, 'is_divisao', False)), None)
-            
-            if conteudo:
-                nova_ordem.append(conteudo)
-        
-        self.materia.atualizar_ordem_conteudos(tipo, nova_ordem)
+        lista = self.listas[tipo]
+        indice = lista.currentIndex()
+        if indice.isValid():
+            conteudo = self.modelos[tipo].conteudo(indice.row())
+            if not conteudo.is_divisao and not lancador.abrir(conteudo.caminho):
+                QMessageBox.warning(self, "Erro", f"Não foi possível abrir '{conteudo.caminho}'.")
+    
+    def item_selecionado(self, tipo, indice):
+        # Adianta a leitura do arquivo enquanto o usuário decide se vai abri-lo
+        if indice.isValid():
+            conteudo = self.modelos[tipo].conteudo(indice.row())
+            if not conteudo.is_divisao:
+                lancador.preaquecer(conteudo.caminho)
+    
+    def atualizar_ordem_itens(self, tipo):
+        # O modelo já moveu o item na lista; só o banco precisa ser atualizado
+        alterados = self.materia.reordenar(tipo, self.materia.conteudos_do_tipo(tipo))
+        if alterados:
+            pedido = assincrono.escrever(Materia.gravar_ordens, alterados)
+            pedido.falhou.connect(self.erro_banco)
+    
+    def gravar_conteudos(self, conteudos):
+        """Grava os conteúdos em segundo plano e os mostra quando tiverem id."""
+        materia = self.materia
+        pedido = assincrono.escrever(Materia.inserir_conteudos, materia.id, Materia.linhas_conteudos(conteudos))
+        # A matéria em cache recebe os ids mesmo se a janela já tiver sido fechada;
+        # modelos e janela só são avisados se ainda existirem
+        pedido.concluido.connect(lambda gravados: materia.anexar_gravados(conteudos, gravados))
+        for tipo in {conteudo.tipo for conteudo in conteudos}:
+            pedido.concluido.connect(self.modelos[tipo].anexados)
+        pedido.concluido.connect(self.conteudos_gravados)
+        pedido.falhou.connect(self.erro_banco)
+    
+    def conteudos_gravados(self):
+        self.conteudosAdicionados.emit(self.materia.id)
+    
+    def erro_banco(self, erro):
+        QMessageBox.warning(self, "Erro", f"Não foi possível salvar a alteração: {erro}")
+        # A memória pode ter ficado à frente do banco; relê a matéria
+        self.materia.carregar_inicio()
         self.atualizar_listas()
     
     def adicionar_divisao(self, tipo):
         nome, ok = QInputDialog.getText(self, "Nova Divisão", "Nome da divisão (opcional):")
         if ok:
             nome = nome if nome else "Div"
-            self.materia.adicionar_divisao(tipo, nome)
-            self.atualizar_listas()
+            self.gravar_conteudos([Conteudo(nome=nome, tipo=tipo, is_divisao=True)])
     
     def adicionar_arquivo(self, tipo):
+        padroes = ' '.join(f"*{extensao}" for extensao in arquivos.EXTENSOES[tipo])
         if tipo == 'livro':
-            filtros = "Documentos (*.pdf *.doc *.docx *.xls *.xlsx *.ppt *.pptx *.xml *.txt);;Todos os arquivos (*)"
+            filtros = f"Documentos ({padroes});;Todos os arquivos (*)"
         else:
-            filtros = "Vídeos (*.mp4 *.avi *.mov *.mkv);;Todos os arquivos (*)"
-        
-        arquivos, _ = QFileDialog.getOpenFileNames(self, f"Selecionar Arquivo(s) de {tipo.capitalize()}", "", filtros)
-        
-        if arquivos:
-            for arquivo in arquivos:
-                nome = os.path.basename(arquivo)
-                conteudo = Conteudo(nome, arquivo, tipo)
-                try:
-                    self.materia.adicionar_conteudo(conteudo)
-                except Exception as e:
-                    QMessageBox.warning(self, "Erro", f"Não foi possível adicionar o arquivo: {e}")
-            
-            self.atualizar_listas()
+            filtros = f"Vídeos ({padroes});;Todos os arquivos (*)"
+        
+        selecionados, _ = QFileDialog.getOpenFileNames(self, f"Selecionar Arquivo(s) de {tipo.capitalize()}", "", filtros)
+        
+        if selecionados:
+            self.gravar_conteudos([Conteudo(os.path.basename(arquivo), arquivo, tipo) for arquivo in selecionados])
+    
+    def importar_pasta(self):
+        raiz = QFileDialog.getExistingDirectory(self, "Importar Pasta")
+        if not raiz:
+            return
+        
+        self.progresso_pasta = QProgressDialog("Procurando arquivos...", "Cancelar", 0, 0, self)
+        self.progresso_pasta.setWindowModality(Qt.WindowModal)
+        self.progresso_pasta.setMinimumDuration(500)
+        
+        self.importador_pasta = ImportadorPasta(raiz, parent=self)
+        self.importador_pasta.lote.connect(self.lote_encontrado)
+        self.importador_pasta.finished.connect(self.progresso_pasta.reset)
+        self.progresso_pasta.canceled.connect(self.importador_pasta.requestInterruption)
+        self.botao_importar_pasta_livro.setEnabled(False)
+        self.botao_importar_pasta_video.setEnabled(False)
+        self.importador_pasta.finished.connect(lambda: self.botao_importar_pasta_livro.setEnabled(True))
+        self.importador_pasta.finished.connect(lambda: self.botao_importar_pasta_video.setEnabled(True))
+        assincrono.acompanhar(self.importador_pasta)
+        self.importador_pasta.start()
+    
+    def lote_encontrado(self, linhas, encontrados):
+        # Cada lote vira uma transação na fila de escrita
+        self.progresso_pasta.setLabelText(f"{encontrados} arquivos encontrados...")
+        self.gravar_conteudos([
+            Conteudo(nome, caminho, tipo, is_divisao)
+            for tipo, nome, caminho, is_divisao in linhas
+        ])
+    
+    def closeEvent(self, event):
+        # A importação é filha da janela: espera a thread antes de ela ser destruída
+        importador = getattr(self, 'importador_pasta', None)
+        if importador is not None and importador.isRunning():
+            importador.requestInterruption()
+            importador.wait()
+        super().closeEvent(event)
     
     def adicionar_aula(self):
         link, ok = QInputDialog.getText(self, "Adicionar Aula ao Vivo", "Cole o link da aula (YouTube/Zoom):")
         if ok and link:
-            nome = f"Aula {len(self.materia.aulas_ao_vivo) + 1}"
-            conteudo = Conteudo(nome, link, 'aula')
-            self.materia.adicionar_conteudo(conteudo)
-            self.atualizar_listas()
+            materia = self.materia
+            pedido = assincrono.escrever(Materia.inserir_aula, materia.id, link)
+            pedido.concluido.connect(lambda novos: materia.anexar_novos(novos))
+            pedido.concluido.connect(self.modelos['aula'].anexados)
+            pedido.concluido.connect(self.conteudos_gravados)
+            pedido.falhou.connect(self.erro_banco)
     
     def remover_item(self, tipo):
         lista = self.lista_livros if tipo == 'livro' else self.lista_videos
-        item = lista.currentItem()
+        indice = lista.currentIndex()
         
-        if item:
+        if indice.isValid():
             resposta = QMessageBox.question(
                 self, "Confirmar", "Tem certeza que deseja remover este item?",
                 QMessageBox.Yes | QMessageBox.No
             )
             
             if resposta == QMessageBox.Yes:
-                texto = item.text()
-                if texto.startswith("-------------------") and texto.endswith("-------------------"):
-                    nome = texto.replace("-", "").strip()
-                    caminho = ""
-                    is_divisao = True
-                else:
-                    partes = texto.split(" | ")
-                    nome = partes[0]
-                    caminho = partes[1] if len(partes) > 1 else ""
-                    is_divisao = False
-                
-                conteudo = Conteudo(nome, caminho, tipo, is_divisao)
-                self.materia.remover_conteudo(conteudo)
-                self.atualizar_listas()
+                conteudo = self.modelos[tipo].remover(indice.row())
+                assincrono.escrever(Materia.apagar_conteudo, conteudo.id).falhou.connect(self.erro_banco)
             
     def remover_aula(self):
-        item = self.lista_aulas.currentItem()
+        indice = self.lista_aulas.currentIndex()
         
-        if item:
+        if indice.isValid():
             resposta = QMessageBox.question(
                 self, "Confirmar", "Tem certeza que deseja remover esta aula?",
                 QMessageBox.Yes | QMessageBox.No
             )
             
             if resposta == QMessageBox.Yes:
-                nome = item.text().split(" | ")[0]
-                link = item.text().split(" | ")[1]
-                conteudo = Conteudo(nome, link, 'aula')
-                self.materia.remover_conteudo(conteudo)
-                self.atualizar_listas()
+                conteudo = self.modelo_aulas.remover(indice.row())
+                assincrono.escrever(Materia.apagar_conteudo, conteudo.id).falhou.connect(self.erro_banco)
     
+    @diagnostico.medido
     def atualizar_listas(self):
-        self.lista_livros.clear()
-        for conteudo in self.materia.conteudos_livros:
-            item = QListWidgetItem(str(conteudo))
-            if conteudo.is_divisao:
-                item.setBackground(Qt.lightGray)
-                font = QFont()
-                font.setBold(True)
-                item.setFont(font)
-            self.lista_livros.addItem(item)
-        
-        self.lista_videos.clear()
-        for conteudo in self.materia.conteudos_videos:
-            item = QListWidgetItem(str(conteudo))
-            if conteudo.is_divisao:
-                item.setBackground(Qt.lightGray)
-                font = QFont()
-                font.setBold(True)
-                item.setFont(font)
-            self.lista_videos.addItem(item)
-        
-        self.lista_aulas.clear()
-        for aula in self.materia.aulas_ao_vivo:
-            self.lista_aulas.addItem(str(aula))
+        for modelo in self.modelos.values():
+            modelo.recarregar()
+    
+    def metadados_alterados(self):
+        self.modelo_livros.metadados_alterados()
+        self.modelo_videos.metadados_alterados()
+    
+    def materia_sincronizada(self, materia_id):
+        if materia_id == self.materia.id:
+            for modelo in self.modelos.values():
+                modelo.anexados()
+            self.metadados_alterados()
+    
+    def atualizar_botao_pasta(self):
+        if self.materia.pasta:
+            self.botao_pasta.setText(f"Parar Sincronização ({self.materia.pasta})")
+        else:
+            self.botao_pasta.setText("Sincronizar com Pasta")
+    
+    def vincular_pasta(self):
+        if self.materia.pasta:
+            resposta = QMessageBox.question(
+                self, "Confirmar", f"Parar de sincronizar com '{self.materia.pasta}'?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if resposta != QMessageBox.Yes:
+                return
+            pasta = None
+        else:
+            pasta = QFileDialog.getExistingDirectory(self, "Sincronizar com Pasta")
+            if not pasta:
+                return
+            pasta = os.path.abspath(pasta)
+        
+        self.materia.pasta = pasta
+        assincrono.escrever(Materia.gravar_pasta, self.materia.id, pasta).falhou.connect(self.erro_banco)
+        self.atualizar_botao_pasta()
+        self.pastaAlterada.emit(self.materia.id, pasta)
+
+class ExportadorBackup(QThread):
+    """Exporta o backup fora da thread da interface."""
+    progresso = pyqtSignal(int, int)
+    concluido = pyqtSignal(bool)
+    falhou = pyqtSignal(str)
+    
+    def __init__(self, caminho, compactar=False, incremental=False, parent=None):
+        super().__init__(parent)
+        self.caminho = caminho
+        self.compactar = compactar
+        self.incremental = incremental
+    
+    def run(self):
+        import backup
+        try:
+            if self.incremental:
+                backup.exportar_incremental(self.caminho, self.compactar, escrever=assincrono.gravar)
+                exportado = True
+            else:
+                exportado = backup.exportar(
+                    self.caminho, self.progresso.emit, self.isInterruptionRequested,
+                    self.compactar, com_ids=True, escrever=assincrono.gravar
+                )
+            self.concluido.emit(exportado)
+        except Exception as e:
+            self.falhou.emit(str(e))
+        finally:
+            banco.fechar()
+
+class ImportadorPasta(QThread):
+    """Percorre uma pasta fora da thread da interface, entregando os arquivos em lotes.
+
+    A gravação fica com quem recebe o sinal lote(linhas, encontrados).
+    """
+    lote = pyqtSignal(object, int)
+    
+    def __init__(self, raiz, tamanho_lote=500, parent=None):
+        super().__init__(parent)
+        self.raiz = raiz
+        self.tamanho_lote = tamanho_lote
+    
+    def run(self):
+        linhas = []
+        encontrados = 0
+        for linha in arquivos.percorrer(self.raiz):
+            if self.isInterruptionRequested():
+                return
+            linhas.append(linha)
+            encontrados += not linha[3]
+            if len(linhas) >= self.tamanho_lote:
+                self.lote.emit(linhas, encontrados)
+                linhas = []
+        if linhas:
+            self.lote.emit(linhas, encontrados)
+
+class VigiaPastas(QObject):
+    """Mantém as matérias vinculadas a pastas em dia com o que entra e sai delas.
+
+    Cada pasta da árvore é vigiada com QFileSystemWatcher e, de tempos em
+    tempos, o mtime de todas é conferido, para sistemas de arquivos que não
+    avisam (montagens de rede, por exemplo). Só a pasta que mudou é relida;
+    a diferença é gravada pela fila de escrita com Materia.sincronizar_pasta.
+    Uma pasta pode pertencer a mais de uma matéria (a mesma raiz ou raízes
+    uma dentro da outra); a releitura é sincronizada em todas elas.
+    """
+    sincronizada = pyqtSignal(int, object)
+    
+    ESPERA = 500                # ms entre o aviso e a releitura, para juntar rajadas
+    INTERVALO_CONFERENCIA = 60000
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.raizes = {}        # materia_id -> raiz
+        self.pastas = {}        # pasta -> {materia_id: raiz}
+        self.mtimes = {}        # pasta -> mtime_ns da última releitura
+        self.agendadas = set()
+        
+        self.observador = QFileSystemWatcher(self)
+        self.observador.directoryChanged.connect(self.agendar)
+        
+        self.temporizador = QTimer(self)
+        self.temporizador.setSingleShot(True)
+        self.temporizador.setInterval(self.ESPERA)
+        self.temporizador.timeout.connect(self.reler_agendadas)
+        
+        self.conferencia = QTimer(self)
+        self.conferencia.setInterval(self.INTERVALO_CONFERENCIA)
+        self.conferencia.timeout.connect(self.conferir)
+        self.conferencia.start()
+    
+    def vigiar(self, materia_id, raiz):
+        """Começa a vigiar raiz; a primeira passada relê todas as pastas da árvore."""
+        self.parar(materia_id)
+        self.raizes[materia_id] = raiz
+        pedido = assincrono.ler(arquivos.listar_subpastas, raiz)
+        pedido.concluido.connect(lambda pastas: self._adicionar(materia_id, raiz, pastas))
+    
+    def parar(self, materia_id):
+        self.raizes.pop(materia_id, None)
+        pastas = []
+        for pasta, donos in list(self.pastas.items()):
+            if donos.pop(materia_id, None) is not None and not donos:
+                # Só sai da vigia quando nenhuma outra matéria usa a pasta
+                del self.pastas[pasta]
+                self.mtimes.pop(pasta, None)
+                pastas.append(pasta)
+        vigiadas = set(self.observador.directories())
+        pastas = [pasta for pasta in pastas if pasta in vigiadas]
+        if pastas:
+            self.observador.removePaths(pastas)
+    
+    def parar_todas(self):
+        for materia_id in list(self.raizes):
+            self.parar(materia_id)
+    
+    def _adicionar(self, materia_id, raiz, pastas):
+        # A matéria pode ter sido desvinculada enquanto a árvore era lida
+        if self.raizes.get(materia_id) != raiz:
+            return
+        novas = [pasta for pasta in pastas if pasta not in self.pastas]
+        if novas:
+            self.observador.addPaths(novas)
+        agendar = []
+        for pasta in pastas:
+            donos = self.pastas.setdefault(pasta, {})
+            if materia_id not in donos:
+                donos[materia_id] = raiz
+                # Já vigiada por outra matéria: relê mesmo sem mudança, para esta
+                self.mtimes.pop(pasta, None)
+                agendar.append(pasta)
+        if agendar:
+            self.agendar(*agendar)
+    
+    def agendar(self, *pastas):
+        self.agendadas.update(pastas)
+        self.temporizador.start()
+    
+    def reler_agendadas(self):
+        agendadas, self.agendadas = self.agendadas, set()
+        for pasta in agendadas:
+            if pasta in self.pastas:
+                pedido = assincrono.ler(arquivos.listar_pasta, pasta)
+                pedido.concluido.connect(lambda listagem, pasta=pasta: self._relida(pasta, listagem))
+    
+    def _relida(self, pasta, listagem):
+        if pasta not in self.pastas:
+            return
+        mtime, encontrados, subpastas = listagem if listagem is not None else (None, None, [])
+        if pasta in self.mtimes and self.mtimes[pasta] == mtime:
+            return
+        self.mtimes[pasta] = mtime
+        
+        if listagem is None:
+            # A pasta sumiu; a conferência periódica percebe se ela voltar
+            if pasta in self.observador.directories():
+                self.observador.removePath(pasta)
+        elif pasta not in self.observador.directories():
+            self.observador.addPath(pasta)
+        
+        for materia_id, raiz in list(self.pastas[pasta].items()):
+            # Subpastas novas (com o que houver dentro) entram na vigia
+            self._adicionar(materia_id, raiz, subpastas)
+            
+            pedido = assincrono.escrever(Materia.sincronizar_pasta, materia_id, raiz, pasta, encontrados)
+            pedido.concluido.connect(lambda resultado, materia_id=materia_id: self._sincronizada(materia_id, resultado))
+    
+    def _sincronizada(self, materia_id, resultado):
+        novos, metadados = resultado
+        if novos or metadados:
+            self.sincronizada.emit(materia_id, resultado)
+    
+    def conferir(self):
+        if self.mtimes:
+            pedido = assincrono.ler(arquivos.mtimes, list(self.mtimes))
+            pedido.concluido.connect(self._conferidas)
+    
+    def _conferidas(self, atuais):
+        alteradas = [
+            pasta for pasta, mtime in atuais.items()
+            if pasta in self.mtimes and self.mtimes[pasta] != mtime
+        ]
+        if alteradas:
+            self.agendar(*alteradas)
+
+class VerificadorArquivos(QThread):
+    """Confere tamanho, data e existência dos arquivos fora da thread da interface."""
+    concluido = pyqtSignal(object)
+    falhou = pyqtSignal(str)
+    
+    def __init__(self, materia_id=None, parent=None):
+        super().__init__(parent)
+        self.materia_id = materia_id
+    
+    def run(self):
+        try:
+            # As gravações vão para a fila de escrita, junto com as da interface
+            self.concluido.emit(arquivos.verificar(
+                self.materia_id, cancelado=self.isInterruptionRequested, escrever=assincrono.gravar
+            ))
+        except Exception as e:
+            self.falhou.emit(str(e))
+        finally:
+            banco.fechar()
+
+class CalculadorHashes(QThread):
+    """Calcula os hashes pendentes e monta o relatório de duplicados."""
+    progresso = pyqtSignal(object, object)
+    concluido = pyqtSignal(object)
+    falhou = pyqtSignal(str)
+    
+    def run(self):
+        import duplicados
+        try:
+            calculados = duplicados.atualizar_hashes(
+                self.progresso.emit, self.isInterruptionRequested, escrever=assincrono.gravar
+            )
+            self.concluido.emit(None if calculados is None else duplicados.duplicados())
+        except Exception as e:
+            self.falhou.emit(str(e))
+        finally:
+            banco.fechar()
+
+class ImportadorBackup(QThread):
+    """Restaura um backup fora da thread da interface."""
+    progresso = pyqtSignal(int, int)
+    concluido = pyqtSignal(object)
+    falhou = pyqtSignal(str)
+    
+    def __init__(self, caminhos, substituir=False, parent=None):
+        super().__init__(parent)
+        self.caminhos = caminhos
+        self.substituir = substituir
+    
+    def run(self):
+        import backup
+        try:
+            # Uma única transação, então roda inteira na thread de escrita: as
+            # gravações da interface esperam na fila em vez de dar "database is locked"
+            resultado = assincrono.gravar(
+                backup.restaurar, self.caminhos, self.substituir, self.progresso.emit, self.isInterruptionRequested
+            )
+            self.concluido.emit(resultado)
+        except Exception as e:
+            self.falhou.emit(str(e))
+        finally:
+            banco.fechar()
 
 class JanelaConfig(QMainWindow):
     temaAlterado = pyqtSignal(bool)
+    bibliotecaAlterada = pyqtSignal()
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -536,10 +1073,16 @@ class JanelaConfig(QMainWindow):
         tab_config = QWidget()
         self.botao_tema = QPushButton("Mudar Tema (Claro/Escuro)")
         self.botao_backup = QPushButton("Exportar Backup (JSON)")
+        self.botao_backup_incremental = QPushButton("Exportar Backup Incremental")
+        self.botao_importar = QPushButton("Importar Backup (JSON)")
+        self.botao_duplicados = QPushButton("Procurar Arquivos Duplicados")
         
         layout_config = QVBoxLayout()
         layout_config.addWidget(self.botao_tema)
         layout_config.addWidget(self.botao_backup)
+        layout_config.addWidget(self.botao_backup_incremental)
+        layout_config.addWidget(self.botao_importar)
+        layout_config.addWidget(self.botao_duplicados)
         tab_config.setLayout(layout_config)
         
         tab_ajuda = QWidget()
@@ -554,19 +1097,45 @@ class JanelaConfig(QMainWindow):
             "   - Na aba da matéria, use os botões para adicionar:\n"
             "     * Livros/Documentos (PDF, Word, Excel, etc.)\n"
             "     * Vídeos (MP4, AVI, etc.)\n"
-            "     * Aulas ao vivo (links)\n\n"
+            "     * Aulas ao vivo (links)\n"
+            "   - 'Importar Pasta' adiciona todos os documentos e vídeos de uma\n"
+            "     pasta e das subpastas, com uma divisão para cada subpasta\n"
+            "   - 'Sincronizar com Pasta' adiciona sozinho os arquivos que\n"
+            "     chegarem na pasta e marca os que sumirem\n\n"
             "4. Divisões:\n"
             "   - Adicione divisões para organizar seus materiais\n\n"
             "5. Pesquisar:\n"
-            "   - Digite na barra de pesquisa para filtrar matérias"
+            "   - Digite na barra de pesquisa para filtrar matérias pelo nome,\n"
+            "     módulo, status ou pelo nome/caminho dos seus conteúdos"
         )
         
         layout_ajuda = QVBoxLayout()
         layout_ajuda.addWidget(texto_ajuda)
         tab_ajuda.setLayout(layout_ajuda)
         
+        self.tab_diagnostico = QWidget()
+        self.arvore_diagnostico = QTreeWidget()
+        self.arvore_diagnostico.setHeaderLabels(["Operação / Consulta", "Chamadas", "Média (ms)", "p95 (ms)", "Máx (ms)", "Comandos"])
+        self.caixa_rastrear = QCheckBox("Contar cada comando SQL (deixa importações grandes mais lentas)")
+        self.caixa_rastrear.setChecked(diagnostico.rastreando())
+        self.botao_atualizar_diagnostico = QPushButton("Atualizar")
+        self.botao_zerar_diagnostico = QPushButton("Zerar")
+        self.botao_exportar_diagnostico = QPushButton("Exportar JSON")
+        
+        botoes_diagnostico = QHBoxLayout()
+        botoes_diagnostico.addWidget(self.botao_atualizar_diagnostico)
+        botoes_diagnostico.addWidget(self.botao_zerar_diagnostico)
+        botoes_diagnostico.addWidget(self.botao_exportar_diagnostico)
+        
+        layout_diagnostico = QVBoxLayout()
+        layout_diagnostico.addWidget(self.arvore_diagnostico)
+        layout_diagnostico.addWidget(self.caixa_rastrear)
+        layout_diagnostico.addLayout(botoes_diagnostico)
+        self.tab_diagnostico.setLayout(layout_diagnostico)
+        
         self.tabs.addTab(tab_config, "Configurações")
         self.tabs.addTab(tab_ajuda, "Ajuda")
+        self.tabs.addTab(self.tab_diagnostico, "Diagnóstico")
         
         layout = QVBoxLayout()
         layout.addWidget(self.tabs)
@@ -577,6 +1146,16 @@ class JanelaConfig(QMainWindow):
         
         self.botao_tema.clicked.connect(self.mudar_tema)
         self.botao_backup.clicked.connect(self.exportar_backup)
+        self.botao_backup_incremental.clicked.connect(lambda: self.exportar_backup(incremental=True))
+        self.botao_importar.clicked.connect(self.importar_backup)
+        self.botao_duplicados.clicked.connect(self.procurar_duplicados)
+        self.caixa_rastrear.toggled.connect(diagnostico.rastrear)
+        self.botao_atualizar_diagnostico.clicked.connect(self.atualizar_diagnostico)
+        self.botao_zerar_diagnostico.clicked.connect(self.zerar_diagnostico)
+        self.botao_exportar_diagnostico.clicked.connect(self.exportar_diagnostico)
+        self.tabs.currentChanged.connect(
+            lambda indice: self.atualizar_diagnostico() if self.tabs.widget(indice) is self.tab_diagnostico else None
+        )
         
         self.tema_escuro = True
     
@@ -599,10 +1178,10 @@ class JanelaConfig(QMainWindow):
                 padding: 8px;
                 min-height: 30px;
             }
-            QListWidget {
+            QListView {
                 font-size: 14px;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 6px;
             }
             QTabWidget::pane {
@@ -625,7 +1204,7 @@ class JanelaConfig(QMainWindow):
                     color: white;
                     border: 1px solid #777;
                 }
-                QListWidget {
+                QListView {
                     background-color: #444;
                     color: white;
                 }
@@ -658,7 +1237,7 @@ class JanelaConfig(QMainWindow):
                     color: white;
                     border: none;
                 }
-                QListWidget {
+                QListView {
                     background-color: white;
                     color: black;
                 }
@@ -681,33 +1260,214 @@ class JanelaConfig(QMainWindow):
                 }
             """)
     
-    def exportar_backup(self):
-        caminho = QFileDialog.getSaveFileName(
-            self, "Exportar Backup", "", "JSON Files (*.json)"
-        )[0]
+    def exportar_backup(self, incremental=False):
+        titulo = "Exportar Backup Incremental" if incremental else "Exportar Backup"
+        caminho, filtro = QFileDialog.getSaveFileName(
+            self, titulo, "", "JSON Files (*.json);;JSON compactado (*.json.gz)"
+        )
         
         if caminho:
-            materias = Materia.carregar_todas()
-            dados = []
-            
-            for materia in materias:
-                dados.append({
-                    "nome": materia.nome,
-                    "modulo": materia.modulo,
-                    "status": materia.status,
-                    "conteudos_livros": [{"nome": c.nome, "caminho": c.caminho, "is_divisao": c.is_divisao} 
-                                      for c in materia.conteudos_livros],
-                    "conteudos_videos": [{"nome": c.nome, "caminho": c.caminho, "is_divisao": c.is_divisao} 
-                                       for c in materia.conteudos_videos],
-                    "aulas_ao_vivo": [{"nome": a.nome, "caminho": a.caminho} for a in materia.aulas_ao_vivo]
-                })
+            compactar = caminho.endswith('.gz') or filtro.startswith("JSON compactado")
+            if compactar and not caminho.endswith('.gz'):
+                caminho += '.gz'
             
-            with open(caminho, 'w') as f:
-                json.dump(dados, f, indent=4)
+            self.progresso_backup = QProgressDialog("Exportando backup...", "Cancelar", 0, 0, self)
+            self.progresso_backup.setWindowModality(Qt.WindowModal)
+            self.progresso_backup.setMinimumDuration(500)
             
+            self.exportador = ExportadorBackup(caminho, compactar, incremental, self)
+            self.exportador.progresso.connect(self.atualizar_progresso_backup)
+            self.exportador.concluido.connect(self.backup_concluido)
+            self.exportador.falhou.connect(self.backup_falhou)
+            self.progresso_backup.canceled.connect(self.exportador.requestInterruption)
+            self.botao_backup.setEnabled(False)
+            self.botao_backup_incremental.setEnabled(False)
+            assincrono.acompanhar(self.exportador)
+            self.exportador.start()
+    
+    def atualizar_progresso_backup(self, feitos, total):
+        self.progresso_backup.setMaximum(total)
+        self.progresso_backup.setValue(feitos)
+    
+    def backup_concluido(self, exportado):
+        self.progresso_backup.reset()
+        self.botao_backup.setEnabled(True)
+        self.botao_backup_incremental.setEnabled(True)
+        if exportado:
             QMessageBox.information(self, "Sucesso", "Backup exportado com sucesso!")
+    
+    def backup_falhou(self, erro):
+        self.progresso_backup.reset()
+        self.botao_backup.setEnabled(True)
+        self.botao_backup_incremental.setEnabled(True)
+        QMessageBox.warning(self, "Erro", f"Não foi possível exportar o backup: {erro}")
+    
+    def importar_backup(self):
+        # Um backup completo e/ou os incrementais gravados depois dele
+        caminhos = QFileDialog.getOpenFileNames(
+            self, "Importar Backup", "", "Backups (*.json *.json.gz);;Todos os arquivos (*)"
+        )[0]
+        
+        if caminhos:
+            import backup
+            substituir = False
+            if not all(backup.eh_incremental(caminho) for caminho in caminhos):
+                substituir = self.perguntar_modo_importacao()
+                if substituir is None:
+                    return
+            
+            self.progresso_importacao = QProgressDialog("Importando backup...", "Cancelar", 0, 0, self)
+            self.progresso_importacao.setWindowModality(Qt.ApplicationModal)
+            self.progresso_importacao.setMinimumDuration(500)
+            
+            self.importador = ImportadorBackup(caminhos, substituir, self)
+            self.importador.progresso.connect(self.atualizar_progresso_importacao)
+            self.importador.concluido.connect(self.importacao_concluida)
+            self.importador.falhou.connect(self.importacao_falhou)
+            self.progresso_importacao.canceled.connect(self.importador.requestInterruption)
+            self.botao_importar.setEnabled(False)
+            assincrono.acompanhar(self.importador)
+            self.importador.start()
+    
+    def perguntar_modo_importacao(self):
+        """True para substituir, False para mesclar, None se cancelado."""
+        caixa = QMessageBox(self)
+        caixa.setWindowTitle("Importar Backup")
+        caixa.setText("Como importar o backup?")
+        caixa.setInformativeText(
+            "Mesclar mantém as matérias atuais e acrescenta o que faltar.\n"
+            "Substituir apaga a biblioteca atual antes de importar "
+            "(necessário para aplicar backups incrementais)."
+        )
+        botao_mesclar = caixa.addButton("Mesclar", QMessageBox.AcceptRole)
+        botao_substituir = caixa.addButton("Substituir", QMessageBox.DestructiveRole)
+        caixa.addButton(QMessageBox.Cancel)
+        caixa.exec_()
+        if caixa.clickedButton() is botao_substituir:
+            return True
+        if caixa.clickedButton() is botao_mesclar:
+            return False
+        return None
+    
+    def atualizar_progresso_importacao(self, lidos, total):
+        self.progresso_importacao.setMaximum(total)
+        self.progresso_importacao.setValue(lidos)
+    
+    def importacao_concluida(self, resultado):
+        self.progresso_importacao.reset()
+        self.botao_importar.setEnabled(True)
+        if resultado is not None:
+            materias, conteudos = resultado
+            self.bibliotecaAlterada.emit()
+            QMessageBox.information(
+                self, "Sucesso",
+                f"Backup importado: {materias} matéria(s) nova(s) e {conteudos} conteúdo(s)."
+            )
+    
+    def importacao_falhou(self, erro):
+        self.progresso_importacao.reset()
+        self.botao_importar.setEnabled(True)
+        QMessageBox.warning(self, "Erro", f"Não foi possível importar o backup: {erro}")
+    
+    def procurar_duplicados(self):
+        # Só arquivos novos ou alterados desde a última busca são lidos
+        self.progresso_hashes = QProgressDialog("Calculando hashes dos arquivos...", "Cancelar", 0, 0, self)
+        self.progresso_hashes.setWindowModality(Qt.WindowModal)
+        self.progresso_hashes.setMinimumDuration(500)
+        
+        self.calculador = CalculadorHashes(self)
+        self.calculador.progresso.connect(self.atualizar_progresso_hashes)
+        self.calculador.concluido.connect(self.hashes_calculados)
+        self.calculador.falhou.connect(self.hashes_falharam)
+        self.progresso_hashes.canceled.connect(self.calculador.requestInterruption)
+        self.botao_duplicados.setEnabled(False)
+        assincrono.acompanhar(self.calculador)
+        self.calculador.start()
+    
+    def atualizar_progresso_hashes(self, lidos, total):
+        # Em bytes pode passar do limite de int do Qt; a barra vai em milésimos
+        self.progresso_hashes.setMaximum(1000)
+        self.progresso_hashes.setValue(lidos * 1000 // total if total else 1000)
+    
+    def hashes_calculados(self, grupos):
+        self.progresso_hashes.reset()
+        self.botao_duplicados.setEnabled(True)
+        if grupos is None:
+            return
+        if not grupos:
+            QMessageBox.information(self, "Duplicados", "Nenhum arquivo duplicado encontrado.")
+            return
+        
+        dialogo = DialogoDuplicados(grupos, self)
+        if dialogo.exec_() and dialogo.marcados():
+            import duplicados
+            pedido = assincrono.escrever(duplicados.colapsar, dialogo.marcados())
+            pedido.concluido.connect(self.duplicados_colapsados)
+            pedido.falhou.connect(lambda erro: QMessageBox.warning(self, "Erro", f"Não foi possível unificar: {erro}"))
+    
+    def duplicados_colapsados(self, resultado):
+        removidos, redirecionados = resultado
+        self.bibliotecaAlterada.emit()
+        QMessageBox.information(
+            self, "Duplicados",
+            f"{removidos} conteúdo(s) repetido(s) removido(s) e {redirecionados} redirecionado(s)."
+        )
+    
+    def atualizar_diagnostico(self):
+        dados = diagnostico.estatisticas()
+        self.arvore_diagnostico.clear()
+        
+        def grupo(titulo, medidas):
+            item = QTreeWidgetItem([f"{titulo} ({len(medidas)})"])
+            # As que mais somaram tempo primeiro
+            for nome, medida in sorted(medidas.items(), key=lambda par: -par[1]['total_ms']):
+                filho = QTreeWidgetItem([
+                    nome, str(medida['chamadas']), f"{medida['media_ms']:.2f}",
+                    f"{medida['p95_ms']:g}", f"{medida['maximo_ms']:.1f}", str(medida['comandos'] or '')
+                ])
+                filho.setToolTip(0, nome)
+                item.addChild(filho)
+            self.arvore_diagnostico.addTopLevelItem(item)
+            return item
+        
+        grupo("Operações", dados['operacoes']).setExpanded(True)
+        grupo("Consultas SQL", dados['consultas'])
+        
+        lentas = QTreeWidgetItem([f"Lentas, acima de {dados['limite_lento_ms']} ms ({len(dados['lentas'])})"])
+        for lenta in reversed(dados['lentas']):
+            filho = QTreeWidgetItem([f"{lenta['quando']}  {lenta['nome']}", "", "", "", f"{lenta['ms']:.1f}"])
+            filho.setToolTip(0, lenta['nome'])
+            lentas.addChild(filho)
+        self.arvore_diagnostico.addTopLevelItem(lentas)
+        
+        if dados['comandos']:
+            comandos = QTreeWidgetItem([f"Comandos executados ({len(dados['comandos'])})"])
+            for sql, quantidade in sorted(dados['comandos'].items(), key=lambda par: -par[1]):
+                comandos.addChild(QTreeWidgetItem([sql, str(quantidade)]))
+            self.arvore_diagnostico.addTopLevelItem(comandos)
+        self.arvore_diagnostico.resizeColumnToContents(1)
+    
+    def zerar_diagnostico(self):
+        diagnostico.zerar()
+        self.atualizar_diagnostico()
+    
+    def exportar_diagnostico(self):
+        caminho, _ = QFileDialog.getSaveFileName(self, "Exportar Diagnóstico", "diagnostico.json", "JSON Files (*.json)")
+        if caminho:
+            try:
+                diagnostico.exportar(caminho)
+            except OSError as e:
+                QMessageBox.warning(self, "Erro", f"Não foi possível exportar o diagnóstico: {e}")
+    
+    def hashes_falharam(self, erro):
+        self.progresso_hashes.reset()
+        self.botao_duplicados.setEnabled(True)
+        QMessageBox.warning(self, "Erro", f"Não foi possível procurar duplicados: {erro}")
 
 class MainWindow(QMainWindow):
+    arquivosVerificados = pyqtSignal()
+    materiaSincronizada = pyqtSignal(int)
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("App de Matérias")
@@ -718,16 +1478,41 @@ class MainWindow(QMainWindow):
             self.setWindowIcon(QIcon(icon_path))
         
         self.tema_escuro = True
-        self.materias = Materia.carregar_todas()
-        
-        self.lista_materias = QListWidget()
+        # A primeira pintura usa as matérias da sessão anterior; o banco só é
+        # aberto em iniciar(), depois que a janela aparece
+        self.materias = [Materia(*linha) for linha in instantaneo.carregar(banco.CAMINHO_BANCO)]
+        self.cache_materias = CacheMaterias()
+        # Uma janela por matéria: os modelos dela compartilham as listas da Materia em cache
+        self.janelas_materia = {}
+        self.verificador = None
+        self.verificacoes_pendentes = set()
+        self.vigia = VigiaPastas(self)
+        self.cache_miniaturas = miniaturas.Miniaturas(parent=self)
+        self.vigia.sincronizada.connect(self.pasta_sincronizada)
+        self.indice_materias = busca.IndiceMaterias()
+        
+        self.modelo_materias = ModeloMaterias(self.materias, self)
+        self.lista_materias = QListView()
+        self.lista_materias.setModel(self.modelo_materias)
         self.lista_materias.setIconSize(QSize(32, 32))
+        # Todas as linhas têm a mesma altura: sem medir cada matéria
+        self.lista_materias.setUniformItemSizes(True)
+        # Dispõe as linhas aos poucos depois de cada filtro, sem travar a
+        # digitação com milhares de matérias
+        self.lista_materias.setLayoutMode(QListView.Batched)
+        self.lista_materias.setBatchSize(500)
         self.botao_add_materia = QPushButton("Adicionar Matéria")
         self.botao_editar_materia = QPushButton("Editar Matéria")
         self.botao_remover_materia = QPushButton("Remover Matéria")
         self.botao_config = QPushButton("Configurações")
         self.barra_pesquisa = QLineEdit()
-        self.barra_pesquisa.setPlaceholderText("Pesquisar matéria...")
+        self.barra_pesquisa.setPlaceholderText("Pesquisar matéria ou conteúdo...")
+        
+        # Espera o usuário parar de digitar antes de consultar o banco
+        self.temporizador_busca = QTimer(self)
+        self.temporizador_busca.setSingleShot(True)
+        self.temporizador_busca.setInterval(250)
+        self.geracao_busca = 0
         
         layout = QVBoxLayout()
         layout.addWidget(self.barra_pesquisa)
@@ -749,11 +1534,30 @@ class MainWindow(QMainWindow):
         self.botao_editar_materia.clicked.connect(self.editar_materia)
         self.botao_remover_materia.clicked.connect(self.remover_materia)
         self.botao_config.clicked.connect(self.abrir_config)
-        self.lista_materias.itemDoubleClicked.connect(self.abrir_materia)
-        self.barra_pesquisa.textChanged.connect(self.filtrar_materias)
+        self.lista_materias.doubleClicked.connect(self.abrir_materia)
+        self.barra_pesquisa.textChanged.connect(lambda: self.temporizador_busca.start())
+        self.temporizador_busca.timeout.connect(self.filtrar_materias)
+        
+        # Até a lista vir do banco, nada que grave matérias
+        self.botoes_materias = (self.botao_add_materia, self.botao_editar_materia, self.botao_remover_materia)
+        for botao in self.botoes_materias:
+            botao.setEnabled(False)
         
         self.aplicar_tema()
         self.atualizar_lista_materias()
+        QTimer.singleShot(0, self.iniciar)
+    
+    def iniciar(self):
+        """Abre o banco e confere a lista da primeira pintura."""
+        diagnostico.anotar('MainWindow.primeira_pintura', (time.perf_counter() - INICIO) * 1000)
+        # As leituras esperam as escritas anteriores, então veem o banco já migrado
+        assincrono.escrever(criar_banco_dados)
+        pedido = assincrono.ler(Materia.carregar_cabecalhos)
+        pedido.concluido.connect(self.materias_recarregadas)
+        pedido.falhou.connect(self.erro_leitura)
+    
+    def salvar_instantaneo(self):
+        instantaneo.salvar(banco.CAMINHO_BANCO, self.materias)
     
     def aplicar_tema(self):
         estilo_comum = """
@@ -769,10 +1573,10 @@ class MainWindow(QMainWindow):
                 padding: 8px;
                 min-height: 30px;
             }
-            QListWidget {
+            QListView {
                 font-size: 14px;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 6px;
             }
         """
@@ -788,7 +1592,7 @@ class MainWindow(QMainWindow):
                     color: white;
                     border: 1px solid #777;
                 }
-                QListWidget {
+                QListView {
                     background-color: #444;
                     color: white;
                 }
@@ -809,7 +1613,7 @@ class MainWindow(QMainWindow):
                     color: white;
                     border: none;
                 }
-                QListWidget {
+                QListView {
                     background-color: white;
                     color: black;
                 }
@@ -834,77 +1638,224 @@ class MainWindow(QMainWindow):
                     ["Em andamento", "Concluído", "Aguardando", "Reprovado", "Material de Uso"], 0, False
                 )
                 if ok:
+                    # A matéria só é vista pela interface depois de ganhar id
                     nova_materia = Materia(nome=nome, modulo=modulo, status=status)
-                    nova_materia.salvar()
-                    self.materias = Materia.carregar_todas()
-                    self.atualizar_lista_materias()
+                    pedido = assincrono.escrever(nova_materia.salvar)
+                    pedido.concluido.connect(lambda _: self.materia_adicionada(nova_materia))
+                    pedido.falhou.connect(self.erro_banco)
+    
+    def materia_adicionada(self, materia):
+        self.modelo_materias.inserir(materia)
+        self.indice_materias.atualizar(materia)
+        if self.barra_pesquisa.text():
+            self.filtrar_materias()
+    
+    def erro_banco(self, erro):
+        QMessageBox.warning(self, "Erro", f"Não foi possível salvar a alteração: {erro}")
+        self.recarregar_materias()
+    
+    def erro_leitura(self, erro):
+        # Nada foi alterado: não há o que reler (e reler poderia falhar de novo)
+        QMessageBox.warning(self, "Erro", f"Não foi possível ler o banco de dados: {erro}")
     
     def editar_materia(self):
-        item = self.lista_materias.currentItem()
-        if item:
-            materia_id = item.data(Qt.UserRole)
-            materia = next((m for m in self.materias if m.id == materia_id), None)
-            if materia:
-                dialog = EditarMateriaDialog(materia)
-                if dialog.exec_():
-                    data = dialog.get_data()
-                    materia.nome = data["nome"]
-                    materia.modulo = data["modulo"]
-                    materia.status = data["status"]
-                    materia.salvar()
-                    self.atualizar_lista_materias()
+        indice = self.lista_materias.currentIndex()
+        if indice.isValid():
+            materia = self.modelo_materias.materias[indice.row()]
+            dialog = EditarMateriaDialog(materia)
+            if dialog.exec_():
+                data = dialog.get_data()
+                materia.nome = data["nome"]
+                materia.modulo = data["modulo"]
+                materia.status = data["status"]
+                pedido = assincrono.escrever(Materia.gravar_cabecalho, materia.id, materia.nome, materia.modulo, materia.status)
+                pedido.falhou.connect(self.erro_banco)
+                # A cópia em cache pode estar aberta numa janela: atualiza em vez de descartar
+                aberta = self.cache_materias.buscar(materia.id)
+                if aberta is not None:
+                    aberta.nome, aberta.modulo, aberta.status = materia.nome, materia.modulo, materia.status
+                janela = self.janelas_materia.get(materia.id)
+                if janela is not None:
+                    janela.setWindowTitle(f"Matéria: {materia.nome}")
+                self.indice_materias.atualizar(materia)
+                self.modelo_materias.atualizar(indice.row())
     
     def remover_materia(self):
-        item = self.lista_materias.currentItem()
-        if item:
-            materia_id = item.data(Qt.UserRole)
-            materia = next((m for m in self.materias if m.id == materia_id), None)
-            if materia:
-                resposta = QMessageBox.question(
-                    self, "Confirmar", f"Tem certeza que deseja remover '{materia.nome}'?",
-                    QMessageBox.Yes | QMessageBox.No
-                )
-                if resposta == QMessageBox.Yes:
-                    Materia.remover_por_id(materia.id)
-                    self.materias = Materia.carregar_todas()
-                    self.atualizar_lista_materias()
-    
-    def abrir_materia(self, item):
-        materia_id = item.data(Qt.UserRole)
-        materia = next((m for m in self.materias if m.id == materia_id), None)
-        if materia:
-            self.janela_materia = JanelaMateria(materia, self)
-            self.janela_materia.show()
+        indice = self.lista_materias.currentIndex()
+        if indice.isValid():
+            materia = self.modelo_materias.materias[indice.row()]
+            resposta = QMessageBox.question(
+                self, "Confirmar", f"Tem certeza que deseja remover '{materia.nome}'?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if resposta == QMessageBox.Yes:
+                assincrono.escrever(Materia.remover_por_id, materia.id).falhou.connect(self.erro_banco)
+                self.vigia.parar(materia.id)
+                self.fechar_janelas(materia.id)
+                self.cache_materias.invalidar(materia.id)
+                self.indice_materias.remover(materia.id)
+                self.modelo_materias.remover(indice.row())
+    
+    def abrir_materia(self, indice):
+        if indice.isValid():
+            cabecalho = self.modelo_materias.materias[indice.row()]
+            materia = self.cache_materias.buscar(cabecalho.id)
+            if materia is not None:
+                self.mostrar_materia(materia)
+            else:
+                # Os conteúdos são lidos fora da thread da interface
+                pedido = assincrono.ler(CacheMaterias.carregar, cabecalho)
+                pedido.concluido.connect(lambda materia: self.mostrar_materia(self.cache_materias.guardar(materia)))
+                pedido.falhou.connect(self.erro_leitura)
+    
+    @diagnostico.medido
+    def mostrar_materia(self, materia):
+        janela = self.janelas_materia.get(materia.id)
+        # Uma janela recém-fechada espera para ser destruída: abre outra
+        if janela is not None and janela.isVisible():
+            self.janela_materia = janela
+            janela.show()
+            janela.raise_()
+            janela.activateWindow()
+            return
+        janela = self.janela_materia = self.janelas_materia[materia.id] = JanelaMateria(materia, self, self.cache_miniaturas)
+        self.cache_materias.fixar(materia.id)
+        janela.destroyed.connect(lambda _=None: self.janela_destruida(materia.id, janela))
+        self.janela_materia.conteudosAdicionados.connect(self.verificar_arquivos)
+        self.janela_materia.pastaAlterada.connect(self.pasta_alterada)
+        self.materiaSincronizada.connect(self.janela_materia.materia_sincronizada)
+        self.arquivosVerificados.connect(self.janela_materia.metadados_alterados)
+        self.janela_materia.show()
+        self.verificar_arquivos(materia.id)
+    
+    def janela_destruida(self, materia_id, janela):
+        if self.janelas_materia.get(materia_id) is janela:
+            del self.janelas_materia[materia_id]
+        if getattr(self, 'janela_materia', None) is janela:
+            self.janela_materia = None
+        # Uma janela nova da mesma matéria pode ter sido aberta antes desta ser destruída
+        if materia_id not in self.janelas_materia:
+            self.cache_materias.soltar(materia_id)
+    
+    def fechar_janelas(self, materia_id=None):
+        """Fecha a janela da matéria (ou todas), antes de a cópia em cache ser descartada."""
+        ids = list(self.janelas_materia) if materia_id is None else [materia_id]
+        for id in ids:
+            janela = self.janelas_materia.pop(id, None)
+            if janela is not None:
+                janela.close()
+    
+    def verificar_arquivos(self, materia_id=None):
+        # Uma verificação por vez; pedidos no meio do caminho são feitos depois
+        if self.verificador is not None and self.verificador.isRunning():
+            self.verificacoes_pendentes.add(materia_id)
+            return
+        self.verificador = VerificadorArquivos(materia_id, self)
+        self.verificador.concluido.connect(self.arquivos_verificados)
+        self.verificador.falhou.connect(lambda erro: print(f"Erro ao verificar arquivos: {erro}"))
+        self.verificador.finished.connect(self.proxima_verificacao)
+        assincrono.acompanhar(self.verificador)
+        self.verificador.start()
+    
+    def arquivos_verificados(self, metadados):
+        if metadados and any([materia.aplicar_metadados(metadados) for materia in self.cache_materias]):
+            self.arquivosVerificados.emit()
+    
+    def vigiar_pastas(self):
+        self.vigia.parar_todas()
+        for materia in self.materias:
+            if materia.pasta:
+                self.vigia.vigiar(materia.id, materia.pasta)
+    
+    def pasta_alterada(self, materia_id, pasta):
+        for materia in self.materias:
+            if materia.id == materia_id:
+                materia.pasta = pasta
+        if pasta:
+            self.vigia.vigiar(materia_id, pasta)
+        else:
+            self.vigia.parar(materia_id)
+    
+    def pasta_sincronizada(self, materia_id, resultado):
+        novos, metadados = resultado
+        for materia in self.cache_materias:
+            if materia.id == materia_id:
+                materia.anexar_novos(novos)
+                materia.aplicar_metadados(metadados)
+        self.materiaSincronizada.emit(materia_id)
+    
+    def proxima_verificacao(self):
+        if self.verificacoes_pendentes:
+            self.verificar_arquivos(self.verificacoes_pendentes.pop())
     
     def abrir_config(self):
         self.janela_config = JanelaConfig(self)
         self.janela_config.temaAlterado.connect(self.mudar_tema)
+        self.janela_config.bibliotecaAlterada.connect(self.recarregar_materias)
         self.janela_config.show()
     
+    @diagnostico.medido
     def filtrar_materias(self):
-        texto = self.barra_pesquisa.text().lower()
-        for i in range(self.lista_materias.count()):
-            item = self.lista_materias.item(i)
-            materia_id = item.data(Qt.UserRole)
-            materia = next((m for m in self.materias if m.id == materia_id), None)
-            if materia and texto.lower() in materia.nome.lower():
-                item.setHidden(False)
-            else:
-                item.setHidden(True)
+        texto = self.barra_pesquisa.text()
+        self.geracao_busca += 1
+        if not texto.strip():
+            self.aplicar_filtro(None)
+            return
+        
+        # Nome pelo índice em memória, aplicado na hora; módulo, status e
+        # conteúdos pela busca FTS, em uma thread de leitura, somados depois
+        nomes = self.indice_materias.filtrar(texto)
+        self.aplicar_filtro(nomes)
+        geracao = self.geracao_busca
+        pedido = assincrono.ler(busca.materias_correspondentes, texto)
+        pedido.concluido.connect(lambda ids: self.busca_concluida(geracao, nomes, ids))
+    
+    def busca_concluida(self, geracao, nomes, ids):
+        # Descarta respostas de textos que o usuário já mudou
+        if geracao == self.geracao_busca and not ids <= nomes:
+            self.aplicar_filtro(nomes | ids)
     
+    @diagnostico.medido
+    def aplicar_filtro(self, encontradas):
+        # A matéria selecionada continua selecionada se passar no filtro
+        indice = self.lista_materias.currentIndex()
+        selecionada = indice.data(Qt.UserRole) if indice.isValid() else None
+        self.modelo_materias.filtrar(encontradas)
+        if selecionada is not None:
+            linha = self.modelo_materias.linha_de(selecionada)
+            if linha >= 0:
+                self.lista_materias.setCurrentIndex(self.modelo_materias.index(linha))
+    
+    def recarregar_materias(self):
+        pedido = assincrono.ler(Materia.carregar_cabecalhos)
+        pedido.concluido.connect(self.materias_recarregadas)
+    
+    def materias_recarregadas(self, materias):
+        self.materias = materias
+        self.fechar_janelas()
+        self.cache_materias.invalidar()
+        self.atualizar_lista_materias()
+        self.filtrar_materias()
+        self.vigiar_pastas()
+        for botao in self.botoes_materias:
+            botao.setEnabled(True)
+        self.salvar_instantaneo()
+        # Depois que a lista já foi pintada
+        QTimer.singleShot(0, self.indice_materias.preparar)
+    
+    @diagnostico.medido
     def atualizar_lista_materias(self):
-        self.lista_materias.clear()
-        book_icon_path = resource_path('icons/book.png')
-        book_icon = QIcon(book_icon_path) if os.path.exists(book_icon_path) else QIcon()
-        
-        for materia in self.materias:
-            item = QListWidgetItem(str(materia))
-            item.setData(Qt.UserRole, materia.id)
-            item.setIcon(book_icon)
-            self.lista_materias.addItem(item)
+        self.modelo_materias.definir(self.materias)
+        self.indice_materias.definir(self.materias)
 
 if __name__ == "__main__":
+    if getattr(sys, 'frozen', False):
+        # Necessário para o ProcessPoolExecutor dos hashes no executável do PyInstaller
+        import multiprocessing
+        multiprocessing.freeze_support()
     app = QApplication(sys.argv)
+    # Grava o que ainda estiver na fila antes de sair
+    app.aboutToQuit.connect(assincrono.encerrar)
     
     # Criar diretório de ícones se não existir
     icons_dir = resource_path('icons')
@@ -913,4 +1864,7 @@ if __name__ == "__main__":
     
     window = MainWindow()
     window.show()
+    app.aboutToQuit.connect(window.salvar_instantaneo)
+    # Descarta as miniaturas na fila e espera as que estão sendo geradas
+    app.aboutToQuit.connect(window.cache_miniaturas.encerrar)
     sys.exit(app.exec_())
\ No newline at end of file
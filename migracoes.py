@@ -0,0 +1,186 @@
+import banco
+
+# Instante atual em milissegundos, para uso dentro do SQL
+AGORA_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# Cada posição da lista leva o banco da versão N para N + 1.
+# A versão atual fica gravada em PRAGMA user_version.
+MIGRACOES = [
+    # 1: esquema original
+    (
+        '''CREATE TABLE IF NOT EXISTS materias (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT,
+            modulo TEXT,
+            status TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS conteudos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            materia_id INTEGER,
+            tipo TEXT,
+            nome TEXT,
+            caminho TEXT,
+            is_divisao BOOLEAN DEFAULT 0,
+            ordem INTEGER DEFAULT 0,
+            FOREIGN KEY (materia_id) REFERENCES materias(id)
+        )''',
+    ),
+    # 2: ON DELETE CASCADE e índice (materia_id, tipo, ordem).
+    # O SQLite não altera chaves estrangeiras, então a tabela é recriada.
+    (
+        'DELETE FROM conteudos WHERE materia_id IS NULL OR materia_id NOT IN (SELECT id FROM materias)',
+        '''CREATE TABLE conteudos_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            materia_id INTEGER NOT NULL,
+            tipo TEXT,
+            nome TEXT,
+            caminho TEXT,
+            is_divisao BOOLEAN DEFAULT 0,
+            ordem INTEGER DEFAULT 0,
+            FOREIGN KEY (materia_id) REFERENCES materias(id) ON DELETE CASCADE
+        )''',
+        '''INSERT INTO conteudos_nova (id, materia_id, tipo, nome, caminho, is_divisao, ordem)
+           SELECT id, materia_id, tipo, nome, caminho, is_divisao, ordem FROM conteudos''',
+        'DROP TABLE conteudos',
+        'ALTER TABLE conteudos_nova RENAME TO conteudos',
+        'CREATE INDEX IF NOT EXISTS idx_conteudos_materia_tipo_ordem ON conteudos (materia_id, tipo, ordem)',
+    ),
+    # 3: busca textual (FTS5) sobre matérias e conteúdos, mantida por triggers
+    (
+        '''CREATE VIRTUAL TABLE materias_fts USING fts5(
+            nome, modulo, status,
+            content='materias', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )''',
+        '''CREATE VIRTUAL TABLE conteudos_fts USING fts5(
+            nome, caminho,
+            content='conteudos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )''',
+        '''CREATE TRIGGER materias_fts_ai AFTER INSERT ON materias BEGIN
+            INSERT INTO materias_fts (rowid, nome, modulo, status) VALUES (new.id, new.nome, new.modulo, new.status);
+        END''',
+        '''CREATE TRIGGER materias_fts_ad AFTER DELETE ON materias BEGIN
+            INSERT INTO materias_fts (materias_fts, rowid, nome, modulo, status) VALUES ('delete', old.id, old.nome, old.modulo, old.status);
+        END''',
+        '''CREATE TRIGGER materias_fts_au AFTER UPDATE OF nome, modulo, status ON materias BEGIN
+            INSERT INTO materias_fts (materias_fts, rowid, nome, modulo, status) VALUES ('delete', old.id, old.nome, old.modulo, old.status);
+            INSERT INTO materias_fts (rowid, nome, modulo, status) VALUES (new.id, new.nome, new.modulo, new.status);
+        END''',
+        '''CREATE TRIGGER conteudos_fts_ai AFTER INSERT ON conteudos BEGIN
+            INSERT INTO conteudos_fts (rowid, nome, caminho) VALUES (new.id, new.nome, new.caminho);
+        END''',
+        '''CREATE TRIGGER conteudos_fts_ad AFTER DELETE ON conteudos BEGIN
+            INSERT INTO conteudos_fts (conteudos_fts, rowid, nome, caminho) VALUES ('delete', old.id, old.nome, old.caminho);
+        END''',
+        '''CREATE TRIGGER conteudos_fts_au AFTER UPDATE OF nome, caminho ON conteudos BEGIN
+            INSERT INTO conteudos_fts (conteudos_fts, rowid, nome, caminho) VALUES ('delete', old.id, old.nome, old.caminho);
+            INSERT INTO conteudos_fts (rowid, nome, caminho) VALUES (new.id, new.nome, new.caminho);
+        END''',
+        "INSERT INTO materias_fts (materias_fts) VALUES ('rebuild')",
+        "INSERT INTO conteudos_fts (conteudos_fts) VALUES ('rebuild')",
+    ),
+    # 4: rastreamento de alterações para backups incrementais.
+    # updated_at guarda milissegundos desde 1970; removidos guarda as exclusões.
+    (
+        'ALTER TABLE materias ADD COLUMN updated_at INTEGER',
+        'ALTER TABLE conteudos ADD COLUMN updated_at INTEGER',
+        f'UPDATE materias SET updated_at = {AGORA_MS}',
+        f'UPDATE conteudos SET updated_at = {AGORA_MS}',
+        'CREATE INDEX idx_materias_updated_at ON materias (updated_at)',
+        'CREATE INDEX idx_conteudos_updated_at ON conteudos (updated_at)',
+        '''CREATE TABLE removidos (
+            tabela TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            removido_em INTEGER NOT NULL
+        )''',
+        'CREATE INDEX idx_removidos_removido_em ON removidos (removido_em)',
+        '''CREATE TABLE estado (
+            chave TEXT PRIMARY KEY,
+            valor
+        )''',
+        f'''CREATE TRIGGER materias_alteracao_ai AFTER INSERT ON materias BEGIN
+            UPDATE materias SET updated_at = {AGORA_MS} WHERE id = new.id;
+        END''',
+        f'''CREATE TRIGGER materias_alteracao_au AFTER UPDATE OF nome, modulo, status ON materias BEGIN
+            UPDATE materias SET updated_at = {AGORA_MS} WHERE id = new.id;
+        END''',
+        f'''CREATE TRIGGER materias_alteracao_ad AFTER DELETE ON materias BEGIN
+            INSERT INTO removidos (tabela, id, removido_em) VALUES ('materias', old.id, {AGORA_MS});
+        END''',
+        f'''CREATE TRIGGER conteudos_alteracao_ai AFTER INSERT ON conteudos BEGIN
+            UPDATE conteudos SET updated_at = {AGORA_MS} WHERE id = new.id;
+        END''',
+        f'''CREATE TRIGGER conteudos_alteracao_au AFTER UPDATE OF materia_id, tipo, nome, caminho, is_divisao, ordem ON conteudos BEGIN
+            UPDATE conteudos SET updated_at = {AGORA_MS} WHERE id = new.id;
+        END''',
+        f'''CREATE TRIGGER conteudos_alteracao_ad AFTER DELETE ON conteudos BEGIN
+            INSERT INTO removidos (tabela, id, removido_em) VALUES ('conteudos', old.id, {AGORA_MS});
+        END''',
+    ),
+    # 5: metadados dos arquivos locais, preenchidos pelo verificador de arquivos.
+    # existe fica NULL até a primeira verificação; diretorios guarda o mtime
+    # de cada pasta para só reexaminar as que mudaram.
+    (
+        'ALTER TABLE conteudos ADD COLUMN tamanho INTEGER',
+        'ALTER TABLE conteudos ADD COLUMN modificado_em REAL',
+        'ALTER TABLE conteudos ADD COLUMN existe INTEGER',
+        '''CREATE TABLE diretorios (
+            caminho TEXT PRIMARY KEY,
+            mtime_ns INTEGER
+        )''',
+    ),
+    # 6: pasta vigiada de cada matéria (NULL = nenhuma)
+    (
+        'ALTER TABLE materias ADD COLUMN pasta TEXT',
+    ),
+    # 7: hash do conteúdo dos arquivos, para achar duplicados. hash_tamanho e
+    # hash_modificado_em dizem para qual versão do arquivo o hash vale.
+    (
+        'ALTER TABLE conteudos ADD COLUMN hash TEXT',
+        'ALTER TABLE conteudos ADD COLUMN hash_tamanho INTEGER',
+        'ALTER TABLE conteudos ADD COLUMN hash_modificado_em REAL',
+        'CREATE INDEX idx_conteudos_hash ON conteudos (hash) WHERE hash IS NOT NULL',
+    ),
+    # 8: arquivos já vistos nas pastas sincronizadas. Só o que a pasta não
+    # tinha antes entra na matéria; um arquivo removido dela não volta.
+    # Parte dos conteúdos que já estão na pasta vinculada.
+    (
+        '''CREATE TABLE arquivos_pasta (
+            materia_id INTEGER NOT NULL REFERENCES materias(id) ON DELETE CASCADE,
+            caminho TEXT NOT NULL,
+            PRIMARY KEY (materia_id, caminho)
+        ) WITHOUT ROWID''',
+        '''INSERT OR IGNORE INTO arquivos_pasta (materia_id, caminho)
+           SELECT c.materia_id, c.caminho FROM conteudos c JOIN materias m ON m.id = c.materia_id
+           WHERE m.pasta IS NOT NULL AND c.is_divisao = 0
+             AND substr(c.caminho, 1, length(m.pasta) + 1) IN (m.pasta || '/', m.pasta || '\\')''',
+    ),
+    # 9: índice em caminho, para as faixas de caminhos por pasta da verificação
+    (
+        'CREATE INDEX idx_conteudos_caminho ON conteudos (caminho)',
+    ),
+]
+
+VERSAO_ATUAL = len(MIGRACOES)
+
+
+def versao(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrar():
+    """Aplica as migrações pendentes. Retorna a lista de versões aplicadas."""
+    conn = banco.conectar()
+    inicial = versao(conn)
+    if inicial >= VERSAO_ATUAL:
+        return []
+
+    aplicadas = []
+    with banco.transacao():
+        for numero in range(inicial + 1, VERSAO_ATUAL + 1):
+            for sql in MIGRACOES[numero - 1]:
+                conn.execute(sql)
+            conn.execute(f'PRAGMA user_version={numero}')
+            aplicadas.append(numero)
+    return aplicadas
@@ -0,0 +1,227 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# pylint: disable=no-name-in-module
+from PyQt5.QtCore import QObject, QRunnable, QStandardPaths, QThreadPool, Qt, pyqtSignal
+from PyQt5.QtGui import QIcon, QImage, QImageReader, QPixmap
+
+from arquivos import IMAGENS
+
+TAMANHO = 48                    # lado máximo da miniatura, em pixels
+LIMITE_MEMORIA = 512            # ícones mantidos em memória
+LIMITE_DISCO = 100 * 1024 * 1024
+LIMITE_FILA = 64                # pedidos além disso descartam os mais antigos
+
+
+def eh_imagem(caminho):
+    return caminho.lower().endswith(IMAGENS)
+
+
+class _CacheDisco:
+    """Miniaturas em PNG numa pasta, com limite de tamanho total (LRU).
+
+    Usado pelas threads do pool; a ordem de uso sobrevive entre execuções
+    pelo mtime dos arquivos, que é renovado a cada acerto.
+    """
+
+    def __init__(self, pasta, limite):
+        self.pasta = pasta
+        self.limite = limite
+        self._trava = threading.Lock()
+        self._arquivos = None   # nome -> tamanho, do menos para o mais recente
+        self._total = 0
+
+    def _carregar(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        entradas = []
+        with os.scandir(self.pasta) as iterador:
+            for entrada in iterador:
+                if entrada.name.endswith('.png'):
+                    resultado = entrada.stat()
+                    entradas.append((resultado.st_mtime, entrada.name, resultado.st_size))
+        self._arquivos = OrderedDict((nome, tamanho) for _, nome, tamanho in sorted(entradas))
+        self._total = sum(self._arquivos.values())
+
+    def caminho(self, chave):
+        return os.path.join(self.pasta, chave + '.png')
+
+    def usar(self, chave):
+        """True se a miniatura está no disco, marcando-a como usada agora."""
+        nome = chave + '.png'
+        with self._trava:
+            try:
+                if self._arquivos is None:
+                    self._carregar()
+            except OSError:
+                # Sem a pasta do cache as miniaturas são geradas de novo a cada vez
+                return False
+            if nome not in self._arquivos:
+                return False
+            self._arquivos.move_to_end(nome)
+        try:
+            os.utime(self.caminho(chave))
+        except OSError:
+            pass
+        return True
+
+    def guardar(self, chave, imagem):
+        """Grava a miniatura; se o disco falhar, ela só não fica guardada."""
+        nome = chave + '.png'
+        # Duas gerações do mesmo arquivo podem estar gravando ao mesmo tempo
+        temporario = f'{self.caminho(chave)}.{threading.get_ident()}.parcial'
+        try:
+            if not imagem.save(temporario, 'PNG'):
+                raise OSError(f"não foi possível gravar {temporario}")
+            os.replace(temporario, self.caminho(chave))
+            tamanho = os.path.getsize(self.caminho(chave))
+        except OSError:
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
+            return
+        with self._trava:
+            try:
+                if self._arquivos is None:
+                    self._carregar()
+            except OSError:
+                return
+            self._total += tamanho - self._arquivos.pop(nome, 0)
+            self._arquivos[nome] = tamanho
+            while self._total > self.limite and len(self._arquivos) > 1:
+                antigo, tamanho_antigo = self._arquivos.popitem(last=False)
+                self._total -= tamanho_antigo
+                try:
+                    os.remove(os.path.join(self.pasta, antigo))
+                except OSError:
+                    pass
+
+
+_local = threading.local()
+
+
+def _baixar_prioridade():
+    """Deixa a thread atual com prioridade menor que a da interface (só Linux)."""
+    if getattr(_local, 'ajustada', False):
+        return
+    _local.ajustada = True
+    # No Linux o "processo" de setpriority pode ser uma thread; em outros sistemas não
+    if sys.platform.startswith('linux'):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except OSError:
+            pass
+
+
+class _Emissor(QObject):
+    pronta = pyqtSignal(str, object, QImage)
+
+
+class _Geracao(QRunnable):
+    def __init__(self, caminho, modificado_em, disco, emissor):
+        super().__init__()
+        self.caminho = caminho
+        self.modificado_em = modificado_em
+        self.disco = disco
+        self.emissor = emissor
+
+    def run(self):
+        _baixar_prioridade()
+        # Sempre emite: sem a resposta o pedido ficaria pendente para sempre
+        imagem = QImage()
+        try:
+            imagem = self._gerar()
+        except Exception as e:
+            print(f"Erro ao gerar miniatura de {self.caminho}: {e}")
+        finally:
+            self.emissor.pronta.emit(self.caminho, self.modificado_em, imagem)
+
+    def _gerar(self):
+        try:
+            resultado = os.stat(self.caminho)
+        except OSError:
+            return QImage()
+        chave = hashlib.sha1(f"{self.caminho}\0{resultado.st_mtime_ns}\0{TAMANHO}".encode()).hexdigest()
+
+        if self.disco.usar(chave):
+            imagem = QImage(self.disco.caminho(chave))
+        else:
+            # Decodifica já reduzida: JPEG e outros formatos pulam a imagem inteira
+            leitor = QImageReader(self.caminho)
+            leitor.setAutoTransform(True)
+            tamanho = leitor.size()
+            if tamanho.isValid():
+                leitor.setScaledSize(tamanho.scaled(TAMANHO, TAMANHO, Qt.KeepAspectRatio))
+            imagem = leitor.read()
+            if not imagem.isNull():
+                if max(imagem.width(), imagem.height()) > TAMANHO:
+                    imagem = imagem.scaled(TAMANHO, TAMANHO, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                self.disco.guardar(chave, imagem)
+        return imagem
+
+
+class Miniaturas(QObject):
+    """Ícones de miniatura gerados em segundo plano, com cache em memória e em disco.
+
+    icone() nunca decodifica nada na thread da interface: devolve o ícone se
+    ele já estiver em memória ou agenda a geração e devolve None. Quando a
+    miniatura fica pronta, disponivel(caminho) é emitido.
+    """
+    disponivel = pyqtSignal(str)
+
+    def __init__(self, pasta=None, parent=None):
+        super().__init__(parent)
+        if pasta is None:
+            pasta = os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), 'miniaturas')
+        self._disco = _CacheDisco(pasta, LIMITE_DISCO)
+        self._icones = OrderedDict()    # (caminho, modificado_em) -> QIcon
+        self._pendentes = OrderedDict() # (caminho, modificado_em) -> _Geracao
+        self._prioridade = 0
+        self._emissor = _Emissor()
+        self._emissor.pronta.connect(self._pronta)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(2, QThreadPool.globalInstance().maxThreadCount() // 2))
+
+    def icone(self, caminho, modificado_em=None):
+        chave = (caminho, modificado_em)
+        icone = self._icones.get(chave)
+        if icone is not None:
+            self._icones.move_to_end(chave)
+            return icone
+        if chave not in self._pendentes:
+            self._agendar(chave)
+        return None
+
+    def _agendar(self, chave):
+        # Pedidos novos primeiro: são as linhas visíveis agora
+        self._prioridade += 1
+        geracao = _Geracao(*chave, self._disco, self._emissor)
+        geracao.setAutoDelete(False)
+        self._pendentes[chave] = geracao
+        self._pool.start(geracao, self._prioridade)
+        # Linhas que já saíram da tela durante uma rolagem rápida
+        excesso = len(self._pendentes) - LIMITE_FILA
+        for antiga, geracao_antiga in list(self._pendentes.items()):
+            if excesso <= 0:
+                break
+            # As que já estão rodando não podem ser retiradas
+            if self._pool.tryTake(geracao_antiga):
+                del self._pendentes[antiga]
+                excesso -= 1
+
+    def _pronta(self, caminho, modificado_em, imagem):
+        chave = (caminho, modificado_em)
+        self._pendentes.pop(chave, None)
+        icone = QIcon(QPixmap.fromImage(imagem)) if not imagem.isNull() else QIcon()
+        self._icones[chave] = icone
+        if len(self._icones) > LIMITE_MEMORIA:
+            self._icones.popitem(last=False)
+        self.disponivel.emit(caminho)
+
+    def encerrar(self):
+        """Descarta as gerações na fila e espera as que estão rodando; chamar ao sair."""
+        self._pool.clear()
+        self._pool.waitForDone()
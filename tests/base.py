@@ -0,0 +1,30 @@
+import os
+import tempfile
+import unittest
+
+import banco
+import migracoes
+
+
+class TesteComBanco(unittest.TestCase):
+    """Cada teste usa um banco novo, migrado, numa pasta temporária apagada no fim."""
+
+    def setUp(self):
+        self.temporaria = tempfile.TemporaryDirectory()
+        self.caminho_original = banco.CAMINHO_BANCO
+        self.usar('material.db')
+
+    def tearDown(self):
+        banco.fechar()
+        banco.CAMINHO_BANCO = self.caminho_original
+        self.temporaria.cleanup()
+
+    def arquivo(self, nome):
+        """Caminho de nome dentro da pasta temporária."""
+        return os.path.join(self.temporaria.name, nome)
+
+    def usar(self, nome):
+        """Troca para o banco nome da pasta temporária, criando-o se preciso."""
+        banco.fechar()
+        banco.CAMINHO_BANCO = self.arquivo(nome)
+        migracoes.migrar()
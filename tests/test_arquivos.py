@@ -0,0 +1,37 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import arquivos
+import banco
+from base import TesteComBanco
+from dominio import Conteudo, Materia
+
+
+class TestAgruparPorPasta(TesteComBanco):
+    def test_pastas_da_materia_com_arquivos_de_todas_as_materias(self):
+        calculo = Materia(nome='Cálculo', modulo='1')
+        calculo.salvar()
+        calculo.adicionar_conteudos([
+            Conteudo('a.pdf', '/livros/a.pdf', 'livro'),
+            Conteudo('aula', 'https://exemplo.com/aula', 'video'),
+        ])
+        fisica = Materia(nome='Física', modulo='1')
+        fisica.salvar()
+        fisica.adicionar_conteudos([
+            Conteudo('b.pdf', '/livros/b.pdf', 'livro'),
+            Conteudo('c.pdf', '/livros/extra/c.pdf', 'livro'),
+            Conteudo('d.pdf', '/livros0/d.pdf', 'livro'),
+        ])
+
+        conn = banco.conectar()
+        pastas = arquivos._agrupar_por_pasta(conn, calculo.id)
+        self.assertEqual({pasta: sorted(nome for _, nome, _ in entradas) for pasta, entradas in pastas.items()},
+                         {'/livros': ['a.pdf', 'b.pdf']})
+        self.assertEqual(set(arquivos._agrupar_por_pasta(conn, None)), {'/livros', '/livros/extra', '/livros0'})
+
+
+if __name__ == '__main__':
+    unittest.main()
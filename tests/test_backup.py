@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backup
+import banco
+from base import TesteComBanco
+from dominio import Conteudo, Materia
+
+
+def _biblioteca():
+    """{nome da matéria: [(tipo, nome, caminho, ordem)]} do banco atual."""
+    materias = Materia.carregar_todas()
+    return {
+        materia.nome: [
+            (c.tipo, c.nome, c.caminho, c.ordem)
+            for c in materia.conteudos_livros + materia.conteudos_videos + materia.aulas_ao_vivo
+        ]
+        for materia in materias
+    }
+
+
+class TestRestaurarIncremental(TesteComBanco):
+    def test_base_restaurada_substituindo_e_delta(self):
+        for nome in ('Cálculo', 'Física'):
+            materia = Materia(nome=nome, modulo='1')
+            materia.salvar()
+            materia.adicionar_conteudos([
+                Conteudo('a.pdf', '/livros/a.pdf', 'livro'),
+                Conteudo('b.mp4', '/videos/b.mp4', 'video'),
+            ])
+        backup.exportar(self.arquivo('base.json'), com_ids=True)
+
+        # Restaurar a própria base não deve deixar as linhas como removidas
+        backup.importar(self.arquivo('base.json'), substituir=True)
+        calculo = next(m for m in Materia.carregar_todas() if m.nome == 'Cálculo')
+        calculo.adicionar_conteudos([Conteudo('c.pdf', '/livros/c.pdf', 'livro')])
+        Materia.apagar_conteudo(calculo.conteudos_videos[0].id)
+        backup.exportar_incremental(self.arquivo('d1.json'))
+        esperado = _biblioteca()
+
+        self.usar('destino.db')
+        backup.restaurar([self.arquivo('base.json'), self.arquivo('d1.json')], substituir=True)
+        self.assertEqual(_biblioteca(), esperado)
+
+    def test_delta_com_linha_removida_e_gravada_de_novo(self):
+        materia = Materia(nome='Química', modulo='2')
+        materia.salvar()
+        backup.exportar(self.arquivo('base.json'), com_ids=True)
+        with banco.transacao() as conn:
+            conn.execute('DELETE FROM materias WHERE id=?', (materia.id,))
+            conn.execute("INSERT INTO materias (id, nome, modulo, status) VALUES (?, 'Química', '2', 'Concluída')", (materia.id,))
+        Materia(materia.id).adicionar_conteudos([Conteudo('q.pdf', '/livros/q.pdf', 'livro')])
+        backup.exportar_incremental(self.arquivo('d1.json'))
+        esperado = _biblioteca()
+
+        self.usar('destino.db')
+        backup.restaurar([self.arquivo('base.json'), self.arquivo('d1.json')], substituir=True)
+        self.assertEqual(_biblioteca(), esperado)
+
+    def criar_zeta_e_alfa(self):
+        for nome in ('Zeta', 'Alfa'):
+            materia = Materia(nome=nome, modulo='1')
+            materia.salvar()
+            materia.adicionar_conteudos([
+                Conteudo(f'{nome}1', f'/livros/{nome}1.pdf', 'livro'),
+                Conteudo(f'{nome}2', f'/livros/{nome}2.pdf', 'livro'),
+            ])
+
+    def apagar_primeiro_de_zeta(self):
+        zeta = next(m for m in Materia.carregar_todas() if m.nome == 'Zeta')
+        Materia.apagar_conteudo(zeta.conteudos_livros[0].id)
+
+    def test_delta_sobre_base_sem_ids_e_recusado(self):
+        self.criar_zeta_e_alfa()
+        backup.exportar(self.arquivo('base.json'), com_ids=True)
+        backup.exportar(self.arquivo('sem_ids.json'))
+        self.apagar_primeiro_de_zeta()
+        backup.exportar_incremental(self.arquivo('d1.json'))
+
+        self.usar('destino.db')
+        Materia(nome='Existente', modulo='1').salvar()
+        antes = _biblioteca()
+        with self.assertRaises(ValueError):
+            backup.restaurar([self.arquivo('sem_ids.json'), self.arquivo('d1.json')], substituir=True)
+        self.assertEqual(_biblioteca(), antes)
+
+    def test_primeiro_delta_de_outra_base_e_recusado(self):
+        self.criar_zeta_e_alfa()
+        backup.exportar(self.arquivo('antiga.json'), com_ids=True)
+        # As marcas são em milissegundos: no mesmo, as duas bases teriam a mesma
+        time.sleep(0.002)
+        self.apagar_primeiro_de_zeta()
+        backup.exportar(self.arquivo('nova.json'), com_ids=True)
+        Materia(nome='Beta', modulo='1').salvar()
+        backup.exportar_incremental(self.arquivo('d1.json'))
+
+        self.usar('destino.db')
+        with self.assertRaises(ValueError):
+            backup.restaurar([self.arquivo('antiga.json'), self.arquivo('d1.json')], substituir=True)
+        self.assertEqual(_biblioteca(), {})
+        backup.restaurar([self.arquivo('nova.json'), self.arquivo('d1.json')], substituir=True)
+        self.assertEqual(sorted(_biblioteca()), ['Alfa', 'Beta', 'Zeta'])
+
+
+class TestExportarImportar(TesteComBanco):
+    def setUp(self):
+        super().setUp()
+        calculo = Materia(nome='Cálculo', modulo='1', status='Concluído')
+        calculo.salvar()
+        calculo.adicionar_conteudos([
+            Conteudo('Limites', '', 'livro', True),
+            Conteudo('apostila.pdf', '/livros/apostila.pdf', 'livro'),
+            Conteudo('aula1.mp4', '/videos/aula1.mp4', 'video'),
+            Conteudo('Aula 1', 'https://exemplo.com/aula', 'aula'),
+        ])
+        Materia(nome='Física', modulo='2').salvar()
+        self.original = _biblioteca()
+
+    def sem_ordens(self, biblioteca):
+        return {nome: [linha[:3] for linha in conteudos] for nome, conteudos in biblioteca.items()}
+
+    def test_ida_e_volta_compactada_sem_ids(self):
+        self.assertTrue(backup.exportar(self.arquivo('backup.json.gz'), compactar=True))
+
+        self.usar('destino.db')
+        self.assertEqual(backup.importar(self.arquivo('backup.json.gz'), substituir=True), (2, 4, False))
+        self.assertEqual(self.sem_ordens(_biblioteca()), self.sem_ordens(self.original))
+
+    def test_ida_e_volta_com_ids_mantem_ids_e_ordens(self):
+        backup.exportar(self.arquivo('backup.json'), com_ids=True)
+        ids = sorted(banco.conectar().execute('SELECT id, materia_id FROM conteudos'))
+
+        self.usar('destino.db')
+        Materia(nome='Descartada', modulo='1').salvar()
+        self.assertEqual(backup.importar(self.arquivo('backup.json'), substituir=True), (2, 4, True))
+        self.assertEqual(_biblioteca(), self.original)
+        self.assertEqual(sorted(banco.conectar().execute('SELECT id, materia_id FROM conteudos')), ids)
+
+    def test_mesclar_mantem_a_biblioteca_atual(self):
+        backup.exportar(self.arquivo('backup.json'))
+
+        self.usar('destino.db')
+        Materia(nome='Química', modulo='3').salvar()
+        backup.importar(self.arquivo('backup.json'))
+        self.assertEqual(sorted(_biblioteca()), ['Cálculo', 'Física', 'Química'])
+        # Mesclar de novo não duplica o que já existe
+        backup.importar(self.arquivo('backup.json'))
+        self.assertEqual(self.sem_ordens(_biblioteca()), {**self.sem_ordens(self.original), 'Química': []})
+
+    def test_exportacao_cancelada_nao_deixa_arquivo(self):
+        self.assertFalse(backup.exportar(self.arquivo('backup.json'), cancelado=lambda: True))
+        self.assertFalse(os.path.exists(self.arquivo('backup.json')))
+        self.assertFalse(os.path.exists(self.arquivo('backup.json.parcial')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import duplicados
+from base import TesteComBanco
+from dominio import Conteudo, Materia
+
+
+class TestDuplicados(TesteComBanco):
+    def criar(self, nome, dados):
+        caminho = self.arquivo(nome)
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(dados)
+        return caminho
+
+    def test_mesmo_arquivo_em_varias_materias_nao_e_duplicado(self):
+        comum = self.criar('comum.pdf', b'apostila')
+        copia = self.criar('copia.pdf', b'lista')
+        original = self.criar('original.pdf', b'lista')
+        for nome in ('Cálculo', 'Física'):
+            materia = Materia(nome=nome, modulo='1')
+            materia.salvar()
+            materia.adicionar_conteudos([Conteudo('comum.pdf', comum, 'livro')])
+        materia.adicionar_conteudos([
+            Conteudo('copia.pdf', copia, 'livro'),
+            Conteudo('original.pdf', original, 'livro'),
+        ])
+
+        self.assertEqual(duplicados.atualizar_hashes(processos=1), 3)
+        grupos = duplicados.duplicados()
+        self.assertEqual(len(grupos), 1)
+        self.assertEqual(sorted(linha[5] for linha in grupos[0][2]), [copia, original])
+
+
+if __name__ == '__main__':
+    unittest.main()
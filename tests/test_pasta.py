@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import arquivos
+from base import TesteComBanco
+from dominio import Materia
+
+
+class TestSincronizarPasta(TesteComBanco):
+    def setUp(self):
+        super().setUp()
+        self.pasta = self.arquivo('apostilas')
+        os.mkdir(self.pasta)
+        self.materia = Materia(nome='Cálculo', modulo='1')
+        self.materia.salvar()
+        Materia.gravar_pasta(self.materia.id, self.pasta)
+
+    def criar(self, nome):
+        with open(os.path.join(self.pasta, nome), 'w'):
+            pass
+
+    def sincronizar(self):
+        _, encontrados, _ = arquivos.listar_pasta(self.pasta)
+        novos, _ = Materia.sincronizar_pasta(self.materia.id, self.pasta, self.pasta, encontrados)
+        return [linha[1] for linha in novos]
+
+    def test_arquivo_removido_da_materia_nao_volta(self):
+        self.criar('a.pdf')
+        self.criar('b.pdf')
+        self.assertEqual(self.sincronizar(), ['a.pdf', 'b.pdf'])
+
+        self.materia.carregar_conteudos()
+        Materia.apagar_conteudo(self.materia.conteudos_livros[0].id)
+        self.criar('c.pdf')
+        self.assertEqual(self.sincronizar(), ['c.pdf'])
+        self.assertEqual(self.sincronizar(), [])
+
+    def test_arquivo_que_sai_e_volta_para_a_pasta_entra_de_novo(self):
+        self.criar('a.pdf')
+        self.sincronizar()
+        self.materia.carregar_conteudos()
+        Materia.apagar_conteudo(self.materia.conteudos_livros[0].id)
+
+        os.remove(os.path.join(self.pasta, 'a.pdf'))
+        self.sincronizar()
+        self.criar('a.pdf')
+        self.assertEqual(self.sincronizar(), ['a.pdf'])
+
+    def test_pasta_fora_do_ar_nao_esquece_o_que_foi_visto(self):
+        self.criar('a.pdf')
+        self.sincronizar()
+        self.materia.carregar_conteudos()
+        Materia.apagar_conteudo(self.materia.conteudos_livros[0].id)
+
+        Materia.sincronizar_pasta(self.materia.id, self.pasta, self.pasta, None)
+        self.assertEqual(self.sincronizar(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import ESPACO_ORDEM, calcular_ordens
+
+
+class TestCalcularOrdens(unittest.TestCase):
+    def assertCrescente(self, ordens):
+        self.assertTrue(all(a < b for a, b in zip(ordens, ordens[1:])), ordens)
+
+    def alteradas(self, antes, depois):
+        return sum(a != b for a, b in zip(antes, depois))
+
+    def test_sequencia_ja_crescente_nao_muda(self):
+        ordens = [1024, 2048, 5000, 9000]
+        self.assertEqual(calcular_ordens(ordens), ordens)
+        self.assertEqual(calcular_ordens([]), [])
+
+    def test_item_movido_e_encaixado_entre_os_vizinhos(self):
+        # O último item foi arrastado para a segunda posição
+        antes = [1024, 4096, 2048, 3072]
+        depois = calcular_ordens(antes)
+        self.assertCrescente(depois)
+        self.assertEqual(self.alteradas(antes, depois), 1)
+        self.assertTrue(1024 < depois[1] < 2048)
+
+    def test_inversao_mantem_um_item(self):
+        antes = [p * ESPACO_ORDEM for p in range(10, 0, -1)]
+        depois = calcular_ordens(antes)
+        self.assertCrescente(depois)
+        self.assertEqual(self.alteradas(antes, depois), len(antes) - 1)
+
+    def test_sem_espaco_renumera_a_aba(self):
+        self.assertEqual(calcular_ordens([1, 3, 2]), [ESPACO_ORDEM, 2 * ESPACO_ORDEM, 3 * ESPACO_ORDEM])
+
+    def test_limite_da_parte_nao_carregada(self):
+        # O primeiro item foi arrastado para o fim da parte carregada da aba
+        self.assertEqual(calcular_ordens([2048, 3072, 1024]), [2048, 3072, 4096])
+        depois = calcular_ordens([2048, 3072, 1024], limite=4096)
+        self.assertCrescente(depois + [4096])
+        self.assertEqual(depois[:2], [2048, 3072])
+        # Renumerada, a aba continua abaixo do limite
+        self.assertEqual(calcular_ordens([1, 3, 2], limite=4), [4 - 3 * ESPACO_ORDEM, 4 - 2 * ESPACO_ORDEM, 4 - ESPACO_ORDEM])
+
+
+if __name__ == '__main__':
+    unittest.main()
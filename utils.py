@@ -0,0 +1,91 @@
+import bisect
+import unicodedata
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, para comparar textos digitados ("calculo" == "Cálculo")."""
+    decomposto = unicodedata.normalize('NFKD', texto.casefold())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def eh_link(caminho):
+    return caminho.startswith(('http://', 'https://'))
+
+
+def formatar_tamanho(tamanho):
+    """Tamanho em bytes para leitura: 512 B, 1.5 KB, 12.3 MB..."""
+    for unidade in ('B', 'KB', 'MB', 'GB'):
+        if tamanho < 1024 or unidade == 'GB':
+            break
+        tamanho /= 1024
+    if unidade == 'B':
+        return f"{tamanho} B"
+    return f"{tamanho:.1f} {unidade}"
+
+
+# Distância entre ordens consecutivas; deixa espaço para encaixar itens
+# movidos sem renumerar a aba inteira
+ESPACO_ORDEM = 1024
+
+
+def _subsequencia_crescente(valores):
+    """Índices de uma maior subsequência estritamente crescente de valores."""
+    finais = []
+    indices = []
+    anterior = [-1] * len(valores)
+    for i, valor in enumerate(valores):
+        pos = bisect.bisect_left(finais, valor)
+        if pos == len(finais):
+            finais.append(valor)
+            indices.append(i)
+        else:
+            finais[pos] = valor
+            indices[pos] = i
+        anterior[i] = indices[pos - 1] if pos > 0 else -1
+    
+    resultado = set()
+    i = indices[-1] if indices else -1
+    while i != -1:
+        resultado.add(i)
+        i = anterior[i]
+    return resultado
+
+
+def calcular_ordens(ordens, limite=None):
+    """Recebe as ordens atuais já na nova sequência e devolve as novas ordens.
+
+    Os itens de uma maior subsequência crescente mantêm a ordem que têm; os
+    demais são encaixados no espaço entre os vizinhos. Só quando não há
+    espaço a aba inteira é renumerada. Com limite (a ordem do primeiro item
+    ainda não carregado), todas as novas ordens ficam abaixo dele.
+    """
+    n = len(ordens)
+    fixos = _subsequencia_crescente(ordens)
+    novas = list(ordens)
+    i = 0
+    while i < n:
+        if i in fixos:
+            i += 1
+            continue
+        j = i
+        while j < n and j not in fixos:
+            j += 1
+        k = j - i
+        
+        inicio = novas[i - 1] if i > 0 else None
+        fim = novas[j] if j < n else limite
+        if inicio is None and fim is None:
+            inicio, fim = 0, (k + 1) * ESPACO_ORDEM
+        elif inicio is None:
+            inicio = fim - (k + 1) * ESPACO_ORDEM
+        elif fim is None:
+            fim = inicio + (k + 1) * ESPACO_ORDEM
+        
+        if fim - inicio <= k:
+            if limite is not None:
+                return [limite - (n - p) * ESPACO_ORDEM for p in range(n)]
+            return [(p + 1) * ESPACO_ORDEM for p in range(n)]
+        for p in range(k):
+            novas[i + p] = inicio + (fim - inicio) * (p + 1) // (k + 1)
+        i = j
+    return novas